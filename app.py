@@ -1,12 +1,47 @@
 # Enhanced Flask Inventory Management System with Authentication
 import sqlite3
-from flask import Flask, g, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import (Flask, g, render_template, request, jsonify, redirect, url_for, flash, session, Response, abort,
+                   has_request_context)
 from pathlib import Path
 from datetime import datetime, timedelta
 import json
-from functools import wraps
+import math
+from functools import lru_cache, wraps
 import hashlib
 import secrets
+import base64
+import csv
+import io
+import zlib
+import gzip
+import mimetypes
+import os
+import bisect
+import threading
+import logging
+import random
+import re
+from logging.handlers import RotatingFileHandler
+import hmac
+from concurrent.futures import Future, ThreadPoolExecutor
+import click
+import time
+from werkzeug.security import safe_join
+
+try:
+    import brotli  # Optional: enables br encoding, gzip is always available
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl  # POSIX only; without it the background lease is always granted
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy as np  # Optional: enables the ABC/XYZ and slow-mover analytics
+except ImportError:
+    np = None
 
 # Project DB location
 DATABASE = Path("instance") / "inventory.db"
@@ -16,13 +51,475 @@ app = Flask(__name__)
 app.config['DATABASE'] = str(DATABASE)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 app.secret_key = 'your-secret-key-change-in-production'  # Required for flash messages
+app.config['COMPRESS_MIN_SIZE'] = 1024  # Bytes; smaller responses are sent as-is
+app.config['COMPRESS_LEVEL'] = 6
+app.config['COMPRESS_BR_QUALITY'] = 5
+app.config['ASSET_MAX_AGE'] = 31536000  # Hashed asset URLs never change content
+app.config['SCRYPT_N'] = 2 ** 14  # CPU/memory cost; 16 MiB per hash with r=8
+app.config['SCRYPT_R'] = 8
+app.config['SCRYPT_P'] = 1
+app.config['PASSWORD_HASH_WORKERS'] = os.cpu_count() or 2
+app.config['PASSWORD_HASH_QUEUE'] = 64  # Pending hash jobs before logins are turned away
+app.config['ARCHIVE_KEEP_MONTHS'] = 3  # Months of transactions kept in the hot table
+app.config['PURGE_CHUNK_SIZE'] = 500  # Ids whose dependents bulk purge jobs delete together
+app.config['PURGE_ROW_LIMIT'] = 5000  # Inventory and ledger rows deleted per purge transaction
+app.config['PURGE_PAUSE'] = 0.05  # Seconds between chunks so live requests get the write lock
+app.config['SLOW_QUERY_MS'] = 100  # Statements slower than this are written to the slow query log
+app.config['SLOW_QUERY_SAMPLE_RATE'] = 1.0  # Fraction of slow statements that are logged
+app.config['SLOW_QUERY_MAX_PER_MINUTE'] = 60
+app.config['SLOW_QUERY_LOG'] = str(DATABASE.parent / 'slow_queries.log')
+app.config['SLOW_QUERY_LOG_BYTES'] = 5 * 1024 * 1024
+app.config['SLOW_QUERY_LOG_BACKUPS'] = 5
+app.config['READ_POOL_WORKERS'] = min(4, os.cpu_count() or 1)  # Threads for parallel_queries; 1 runs them inline
+app.config['REPORT_WORKERS'] = 2  # Threads computing background report jobs
+app.config['REPORT_SCHEDULER_INTERVAL'] = 60  # Seconds between scheduler passes
+app.config['REPORT_RETENTION_DAYS'] = 7  # Expired results and finished report jobs are kept this long
+app.config['BACKGROUND_LEASE_FILE'] = str(DATABASE.parent / 'background.lock')
+app.config['BACKGROUND_LEASE_RETRY'] = 10  # Seconds between attempts by workers waiting for the lease
+app.config['REPORT_SCHEDULE'] = [  # Reports kept precomputed; params default as in REPORTS
+    {'report': 'category_summary'},
+    {'report': 'store_summary'},
+    {'report': 'transaction_summary', 'params': {'days': 30}},
+    {'report': 'monthly_movements'},
+]
+app.config['ANALYTICS_WEEKS'] = 26  # Complete weeks of sales behind ABC/XYZ classes and sales rates
+app.config['ANALYTICS_ABC_THRESHOLDS'] = (0.8, 0.95)  # Cumulative value share closing classes A and B
+app.config['ANALYTICS_XYZ_THRESHOLDS'] = (0.5, 1.0)  # Weekly demand CV closing classes X and Y
+app.config['ANALYTICS_REBUILD_SECONDS'] = 24 * 3600  # Reread the window to pick up deleted or archived rows
+app.config['ANALYTICS_STORE_TTL'] = 300  # Seconds a store's slow-mover flags are reused
+app.config['DEAD_STOCK_DAYS'] = 90  # Stocked with no sale for this long
+app.config['SLOW_COVER_DAYS'] = 180  # Stock lasting longer than this at the current sales rate
+app.config['REBALANCE_LOOKBACK_DAYS'] = 28  # Sales history behind the demand forecast
+app.config['REBALANCE_COVER_DAYS'] = 14  # Forecast demand a store should hold on top of its reorder point
+app.config['REBALANCE_KEEP_FACTOR'] = 1.5  # Sources keep this multiple of their own target before giving stock away
+app.config['PRODUCT_BATCH_CHUNK'] = 5000  # Rows per transaction in /api/products/batch
+app.config['PRODUCT_BATCH_MAX_ROWS'] = 500000
+app.config['PRODUCT_BATCH_MAX_CONFLICTS'] = 1000  # Conflicts listed in the response; the count covers all
+app.config['PRODUCT_BATCH_DEFER_STATS'] = 500  # Existing rows in a chunk above which store_stats is updated set-based
+
+# --- Config profiles ---
+# INVENTORY_PROFILE selects a profile; any config key can then be overridden
+# with an INVENTORY_<KEY> environment variable (JSON values are decoded, so
+# INVENTORY_SLOW_QUERY_MS=250 is an int).
+DEFAULT_SECRET_KEY = app.secret_key
+CONFIG_PROFILES = {
+    'development': {
+        'DEBUG': True,
+        'TEMPLATES_AUTO_RELOAD': True,
+    },
+    'production': {
+        'DEBUG': False,
+        'TEMPLATES_AUTO_RELOAD': False,  # Compile each template once per worker
+        'SESSION_COOKIE_HTTPONLY': True,
+        'SESSION_COOKIE_SAMESITE': 'Lax',
+        'PASSWORD_HASH_WORKERS': 2,  # Per worker process; the server runs several
+        'SLOW_QUERY_SAMPLE_RATE': 0.1,
+    },
+}
+
+def load_config(profile=None):
+    """Apply a config profile, then INVENTORY_* environment overrides"""
+    profile = profile or os.environ.get('INVENTORY_PROFILE', 'development')
+    if profile not in CONFIG_PROFILES:
+        raise ValueError(f"Unknown INVENTORY_PROFILE {profile!r}; expected one of {', '.join(CONFIG_PROFILES)}")
+    app.config.update(CONFIG_PROFILES[profile])
+    app.config.from_prefixed_env('INVENTORY')
+    app.config['PROFILE'] = profile
+    # Sessions carry the role and credential version, so a known key lets anyone sign an admin cookie
+    if profile == 'production' and (not app.secret_key or app.secret_key == DEFAULT_SECRET_KEY):
+        raise RuntimeError('The production profile needs its own SECRET_KEY; set INVENTORY_SECRET_KEY')
+
+load_config()
+
+# --- Response compression ---
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson', 'image/svg+xml',
+}
+
+def choose_encoding():
+    """Pick the best content encoding the client accepts, or None"""
+    return request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+
+def compress_bytes(data, encoding, level=None):
+    """Compress a whole body with gzip or brotli"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level or app.config['COMPRESS_BR_QUALITY'])
+    return gzip.compress(data, compresslevel=level or app.config['COMPRESS_LEVEL'])
+
+def compress_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk, flushing so each chunk reaches the client"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=app.config['COMPRESS_BR_QUALITY'])
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(app.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)  # 31 = gzip container
+        compress, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli-encode compressible responses above COMPRESS_MIN_SIZE"""
+    if (response.direct_passthrough
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if not encoding:
+        return response
+    
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# --- Static assets ---
+_assets = {}
+
+def load_asset(filename):
+    """Read, content-hash and precompress a static file once per process (reloaded when it changes)"""
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    mtime = os.path.getmtime(path)
+    asset = _assets.get(filename)
+    if asset is None or asset['mtime'] != mtime:
+        with open(path, 'rb') as f:
+            data = f.read()
+        asset = _assets[filename] = {
+            'mtime': mtime,
+            'digest': hashlib.sha256(data).hexdigest()[:12],
+            'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            'identity': data,
+            'gzip': compress_bytes(data, 'gzip', level=9),
+            'br': compress_bytes(data, 'br', level=11) if brotli else None,
+        }
+    return asset
+
+def asset_url(filename):
+    """Content-hashed URL for a static file, safe to cache forever"""
+    asset = load_asset(filename)
+    if asset is None:
+        return url_for('static', filename=filename)
+    return url_for('hashed_asset', digest=asset['digest'], filename=filename)
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+@app.route('/assets/<digest>/<path:filename>')
+def hashed_asset(digest, filename):
+    """Serve a precompressed static file under its content hash"""
+    asset = load_asset(filename)
+    if asset is None:
+        abort(404)
+    if digest != asset['digest']:
+        return redirect(asset_url(filename))
+    
+    encoding = choose_encoding()
+    body = asset.get(encoding) if encoding else None
+    response = Response(body or asset['identity'], mimetype=asset['mimetype'])
+    if body:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['ASSET_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+# --- Metrics ---
+# Per-process request and SQL instrumentation, exported in the Prometheus text
+# format at /metrics. Each worker process keeps its own counters.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class Metrics:
+    """Thread-safe counters and histograms keyed by (name, labels)"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.help = {}
+    
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+    
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+            position = bisect.bisect_left(buckets, value)
+            if position < len(buckets):
+                entry[1][position] += 1
+            entry[2] += value
+            entry[3] += 1
+    
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+    
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            series = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                series.setdefault(name, []).append(f'{name}{self._labels(labels)} {value}')
+            for (name, labels), entry in sorted(self.histograms.items(), key=lambda item: item[0]):
+                buckets, counts, total, count = entry
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    series.setdefault(name, []).append(
+                        f'{name}_bucket{self._labels(labels, [("le", bound)])} {cumulative}')
+                series[name].append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {count}')
+                series[name].append(f'{name}_sum{self._labels(labels)} {total}')
+                series[name].append(f'{name}_count{self._labels(labels)} {count}')
+        for name in sorted(series):
+            kind, text = self.help.get(name, ('untyped', ''))
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(series[name])
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status code')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+metrics.describe('http_request_exceptions_total', 'counter', 'Requests that ended in an unhandled exception')
+metrics.describe('db_statements_per_request', 'histogram', 'SQL statements executed per request')
+metrics.describe('db_statements_total', 'counter', 'SQL statements executed by endpoint')
+metrics.describe('db_statement_seconds_total', 'counter', 'Time spent executing and fetching SQL by endpoint')
+metrics.describe('db_connections_opened_total', 'counter', 'Request-scoped SQLite connections opened')
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that adds its statement count and execute/fetch time to the current request.
+
+    Time spent on each statement (execute plus fetches) is also checked
+    against the slow query log threshold.
+    """
+    
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            if has_request_context():
+                g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+            self.statement_seconds += elapsed
+            if not self.statement_logged and self.statement_seconds >= slow_query_log.threshold():
+                self.statement_logged = True
+                slow_query_log.record(self.connection, self.statement, self.statement_params,
+                                      self.statement_seconds, self.statement_many)
+    
+    def _start(self, sql, parameters, many=False):
+        self.statement = sql
+        self.statement_params = parameters
+        self.statement_many = many
+        self.statement_seconds = 0.0
+        self.statement_logged = False
+        if has_request_context():
+            g.sql_statements = g.get('sql_statements', 0) + 1
+    
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        # Keep the first row of a list for the slow log; generators are not consumed twice
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        self._start(sql, first, many=True)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+    
+    def fetchone(self):
+        return self._timed(super().fetchone)
+    
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, self.arraysize if size is None else size)
+    
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose shortcut execute methods go through InstrumentedCursor"""
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+@app.after_request
+def record_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_metrics(exception):
+    """Record latency, status and SQL usage once the response has been produced"""
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    endpoint = request.endpoint or 'unmatched'  # Unknown URLs share one label
+    status = 500 if exception else g.get('response_status', 500)
+    metrics.inc('http_requests_total', {'endpoint': endpoint, 'method': request.method, 'status': status})
+    metrics.observe('http_request_duration_seconds', {'endpoint': endpoint},
+                    time.perf_counter() - started, LATENCY_BUCKETS)
+    if exception:
+        metrics.inc('http_request_exceptions_total', {'endpoint': endpoint})
+    statements = g.get('sql_statements', 0)
+    metrics.observe('db_statements_per_request', {'endpoint': endpoint}, statements, STATEMENT_BUCKETS)
+    if statements:
+        metrics.inc('db_statements_total', {'endpoint': endpoint}, statements)
+        metrics.inc('db_statement_seconds_total', {'endpoint': endpoint}, g.get('sql_seconds', 0.0))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# --- Slow query log ---
+# Statements slower than SLOW_QUERY_MS are written as JSON lines to a rotating
+# log with normalized SQL, parameter types, the calling route and the
+# EXPLAIN QUERY PLAN output. Logging is sampled and capped per minute.
+SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQL_WHITESPACE = re.compile(r'\s+')
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+def normalize_sql(sql):
+    """Collapse whitespace and replace literals with ? so similar statements group together"""
+    return SQL_WHITESPACE.sub(' ', SQL_LITERAL.sub('?', sql)).strip()
+
+def parameter_shape(parameters):
+    """Types of the bound parameters, without their values"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters]
+
+class SlowQueryLog:
+    """Sampled, rate-limited JSON-lines log of slow statements"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.logger = None
+        self.window_start = 0.0
+        self.window_count = 0
+    
+    def threshold(self):
+        return app.config['SLOW_QUERY_MS'] / 1000.0
+    
+    def _get_logger(self):
+        # Opened on first use so SLOW_QUERY_LOG can be set after import; the lock keeps
+        # concurrent first slow queries from attaching a handler each
+        if self.logger is None:
+            with self.lock:
+                if self.logger is None:
+                    logger = logging.getLogger('inventory.slow_queries')
+                    logger.setLevel(logging.INFO)
+                    logger.propagate = False
+                    if not logger.handlers:
+                        handler = RotatingFileHandler(app.config['SLOW_QUERY_LOG'],
+                                                      maxBytes=app.config['SLOW_QUERY_LOG_BYTES'],
+                                                      backupCount=app.config['SLOW_QUERY_LOG_BACKUPS'])
+                        handler.setFormatter(logging.Formatter('%(message)s'))
+                        logger.addHandler(handler)
+                    self.logger = logger
+        return self.logger
+    
+    def _allow(self):
+        if random.random() >= app.config['SLOW_QUERY_SAMPLE_RATE']:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start, self.window_count = now, 0
+            if self.window_count >= app.config['SLOW_QUERY_MAX_PER_MINUTE']:
+                return False
+            self.window_count += 1
+            return True
+    
+    def explain(self, connection, sql, parameters):
+        """EXPLAIN QUERY PLAN rows for the statement, or None if it can't be explained"""
+        if not sql.lstrip().upper().startswith(EXPLAINABLE) or parameters is None:
+            return None
+        try:
+            cur = connection.cursor(sqlite3.Cursor)  # Plain cursor: not timed or logged again
+            cur.row_factory = None
+            plan = [row[3] for row in cur.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+            cur.close()
+            return plan
+        except sqlite3.Error as e:
+            return [f'unavailable: {e}']
+    
+    def record(self, connection, sql, parameters, seconds, many=False):
+        if not self._allow():
+            return
+        entry = {
+            'timestamp': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+            'duration_ms': round(seconds * 1000, 2),
+            'sql': normalize_sql(sql),
+            'params': parameter_shape(parameters),
+            'executemany': many,
+            'route': request.endpoint if has_request_context() else threading.current_thread().name,
+            'method': request.method if has_request_context() else None,
+            'plan': self.explain(connection, sql, parameters),
+        }
+        try:
+            self._get_logger().info(json.dumps(entry, default=str))
+        except OSError as e:
+            print(f"Slow query log error: {e}")
+
+slow_query_log = SlowQueryLog()
 
 # --- DB helpers ---
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(app.config['DATABASE'])
+        db = g._database = sqlite3.connect(app.config['DATABASE'], factory=InstrumentedConnection)
         db.row_factory = sqlite3.Row
+        if has_request_context():
+            metrics.inc('db_connections_opened_total', {})
     return db
 
 @app.teardown_appcontext
@@ -144,6 +641,219 @@ def init_db():
             # Ignore column already exists errors
             if "duplicate column name" not in str(e).lower():
                 print(f"Database enhancement error: {e}")
+        
+        # Indexes live in their own script: the enhanced schema above stops at the
+        # first duplicate column on existing databases, so they must not depend on it
+        index_schema = """
+        -- Keyset pagination over the ledger (newest first, id breaks ties)
+        CREATE INDEX IF NOT EXISTS idx_transactions_created_id ON transactions(created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_store_created_id ON transactions(store_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_product_created_id ON transactions(product_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_type_created_id ON transactions(transaction_type_id, created_at, id);
+
+        -- Inventory grid filters and sorts
+        CREATE INDEX IF NOT EXISTS idx_inventories_product ON inventories(product_id);
+        CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
+        CREATE INDEX IF NOT EXISTS idx_products_name ON products(name);
+        """
+        
+        try:
+            db.executescript(index_schema)
+            db.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Database index error: {e}")
+        
+        # Full-text search index for /api/search. External-content FTS5 tables
+        # with trigram tokenization (substring matches) kept in sync by triggers.
+        search_schema = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, sku, description, content='products', content_rowid='id', tokenize='trigram'
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS stores_fts USING fts5(
+            name, location, content='stores', content_rowid='id', tokenize='trigram'
+        );
+        
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, sku, description) VALUES (new.id, new.name, new.sku, new.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, sku, description) VALUES ('delete', old.id, old.name, old.sku, old.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, sku, description ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, sku, description) VALUES ('delete', old.id, old.name, old.sku, old.description);
+            INSERT INTO products_fts(rowid, name, sku, description) VALUES (new.id, new.name, new.sku, new.description);
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS stores_fts_ai AFTER INSERT ON stores BEGIN
+            INSERT INTO stores_fts(rowid, name, location) VALUES (new.id, new.name, new.location);
+        END;
+        CREATE TRIGGER IF NOT EXISTS stores_fts_ad AFTER DELETE ON stores BEGIN
+            INSERT INTO stores_fts(stores_fts, rowid, name, location) VALUES ('delete', old.id, old.name, old.location);
+        END;
+        CREATE TRIGGER IF NOT EXISTS stores_fts_au AFTER UPDATE OF name, location ON stores BEGIN
+            INSERT INTO stores_fts(stores_fts, rowid, name, location) VALUES ('delete', old.id, old.name, old.location);
+            INSERT INTO stores_fts(rowid, name, location) VALUES (new.id, new.name, new.location);
+        END;
+        """
+        
+        try:
+            search_index_exists = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='products_fts'").fetchone()
+            db.executescript(search_schema)
+            if not search_index_exists:
+                # First run on an existing database: index the rows already there
+                db.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+                db.execute("INSERT INTO stores_fts(stores_fts) VALUES ('rebuild')")
+            db.commit()
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5/trigram fall back to LIKE search
+            print(f"Search index error: {e}")
+        
+        # Change log read by the in-process SKU index (see SkuIndex). Triggers record
+        # every product write, and the log trims itself to the last 10,000 entries.
+        lookup_schema = """
+        CREATE TABLE IF NOT EXISTS product_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL
+        );
+        
+        CREATE TRIGGER IF NOT EXISTS product_changes_ai AFTER INSERT ON products BEGIN
+            INSERT INTO product_changes (product_id) VALUES (new.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS product_changes_au AFTER UPDATE OF sku, name, reorder_point, cost_price, sell_price ON products BEGIN
+            INSERT INTO product_changes (product_id) VALUES (new.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS product_changes_ad AFTER DELETE ON products BEGIN
+            INSERT INTO product_changes (product_id) VALUES (old.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS product_changes_trim AFTER INSERT ON product_changes BEGIN
+            DELETE FROM product_changes WHERE seq <= new.seq - 10000;
+        END;
+        """
+        
+        try:
+            db.executescript(lookup_schema)
+            db.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Lookup schema error: {e}")
+        
+        # Bumped whenever a user's password, role or status changes; sessions
+        # carry the version they were issued with (see login_required)
+        try:
+            db.execute('ALTER TABLE users ADD COLUMN credential_version INTEGER NOT NULL DEFAULT 0')
+            db.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        # Soft-deleted (discontinued) products stay in the ledger but are hidden
+        # from the catalog, pickers, search and SKU lookups
+        try:
+            db.execute('ALTER TABLE products ADD COLUMN discontinued_at TIMESTAMP')
+            db.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        job_schema = """
+        CREATE TRIGGER IF NOT EXISTS product_changes_discontinued AFTER UPDATE OF discontinued_at ON products BEGIN
+            INSERT INTO product_changes (product_id) VALUES (new.id);
+        END;
+        
+        -- Background jobs (bulk purges) with persisted progress
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+            total INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+        """
+        
+        try:
+            db.executescript(job_schema)
+            db.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Job schema error: {e}")
+        
+        # Process running a job; resume_jobs() only takes over jobs whose owner has exited
+        try:
+            db.execute('ALTER TABLE jobs ADD COLUMN owner_pid INTEGER')
+            db.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        
+        # At most one pending job per report and params, so concurrent requests share it.
+        # Duplicates queued before the index existed are failed first, keeping the
+        # running (else oldest) job of each set, so the index can always be built.
+        db.execute('''
+            UPDATE jobs SET status = 'failed', error = 'Duplicate of another pending report job',
+                            finished_at = CURRENT_TIMESTAMP
+            WHERE kind = 'report' AND status IN ('queued', 'running')
+              AND id != (SELECT keep.id FROM jobs keep
+                         WHERE keep.kind = 'report' AND keep.params = jobs.params
+                           AND keep.status IN ('queued', 'running')
+                         ORDER BY keep.status = 'running' DESC, keep.id LIMIT 1)
+        ''')
+        db.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_pending_report ON jobs(params)
+            WHERE kind = 'report' AND status IN ('queued', 'running')
+        ''')
+        db.commit()
+        
+        # Registry of monthly transaction archive partitions (see archive_transactions)
+        try:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS transaction_partitions (
+                    name TEXT PRIMARY KEY,
+                    period_start TEXT NOT NULL,
+                    period_end TEXT NOT NULL,
+                    row_count INTEGER NOT NULL DEFAULT 0,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            for row in db.execute('SELECT name FROM transaction_partitions').fetchall():
+                ensure_partition_columns(db, row[0])
+            db.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Partition schema error: {e}")
+        
+        # Stored results of background report jobs (see run_report_job)
+        try:
+            db.executescript('''
+                CREATE TABLE IF NOT EXISTS report_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    report TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    job_id INTEGER,
+                    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at TIMESTAMP NOT NULL,
+                    UNIQUE (report, params)
+                );
+                CREATE INDEX IF NOT EXISTS idx_report_results_expires ON report_results(expires_at);
+                CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs(kind, status);
+            ''')
+            db.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Report schema error: {e}")
+        
+        # Per-store totals kept current by triggers (see rebuild_store_stats)
+        try:
+            trigger = db.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'store_stats_products_au'"
+                                 ).fetchone()
+            if trigger and 'store_stats_deferred' not in trigger[0]:
+                db.execute('DROP TRIGGER store_stats_products_au')  # Predates the batch sync guard
+            db.executescript(STORE_STATS_SCHEMA)
+            empty = db.execute('SELECT NOT EXISTS (SELECT 1 FROM store_stats)').fetchone()[0]
+            if empty and db.execute('SELECT EXISTS (SELECT 1 FROM stores)').fetchone()[0]:
+                rebuild_store_stats(db)
+            db.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Store stats schema error: {e}")
 
 def query_db(query, args=(), one=False):
     cur = get_db().execute(query, args)
@@ -158,30 +868,613 @@ def execute_db(query, args=()):
     db.commit()
     return cur.lastrowid
 
+# --- Columnar responses ---
+def wants_columns():
+    """True when the client asked for the compact ?format=columns encoding"""
+    return request.args.get('format') == 'columns'
+
+def query_columns(query, args=()):
+    """Run a query and return {columns, rows} built straight from cursor tuples.
+
+    Skips sqlite3.Row and per-row dicts entirely, so large lists serialize
+    without repeating every key name in every row.
+    """
+    cur = get_db().cursor()
+    cur.row_factory = None
+    cur.execute(query, args)
+    rows = cur.fetchall()
+    columns = [d[0] for d in cur.description]
+    cur.close()
+    return {'columns': columns, 'rows': rows}
+
+def rows_to_columns(rows):
+    """Columnar encoding for rows already fetched as sqlite3.Row"""
+    return {'columns': list(rows[0].keys()) if rows else [], 'rows': [tuple(r) for r in rows]}
+
+def list_response(query, args=()):
+    """JSON list of records, or the columnar encoding when ?format=columns"""
+    if wants_columns():
+        return jsonify(query_columns(query, args))
+    return jsonify([dict(r) for r in query_db(query, args)])
+
+# --- Parallel reads ---
+# Independent read queries in one handler can run concurrently on a small
+# pool of threads, each with its own read-only connection, so a page costs
+# about as much as its slowest query rather than the sum of all of them.
+# sqlite3 releases the GIL while a statement runs.
+read_pool = ThreadPoolExecutor(max_workers=app.config['READ_POOL_WORKERS'], thread_name_prefix='db-read')
+_read_local = threading.local()
+
+def read_connection():
+    """This pool thread's read-only connection, reopened if DATABASE changes"""
+    database = app.config['DATABASE']
+    if getattr(_read_local, 'database', None) != database:
+        if getattr(_read_local, 'db', None) is not None:
+            _read_local.db.close()
+        uri = Path(database).resolve().as_uri() + '?mode=ro'
+        _read_local.db = sqlite3.connect(uri, uri=True, factory=InstrumentedConnection)
+        _read_local.db.row_factory = sqlite3.Row
+        _read_local.database = database
+    return _read_local.db
+
+def _run_read(query, args, one):
+    started = time.perf_counter()
+    cur = read_connection().execute(query, args)
+    rv = cur.fetchall()
+    cur.close()
+    return ((rv[0] if rv else None) if one else rv), time.perf_counter() - started
+
+class ReadResult:
+    """Handle for a query running on the read pool; result() waits for it like query_db would return"""
+    
+    def __init__(self, future):
+        self.future = future
+    
+    def result(self):
+        rv, elapsed = self.future.result()
+        if has_request_context():
+            g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+        return rv
+
+def _run_inline(query, args, one):
+    future = Future()
+    try:
+        future.set_result((query_db(query, args, one=one), 0.0))  # query_db already counted its time
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def parallel_queries(**queries):
+    """Start independent read queries at once; returns {name: ReadResult}.
+
+    Each value is (query, args) or (query, args, one). Reads use separate
+    connections, so they only see committed data - don't use this after
+    writing in the same request. With a single read worker there is nothing
+    to overlap, so the queries run in order on the request's connection.
+    """
+    if app.config['READ_POOL_WORKERS'] < 2:
+        return {name: ReadResult(_run_inline(spec[0], spec[1], spec[2] if len(spec) > 2 else False))
+                for name, spec in queries.items()}
+    if has_request_context():
+        g.sql_statements = g.get('sql_statements', 0) + len(queries)
+    return {name: ReadResult(read_pool.submit(_run_read, spec[0], spec[1], spec[2] if len(spec) > 2 else False))
+            for name, spec in queries.items()}
+
+# --- Pagination helpers ---
+def encode_cursor(values):
+    """Encode a keyset position as an opaque, URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor, returning None if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+def keyset_paginate(base_query, where_conditions, params, key, limit, after=None, before=None, descending=True,
+                    sources=None):
+    """Fetch one page of base_query ordered by the key columns using keyset pagination.
+
+    key is a list of (sql_expression, row_column) pairs whose values uniquely order
+    the rows. after/before are cursors returned by a previous call. Returns
+    (rows, next_cursor, prev_cursor); cursors are None at either end. With
+    sources (ledger tables from transaction_partitions), {source} in base_query
+    is replaced by a transaction_source() over them.
+    """
+    conditions = list(where_conditions)
+    params = list(params)
+    cursor = before or after
+    position = decode_cursor(cursor) if cursor else None
+    if cursor and (position is None or len(position) != len(key)):
+        raise ValueError('Invalid cursor')
+    backwards = bool(before)
+    
+    if position is not None:
+        # Walking forward means "further along the sort order"; before walks back
+        forward_op = '<' if descending else '>'
+        backward_op = '>' if descending else '<'
+        columns = ', '.join(expr for expr, _ in key)
+        placeholders = ', '.join('?' for _ in key)
+        conditions.append(f'({columns}) {backward_op if backwards else forward_op} ({placeholders})')
+        params.extend(position)
+    
+    direction = 'DESC' if descending != backwards else 'ASC'
+    where_clause = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    order_clause = ', '.join(f'{expr} {direction}' for expr, _ in key)
+    
+    if sources is not None:
+        source_sql, source_params = transaction_source(sources, conditions, params, order_clause, limit + 1)
+        base_query = base_query.replace('{source}', source_sql)
+        params = source_params + params
+    
+    rows = query_db(f'{base_query} {where_clause} ORDER BY {order_clause} LIMIT ?', params + [limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    
+    # Coming back via a before-cursor implies rows exist after this page
+    more_after = True if backwards else has_more
+    more_before = has_more if backwards else position is not None
+    
+    next_cursor = prev_cursor = None
+    if rows:
+        if more_after:
+            next_cursor = encode_cursor(rows[-1][column] for _, column in key)
+        if more_before:
+            prev_cursor = encode_cursor(rows[0][column] for _, column in key)
+    return rows, next_cursor, prev_cursor
+
+COUNT_ESTIMATE_CAP = 10000
+
+def estimate_count(table, where_conditions, params, cap=COUNT_ESTIMATE_CAP):
+    """Count matching rows, stopping at cap + 1 so large results stay cheap.
+
+    Returns (count, exact); exact is False when the count was cut off at the cap.
+    """
+    where_clause = 'WHERE ' + ' AND '.join(where_conditions) if where_conditions else ''
+    row = query_db(f'SELECT COUNT(*) as total FROM (SELECT 1 FROM {table} {where_clause} LIMIT ?)',
+                   list(params) + [cap + 1], one=True)
+    total = row['total'] if row else 0
+    return min(total, cap), total <= cap
+
+def match_name_ids(table, text):
+    """Resolve a free-text name filter to the ids of matching stores or products.
+
+    Uses the trigram FTS index on the name column when the input is long enough,
+    otherwise (or without FTS5) a LIKE over the small lookup table.
+    """
+    if table not in ('stores', 'products'):
+        raise ValueError(f'No name index for {table}')
+    if len(text) >= 3:
+        phrase = '"' + text.replace('"', '""') + '"'
+        try:
+            rows = query_db(f'SELECT rowid as id FROM {table}_fts WHERE {table}_fts MATCH ?',
+                            (f'name : {phrase}',))
+            return [r['id'] for r in rows]
+        except sqlite3.OperationalError as e:
+            print(f"Name index unavailable for {table}, using LIKE: {e}")
+    rows = query_db(f'SELECT id FROM {table} WHERE name LIKE ?', (f'%{text}%',))
+    return [r['id'] for r in rows]
+
+# --- Transaction archive partitions ---
+# Closed months are moved out of the hot transactions table into one table per
+# month (transactions_YYYY_MM) listed in transaction_partitions. Queries over
+# the ledger read from transaction_source(), which only touches the partitions
+# overlapping their date range.
+TRANSACTION_COLUMNS = []
+
+def transaction_columns(db=None):
+    """Column names of the hot transactions table, read once per process"""
+    if not TRANSACTION_COLUMNS:
+        db = db or get_db()
+        TRANSACTION_COLUMNS.extend(row[1] for row in db.execute('PRAGMA table_info(transactions)'))
+    return TRANSACTION_COLUMNS
+
+def transaction_partitions(date_from=None, date_to=None):
+    """Archive partitions overlapping [date_from, date_to] (both inclusive, either open), newest first"""
+    rows = query_db('''
+        SELECT name FROM transaction_partitions
+        WHERE (? IS NULL OR period_end > ?) AND (? IS NULL OR period_start <= ?)
+        ORDER BY period_start DESC
+    ''', (date_from, date_from, date_to, date_to))
+    return ['transactions'] + [r['name'] for r in rows]
+
+def transaction_source(tables, conditions=(), params=(), order_clause=None, limit=None):
+    """Build the FROM source (aliased by the caller as t) over the given ledger tables.
+
+    Returns (sql, params). A single table is returned as-is. Otherwise each table
+    becomes a UNION ALL arm with the t.* conditions applied inside it, and with
+    order_clause/limit each arm contributes only its own top rows, so paging stays
+    an index seek per partition. Callers still apply the conditions outside.
+    """
+    if len(tables) == 1:
+        return tables[0], []
+    columns = ', '.join(f't.{column}' for column in transaction_columns())
+    where_clause = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    tail = (f'ORDER BY {order_clause} ' if order_clause else '') + (f'LIMIT {int(limit)}' if limit else '')
+    arms = [f'SELECT * FROM (SELECT {columns} FROM {table} t {where_clause} {tail})' for table in tables]
+    return '(' + ' UNION ALL '.join(arms) + ')', list(params) * len(tables)
+
+def ensure_partition_columns(db, table):
+    """Add any columns the hot table has gained since the partition was created"""
+    existing = {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+    for row in db.execute('PRAGMA table_info(transactions)').fetchall():
+        if row[1] not in existing:
+            db.execute(f'ALTER TABLE {table} ADD COLUMN {row[1]} {row[2]}')
+
+def archive_transactions(keep_months=None):
+    """Move whole months older than keep_months from transactions into monthly partitions.
+
+    Each month is copied and deleted in its own transaction. Returns a list of
+    (partition name, rows moved).
+    """
+    keep_months = app.config['ARCHIVE_KEEP_MONTHS'] if keep_months is None else keep_months
+    today = datetime.utcnow().date()
+    month_index = today.year * 12 + today.month - 1 - keep_months
+    cutoff = f'{month_index // 12:04d}-{month_index % 12 + 1:02d}-01'
+
+    db = sqlite3.connect(app.config['DATABASE'], isolation_level=None)
+    moved = []
+    try:
+        columns = ', '.join(row[1] for row in db.execute('PRAGMA table_info(transactions)'))
+        months = [row[0] for row in db.execute('''
+            SELECT DISTINCT strftime('%Y-%m', created_at) FROM transactions
+            WHERE created_at < ? ORDER BY 1
+        ''', (cutoff,)) if row[0]]
+
+        for month in months:
+            year, mon = (int(part) for part in month.split('-'))
+            start = f'{month}-01'
+            end = f'{year + mon // 12:04d}-{mon % 12 + 1:02d}-01'
+            name = f"transactions_{month.replace('-', '_')}"
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute(f'CREATE TABLE IF NOT EXISTS {name} AS SELECT * FROM transactions WHERE 0')
+                ensure_partition_columns(db, name)
+                for index_sql in (f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{name}_id ON {name}(id)',
+                                  f'CREATE INDEX IF NOT EXISTS idx_{name}_created_id ON {name}(created_at, id)',
+                                  f'CREATE INDEX IF NOT EXISTS idx_{name}_store_created_id ON {name}(store_id, created_at, id)',
+                                  f'CREATE INDEX IF NOT EXISTS idx_{name}_product_created_id ON {name}(product_id, created_at, id)',
+                                  f'CREATE INDEX IF NOT EXISTS idx_{name}_type_created_id ON {name}(transaction_type_id, created_at, id)'):
+                    db.execute(index_sql)
+                count = db.execute(f'''
+                    INSERT INTO {name} ({columns}) SELECT {columns} FROM transactions
+                    WHERE created_at >= ? AND created_at < ?
+                ''', (start, end)).rowcount
+                db.execute('DELETE FROM transactions WHERE created_at >= ? AND created_at < ?', (start, end))
+                db.execute('''
+                    INSERT INTO transaction_partitions (name, period_start, period_end, row_count)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET row_count = row_count + excluded.row_count,
+                                                    archived_at = CURRENT_TIMESTAMP
+                ''', (name, start, end, count))
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+            moved.append((name, count))
+    finally:
+        db.close()
+    return moved
+
+@app.cli.command('archive-transactions')
+@click.option('--keep-months', type=int, default=None, help='Months to keep in the hot table')
+def archive_transactions_command(keep_months):
+    """Move closed months of transactions into monthly archive partitions"""
+    for name, count in archive_transactions(keep_months):
+        print(f'Archived {count} transactions into {name}')
+
+# --- Store statistics ---
+# store_stats holds one row of totals per store so the stores list and store
+# pages don't aggregate every inventory row on each view. Triggers apply the
+# delta of each inventory insert/update/delete and product price or reorder
+# point change; ledger inserts bump last_activity. Value sums are REAL, so
+# `flask rebuild-store-stats` recomputes them exactly if drift ever matters.
+STORE_STATS_TRIGGERS = [
+    'store_stats_stores_ai', 'store_stats_stores_ad', 'store_stats_inventories_ai', 'store_stats_inventories_ad',
+    'store_stats_inventories_au', 'store_stats_inventories_move', 'store_stats_products_au',
+    'store_stats_transactions_ai',
+]
+
+# Batch product syncs switch this trigger off for their own write transaction by
+# putting a row in store_stats_deferred, apply one set-based update instead and
+# delete the row before committing. Writers are serialized, so no other
+# connection ever sees the row, and a rollback takes it away with the rest.
+STORE_STATS_PRODUCTS_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS store_stats_products_au AFTER UPDATE OF cost_price, sell_price, reorder_point ON products
+    WHEN NOT EXISTS (SELECT 1 FROM store_stats_deferred)
+      AND (OLD.cost_price IS NOT NEW.cost_price OR OLD.sell_price IS NOT NEW.sell_price
+           OR OLD.reorder_point IS NOT NEW.reorder_point) BEGIN
+        UPDATE store_stats SET
+            value_at_cost = value_at_cost + (
+                SELECT i.quantity * (COALESCE(NEW.cost_price, 0) - COALESCE(OLD.cost_price, 0))
+                FROM inventories i WHERE i.store_id = store_stats.store_id AND i.product_id = NEW.id),
+            value_at_price = value_at_price + (
+                SELECT i.quantity * (COALESCE(NEW.sell_price, 0) - COALESCE(OLD.sell_price, 0))
+                FROM inventories i WHERE i.store_id = store_stats.store_id AND i.product_id = NEW.id),
+            low_stock_count = low_stock_count + (
+                SELECT COALESCE(i.quantity <= NEW.reorder_point, 0) - COALESCE(i.quantity <= OLD.reorder_point, 0)
+                FROM inventories i WHERE i.store_id = store_stats.store_id AND i.product_id = NEW.id)
+        WHERE store_id IN (SELECT store_id FROM inventories WHERE product_id = NEW.id);
+    END;
+'''
+
+STORE_STATS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS store_stats (
+        store_id INTEGER PRIMARY KEY,
+        sku_count INTEGER NOT NULL DEFAULT 0,
+        units INTEGER NOT NULL DEFAULT 0,
+        value_at_cost REAL NOT NULL DEFAULT 0,
+        value_at_price REAL NOT NULL DEFAULT 0,
+        low_stock_count INTEGER NOT NULL DEFAULT 0,
+        last_activity TIMESTAMP
+    );
+    
+    CREATE TABLE IF NOT EXISTS store_stats_deferred (id INTEGER PRIMARY KEY);
+    
+    CREATE TRIGGER IF NOT EXISTS store_stats_stores_ai AFTER INSERT ON stores BEGIN
+        INSERT OR IGNORE INTO store_stats (store_id) VALUES (NEW.id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS store_stats_stores_ad AFTER DELETE ON stores BEGIN
+        DELETE FROM store_stats WHERE store_id = OLD.id;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS store_stats_inventories_ai AFTER INSERT ON inventories BEGIN
+        INSERT OR IGNORE INTO store_stats (store_id) VALUES (NEW.store_id);
+        UPDATE store_stats SET
+            sku_count = sku_count + 1,
+            units = units + NEW.quantity,
+            value_at_cost = value_at_cost
+                + NEW.quantity * COALESCE((SELECT cost_price FROM products WHERE id = NEW.product_id), 0),
+            value_at_price = value_at_price
+                + NEW.quantity * COALESCE((SELECT sell_price FROM products WHERE id = NEW.product_id), 0),
+            low_stock_count = low_stock_count
+                + COALESCE((SELECT NEW.quantity <= reorder_point FROM products WHERE id = NEW.product_id), 0)
+        WHERE store_id = NEW.store_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS store_stats_inventories_ad AFTER DELETE ON inventories BEGIN
+        UPDATE store_stats SET
+            sku_count = sku_count - 1,
+            units = units - OLD.quantity,
+            value_at_cost = value_at_cost
+                - OLD.quantity * COALESCE((SELECT cost_price FROM products WHERE id = OLD.product_id), 0),
+            value_at_price = value_at_price
+                - OLD.quantity * COALESCE((SELECT sell_price FROM products WHERE id = OLD.product_id), 0),
+            low_stock_count = low_stock_count
+                - COALESCE((SELECT OLD.quantity <= reorder_point FROM products WHERE id = OLD.product_id), 0)
+        WHERE store_id = OLD.store_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS store_stats_inventories_au AFTER UPDATE OF quantity ON inventories
+    WHEN NEW.store_id = OLD.store_id AND NEW.product_id = OLD.product_id AND NEW.quantity IS NOT OLD.quantity BEGIN
+        UPDATE store_stats SET
+            units = units + NEW.quantity - OLD.quantity,
+            value_at_cost = value_at_cost + (NEW.quantity - OLD.quantity)
+                * COALESCE((SELECT cost_price FROM products WHERE id = NEW.product_id), 0),
+            value_at_price = value_at_price + (NEW.quantity - OLD.quantity)
+                * COALESCE((SELECT sell_price FROM products WHERE id = NEW.product_id), 0),
+            low_stock_count = low_stock_count + COALESCE((
+                SELECT COALESCE(NEW.quantity <= reorder_point, 0) - COALESCE(OLD.quantity <= reorder_point, 0)
+                FROM products WHERE id = NEW.product_id), 0)
+        WHERE store_id = NEW.store_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS store_stats_inventories_move AFTER UPDATE OF store_id, product_id ON inventories
+    WHEN NEW.store_id IS NOT OLD.store_id OR NEW.product_id IS NOT OLD.product_id BEGIN
+        UPDATE store_stats SET
+            sku_count = sku_count - 1,
+            units = units - OLD.quantity,
+            value_at_cost = value_at_cost
+                - OLD.quantity * COALESCE((SELECT cost_price FROM products WHERE id = OLD.product_id), 0),
+            value_at_price = value_at_price
+                - OLD.quantity * COALESCE((SELECT sell_price FROM products WHERE id = OLD.product_id), 0),
+            low_stock_count = low_stock_count
+                - COALESCE((SELECT OLD.quantity <= reorder_point FROM products WHERE id = OLD.product_id), 0)
+        WHERE store_id = OLD.store_id;
+        INSERT OR IGNORE INTO store_stats (store_id) VALUES (NEW.store_id);
+        UPDATE store_stats SET
+            sku_count = sku_count + 1,
+            units = units + NEW.quantity,
+            value_at_cost = value_at_cost
+                + NEW.quantity * COALESCE((SELECT cost_price FROM products WHERE id = NEW.product_id), 0),
+            value_at_price = value_at_price
+                + NEW.quantity * COALESCE((SELECT sell_price FROM products WHERE id = NEW.product_id), 0),
+            low_stock_count = low_stock_count
+                + COALESCE((SELECT NEW.quantity <= reorder_point FROM products WHERE id = NEW.product_id), 0)
+        WHERE store_id = NEW.store_id;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS store_stats_transactions_ai AFTER INSERT ON transactions BEGIN
+        UPDATE store_stats SET last_activity = NEW.created_at
+        WHERE store_id = NEW.store_id AND (last_activity IS NULL OR last_activity < NEW.created_at);
+    END;
+''' + STORE_STATS_PRODUCTS_TRIGGER
+
+def rebuild_store_stats(db):
+    """Recompute every store_stats row from inventories and the ledger (caller commits)"""
+    activity = ' UNION ALL '.join(f'SELECT store_id, MAX(created_at) AS at FROM {table} GROUP BY store_id'
+                                  for table in ledger_tables(db))
+    db.execute('DELETE FROM store_stats')
+    db.execute(f'''
+        WITH activity AS MATERIALIZED (
+            SELECT store_id, MAX(at) AS last_activity FROM ({activity}) GROUP BY store_id
+        )
+        INSERT INTO store_stats (store_id, sku_count, units, value_at_cost, value_at_price,
+                                 low_stock_count, last_activity)
+        SELECT s.id, COUNT(i.id), COALESCE(SUM(i.quantity), 0),
+               COALESCE(SUM(i.quantity * COALESCE(p.cost_price, 0)), 0),
+               COALESCE(SUM(i.quantity * COALESCE(p.sell_price, 0)), 0),
+               COALESCE(SUM(COALESCE(i.quantity <= p.reorder_point, 0)), 0),
+               a.last_activity
+        FROM stores s
+        LEFT JOIN inventories i ON i.store_id = s.id
+        LEFT JOIN products p ON p.id = i.product_id
+        LEFT JOIN activity a ON a.store_id = s.id
+        GROUP BY s.id
+    ''')
+
+@app.cli.command('rebuild-store-stats')
+def rebuild_store_stats_command():
+    """Recompute the store_stats table from scratch"""
+    db = get_db()
+    rebuild_store_stats(db)
+    db.commit()
+    print(f"Rebuilt stats for {db.execute('SELECT COUNT(*) FROM store_stats').fetchone()[0]} stores")
+
 # --- Authentication helpers ---
+LEGACY_SHA256_LENGTH = 64
+
+class PasswordHashBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+password_hash_pool = ThreadPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                                        thread_name_prefix='password-hash')
+password_hash_slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_QUEUE'])
+
+def _scrypt(password, salt, n, r, p):
+    # scrypt needs about 128 * r * n bytes; leave headroom over OpenSSL's 32 MiB default
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=32)
+
+def _hash_password(password):
+    n, r, p = app.config['SCRYPT_N'], app.config['SCRYPT_R'], app.config['SCRYPT_P']
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return f"scrypt${n}${r}${p}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+def _verify_password(password, password_hash):
+    if not password_hash:
+        return False
+    if len(password_hash) == LEGACY_SHA256_LENGTH and '$' not in password_hash:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, password_hash)
+    try:
+        scheme, n, r, p, salt, digest = password_hash.split('$')
+        if scheme != 'scrypt':
+            return False
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+def run_password_job(fn, *args):
+    """Run a hashing job on the bounded pool so request threads don't burn CPU on scrypt"""
+    if not password_hash_slots.acquire(timeout=5):
+        raise PasswordHashBusy()
+    try:
+        return password_hash_pool.submit(fn, *args).result()
+    finally:
+        password_hash_slots.release()
+
 def hash_password(password):
-    """Hash a password for storing in the database"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password for storing in the database (salted scrypt)"""
+    return run_password_job(_hash_password, password)
 
 def verify_password(password, password_hash):
-    """Verify a password against its hash"""
-    return hashlib.sha256(password.encode()).hexdigest() == password_hash
+    """Verify a password against its hash (scrypt, or a legacy unsalted SHA-256)"""
+    return run_password_job(_verify_password, password, password_hash)
+
+@lru_cache(maxsize=1)
+def dummy_password_hash(n, r, p):
+    """Hash of a random password at the given cost, checked when a login names no known user"""
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(secrets.token_urlsafe(16), salt, n, r, p)
+    return f"scrypt${n}${r}${p}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+def password_needs_rehash(password_hash):
+    """True for legacy SHA-256 hashes or scrypt hashes made with other cost settings"""
+    current = f"scrypt${app.config['SCRYPT_N']}${app.config['SCRYPT_R']}${app.config['SCRYPT_P']}$"
+    return not (password_hash or '').startswith(current)
+
+USER_CACHE_TTL = 60  # Seconds before another worker's user changes are picked up
+
+class UserCache:
+    """Per-worker cache of user rows so authenticated requests skip the users table.
+
+    Entries expire after USER_CACHE_TTL; invalidate() drops them immediately
+    when this worker changes a user.
+    """
+    
+    def __init__(self, ttl=USER_CACHE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}  # user id -> (expires_at, user dict or None)
+    
+    def get(self, user_id):
+        now = time.monotonic()
+        entry = self.entries.get(user_id)
+        if entry and entry[0] > now:
+            return entry[1]
+        row = query_db('SELECT * FROM users WHERE id = ?', (user_id,), one=True)
+        user = dict(row) if row else None
+        with self.lock:
+            self.entries[user_id] = (now + self.ttl, user)
+        return user
+    
+    def invalidate(self, user_id=None):
+        with self.lock:
+            if user_id is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(user_id, None)
+
+user_cache = UserCache()
+
+def start_user_session(user):
+    """Store the signed identity (id, role, credential version) in the session cookie"""
+    session.clear()
+    session['user_id'] = user['id']
+    session['username'] = user['username']
+    session['role'] = user['role']
+    session['full_name'] = user['full_name']
+    session['credential_version'] = user['credential_version'] if 'credential_version' in user.keys() else 0
+
+def bump_credential_version(user_id):
+    """Invalidate every session issued to a user (call after password, role or status changes)"""
+    execute_db('UPDATE users SET credential_version = credential_version + 1 WHERE id = ?', (user_id,))
+    user_cache.invalidate(user_id)
+
+def session_user():
+    """Return the cached user for the session, or None if the session is stale"""
+    if 'user_id' not in session:
+        return None
+    user = user_cache.get(session['user_id'])
+    if (not user or not user['is_active']
+            or user.get('credential_version', 0) != session.get('credential_version', 0)):
+        return None
+    return user
 
 def login_required(f):
     """Decorator to require authentication for routes"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if session_user() is None:
+            session.clear()
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
 
+def role_required(*roles):
+    """Decorator to require one of the given roles, checked against the signed session"""
+    def decorator(f):
+        @wraps(f)
+        @login_required
+        def decorated_function(*args, **kwargs):
+            if session.get('role') not in roles:
+                if request.path.startswith('/api/'):
+                    return jsonify({'error': 'Insufficient permissions'}), 403
+                flash('You do not have permission to access this page.', 'error')
+                return redirect(url_for('home'))
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 def get_current_user():
     """Get the current logged-in user"""
-    if 'user_id' in session:
-        return query_db('SELECT * FROM users WHERE id = ?', (session['user_id'],), one=True)
-    return None
+    return session_user()
 
 # --- Authentication Routes ---
 @app.route('/login', methods=['GET', 'POST'])
@@ -199,15 +1492,29 @@ def login():
         user = query_db('SELECT * FROM users WHERE (username = ? OR email = ?) AND is_active = 1', 
                        (username, username), one=True)
         
-        if user and verify_password(password, user['password_hash']):
+        try:
+            if user:
+                verified = verify_password(password, user['password_hash'])
+            else:
+                # Spend the same scrypt work as a real check so response time doesn't reveal which accounts exist
+                verify_password(password, dummy_password_hash(app.config['SCRYPT_N'], app.config['SCRYPT_R'],
+                                                              app.config['SCRYPT_P']))
+                verified = False
+            if verified and password_needs_rehash(user['password_hash']):
+                # Upgrade legacy SHA-256 (or outdated scrypt cost) hashes in place
+                execute_db('UPDATE users SET password_hash = ? WHERE id = ?',
+                           (hash_password(password), user['id']))
+        except PasswordHashBusy:
+            flash('The server is busy signing other users in. Please try again.', 'warning')
+            return render_template('login.html'), 503
+        
+        if verified:
             # Login successful
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            session['role'] = user['role']
-            session['full_name'] = user['full_name']
+            start_user_session(user)
             
             # Update last login
             execute_db('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user['id'],))
+            user_cache.invalidate(user['id'])
             
             flash(f"Welcome back, {user['full_name']}!", 'success')
             
@@ -250,8 +1557,8 @@ def register():
             return render_template('register.html')
         
         # Create new user
-        password_hash = hash_password(password)
         try:
+            password_hash = hash_password(password)
             user_id = execute_db('''INSERT INTO users (username, email, password_hash, full_name, role) 
                                    VALUES (?, ?, ?, ?, ?)''',
                                (username, email, password_hash, full_name, 'user'))
@@ -272,6 +1579,55 @@ def logout():
     flash(f'Goodbye, {user_name}! You have been logged out.', 'info')
     return redirect(url_for('login'))
 
+# --- User administration ---
+# Every change to a user's password, role or status bumps credential_version,
+# which logs out the sessions already issued to that user on every worker.
+def find_user(username):
+    user = query_db('SELECT * FROM users WHERE username = ? OR email = ?', (username, username), one=True)
+    if not user:
+        raise click.ClickException(f'No user named {username}')
+    return user
+
+@app.cli.command('set-password')
+@click.argument('username')
+@click.password_option()
+def set_password_command(username, password):
+    """Set a user's password and log out their existing sessions"""
+    if len(password) < 6:
+        raise click.ClickException('Password must be at least 6 characters long.')
+    user = find_user(username)
+    execute_db('UPDATE users SET password_hash = ? WHERE id = ?', (hash_password(password), user['id']))
+    bump_credential_version(user['id'])
+    print(f"Password updated for {user['username']}")
+
+@app.cli.command('set-role')
+@click.argument('username')
+@click.argument('role', type=click.Choice(['admin', 'manager', 'user']))
+def set_role_command(username, role):
+    """Change a user's role and log out their existing sessions"""
+    user = find_user(username)
+    execute_db('UPDATE users SET role = ? WHERE id = ?', (role, user['id']))
+    bump_credential_version(user['id'])
+    print(f"{user['username']} is now {role}")
+
+@app.cli.command('deactivate-user')
+@click.argument('username')
+def deactivate_user_command(username):
+    """Block a user from signing in and log out their existing sessions"""
+    user = find_user(username)
+    execute_db('UPDATE users SET is_active = 0 WHERE id = ?', (user['id'],))
+    bump_credential_version(user['id'])
+    print(f"Deactivated {user['username']}")
+
+@app.cli.command('activate-user')
+@click.argument('username')
+def activate_user_command(username):
+    """Let a deactivated user sign in again"""
+    user = find_user(username)
+    execute_db('UPDATE users SET is_active = 1 WHERE id = ?', (user['id'],))
+    bump_credential_version(user['id'])
+    print(f"Activated {user['username']}")
+
 @app.route('/profile')
 @login_required
 def profile():
@@ -285,41 +1641,33 @@ def profile():
 def home():
     """Enhanced dashboard with statistics"""
     try:
-        # Get dashboard statistics
-        total_products = query_db('SELECT COUNT(*) as count FROM products')[0]['count']
-        total_stores = query_db('SELECT COUNT(*) as count FROM stores')[0]['count']
-        
         # Low stock alerts with safe default
         try:
             low_stock_threshold_row = query_db('SELECT value FROM settings WHERE key=?', ('low_stock_threshold',), one=True)
             low_stock_threshold = int(low_stock_threshold_row['value']) if low_stock_threshold_row else 10
         except:
             low_stock_threshold = 10
-            
-        low_stock_items = query_db('''
-            SELECT p.id, COALESCE(SUM(i.quantity), 0) as total_quantity
-            FROM products p 
-            LEFT JOIN inventories i ON p.id = i.product_id 
-            GROUP BY p.id
-            HAVING total_quantity <= ?
-        ''', (low_stock_threshold,))
         
-        low_stock_count = len(low_stock_items) if low_stock_items else 0
-        
-        # Total inventory value with safe default
-        try:
-            total_value_row = query_db('''
+        # The dashboard panels are independent; run them side by side
+        reads = parallel_queries(
+            total_products=('SELECT COUNT(*) as count FROM products WHERE discontinued_at IS NULL', (), True),
+            total_stores=('SELECT COUNT(*) as count FROM stores', (), True),
+            low_stock_count=('''
+                SELECT COUNT(*) as count FROM (
+                    SELECT p.id, COALESCE(SUM(i.quantity), 0) as total_quantity
+                    FROM products p 
+                    LEFT JOIN inventories i ON p.id = i.product_id 
+                    WHERE p.discontinued_at IS NULL
+                    GROUP BY p.id
+                    HAVING total_quantity <= ?
+                )
+            ''', (low_stock_threshold,), True),
+            total_value=('''
                 SELECT COALESCE(SUM(i.quantity * COALESCE(p.cost_price, 0)), 0) as value
                 FROM inventories i 
                 JOIN products p ON i.product_id = p.id
-            ''', one=True)
-            total_value = total_value_row['value'] if total_value_row else 0
-        except:
-            total_value = 0
-    
-        # Recent transactions with safe default
-        try:
-            recent_transactions = query_db('''
+            ''', (), True),
+            recent_transactions=('''
                 SELECT t.*, s.name as store_name, p.name as product_name, 
                        COALESCE(tt.name, 'manual') as transaction_type
                 FROM transactions t
@@ -328,30 +1676,49 @@ def home():
                 LEFT JOIN transaction_types tt ON t.transaction_type_id = tt.id
                 ORDER BY t.created_at DESC
                 LIMIT 10
-            ''')
-        except:
-            recent_transactions = []
-        
-        # Top products by quantity with safe default
-        try:
-            top_products = query_db('''
+            ''', ()),
+            top_products=('''
                 SELECT p.name, p.sku, COALESCE(SUM(i.quantity), 0) as total_quantity
                 FROM products p
                 LEFT JOIN inventories i ON p.id = i.product_id
+                WHERE p.discontinued_at IS NULL
                 GROUP BY p.id
                 ORDER BY total_quantity DESC
                 LIMIT 5
-            ''')
-        except:
-            top_products = []
+            ''', ()),
+        )
         
-        return render_template('dashboard.html', 
-                             total_products=total_products,
-                             total_stores=total_stores,
-                             low_stock_count=low_stock_count,
-                             total_value=total_value,
-                             recent_transactions=recent_transactions,
-                             top_products=top_products)
+        # Get dashboard statistics
+        total_products = reads['total_products'].result()['count']
+        total_stores = reads['total_stores'].result()['count']
+        low_stock_count = reads['low_stock_count'].result()['count']
+        
+        # Total inventory value with safe default
+        try:
+            total_value_row = reads['total_value'].result()
+            total_value = total_value_row['value'] if total_value_row else 0
+        except:
+            total_value = 0
+    
+        # Recent transactions with safe default
+        try:
+            recent_transactions = reads['recent_transactions'].result()
+        except:
+            recent_transactions = []
+        
+        # Top products by quantity with safe default
+        try:
+            top_products = reads['top_products'].result()
+        except:
+            top_products = []
+        
+        return render_template('dashboard.html', 
+                             total_products=total_products,
+                             total_stores=total_stores,
+                             low_stock_count=low_stock_count,
+                             total_value=total_value,
+                             recent_transactions=recent_transactions,
+                             top_products=top_products)
     
     except Exception as e:
         print(f"Dashboard error: {e}")
@@ -376,6 +1743,7 @@ def products_page():
             FROM products p
             LEFT JOIN categories c ON p.category_id = c.id
             LEFT JOIN suppliers s ON p.supplier_id = s.id
+            WHERE p.discontinued_at IS NULL
             ORDER BY COALESCE(p.created_at, p.id) DESC
         ''')
     except Exception as e:
@@ -406,12 +1774,12 @@ def stores_page():
     try:
         stores = query_db('''
             SELECT s.*, 
-                   COUNT(i.id) as product_count,
-                   COALESCE(SUM(i.quantity * COALESCE(p.cost_price, 0)), 0) as total_value
+                   COALESCE(ss.sku_count, 0) as product_count,
+                   COALESCE(ss.value_at_cost, 0) as total_value,
+                   COALESCE(ss.low_stock_count, 0) as low_stock_count,
+                   ss.last_activity
             FROM stores s
-            LEFT JOIN inventories i ON s.id = i.store_id
-            LEFT JOIN products p ON i.product_id = p.id
-            GROUP BY s.id, s.name, s.location, s.manager_name, s.phone, s.email, s.created_at
+            LEFT JOIN store_stats ss ON ss.store_id = s.id
             ORDER BY COALESCE(s.created_at, s.id) DESC
         ''')
     except Exception as e:
@@ -431,18 +1799,12 @@ def store_view(store_id):
         return redirect(url_for('stores_page'))
     
     # Get store statistics
-    inventory_count = query_db('SELECT COUNT(*) as count FROM inventories WHERE store_id=?', (store_id,), one=True)['count']
-    total_value = query_db('''
-        SELECT COALESCE(SUM(i.quantity * p.cost_price), 0) as value
-        FROM inventories i 
-        JOIN products p ON i.product_id = p.id
-        WHERE i.store_id = ?
-    ''', (store_id,), one=True)['value']
+    stats = query_db('SELECT * FROM store_stats WHERE store_id=?', (store_id,), one=True)
     
     return render_template('store.html', 
                          store=store,
-                         inventory_count=inventory_count,
-                         total_value=total_value)
+                         inventory_count=stats['sku_count'] if stats else 0,
+                         total_value=stats['value_at_cost'] if stats else 0)
 
 @app.route('/stock-receiving')
 @login_required
@@ -452,7 +1814,7 @@ def stock_receiving_page():
         # Get suppliers, stores, and products for receiving
         suppliers = query_db('SELECT * FROM suppliers ORDER BY name')
         stores = query_db('SELECT * FROM stores ORDER BY name')
-        products = query_db('SELECT * FROM products ORDER BY name')
+        products = query_db('SELECT * FROM products WHERE discontinued_at IS NULL ORDER BY name')
         
         # Get recent receiving history (simplified for existing schema)
         recent_receipts = query_db('''
@@ -497,165 +1859,156 @@ def stock_receiving_page():
 @app.route('/inventory-management')
 @login_required
 def inventory_management_page():
-    """Advanced inventory management page"""
+    """Advanced inventory management page; the grid itself is paged in from /api/inventory/grid"""
     try:
-        # Get inventory with full details
-        inventory_items = query_db('''
-            SELECT 
-                i.store_id, i.product_id, i.quantity, i.last_updated,
-                s.name as store_name, s.location as store_location,
-                p.name as product_name, p.sku, p.reorder_point,
-                c.id as category_id, c.name as category_name
-            FROM inventories i
-            JOIN stores s ON i.store_id = s.id
-            JOIN products p ON i.product_id = p.id
-            LEFT JOIN categories c ON p.category_id = c.id
-            ORDER BY s.name, p.name
-        ''')
-        
         stores = query_db('SELECT * FROM stores ORDER BY name')
-        products = query_db('SELECT * FROM products ORDER BY name')
+        products = query_db('SELECT * FROM products WHERE discontinued_at IS NULL ORDER BY name')
         categories = query_db('SELECT * FROM categories ORDER BY name')
         
         return render_template('inventory_management.html',
-                             inventory_items=inventory_items or [],
                              stores=stores or [],
                              products=products or [],
                              categories=categories or [])
     except Exception as e:
         print(f"Error in inventory management: {e}")
         return render_template('inventory_management.html',
-                             inventory_items=[], stores=[], products=[], categories=[])
+                             stores=[], products=[], categories=[])
 
 @app.route('/inventory')
 @login_required
 def inventory_page():
-    """New bulk inventory management page"""
+    """New bulk inventory management page; rows are paged in from /api/inventory/grid"""
     try:
-        # Get all inventory with store and product details
-        inventories = query_db('''
-            SELECT i.*, p.name as product_name, p.sku, 
-                   COALESCE(p.reorder_point, 10) as reorder_point,
-                   s.name as store_name, 
-                   COALESCE(c.name, 'Uncategorized') as category_name,
-                   CASE WHEN i.quantity <= COALESCE(p.reorder_point, 10) THEN 1 ELSE 0 END as low_stock
-            FROM inventories i
-            JOIN products p ON i.product_id = p.id
-            JOIN stores s ON i.store_id = s.id
-            LEFT JOIN categories c ON p.category_id = c.id
-            ORDER BY low_stock DESC, i.last_updated DESC
-        ''')
+        stores = query_db('SELECT id, name FROM stores ORDER BY name')
+        categories = query_db('SELECT id, name FROM categories ORDER BY name')
     except Exception as e:
         print(f"Inventory page error: {e}")
-        inventories = []
+        stores = []
+        categories = []
     
-    return render_template('inventory.html', inventories=inventories)
+    return render_template('inventory.html', stores=stores, categories=categories)
 
 @app.route('/reports')
 @login_required
 def reports_page():
     """New reports and analytics page"""
-    try:
-        # Inventory summary by category
-        category_summary = query_db('''
-            SELECT COALESCE(c.name, 'Uncategorized') as category, 
-                   COUNT(DISTINCT p.id) as product_count,
-                   COALESCE(SUM(i.quantity), 0) as total_quantity,
-                   COALESCE(SUM(i.quantity * COALESCE(p.cost_price, 0)), 0) as total_value
-            FROM products p
-            LEFT JOIN categories c ON p.category_id = c.id
-            LEFT JOIN inventories i ON p.id = i.product_id
-            GROUP BY COALESCE(c.id, 0), COALESCE(c.name, 'Uncategorized')
-            ORDER BY total_value DESC
-        ''')
-    except Exception as e:
-        print(f"Category summary error: {e}")
-        category_summary = []
+    sections = {name: report_params(name, {}) for name in
+                ('category_summary', 'store_summary', 'transaction_summary')}
+    # Scheduled report jobs keep these precomputed; compute any missing ones live, side by side
+    cached = {}
+    for name, params in sections.items():
+        try:
+            cached[name] = cached_report(name, params)
+        except sqlite3.Error as e:
+            print(f"Report cache error: {e}")
+            cached[name] = None
+    reads = parallel_queries(**{name: REPORTS[name]['build'](params)
+                                for name, params in sections.items() if not cached[name]})
     
-    try:
-        # Store summary
-        store_summary = query_db('''
-            SELECT s.name as store_name,
-                   COUNT(DISTINCT i.product_id) as unique_products,
-                   COALESCE(SUM(i.quantity), 0) as total_items,
-                   COALESCE(SUM(i.quantity * COALESCE(p.cost_price, 0)), 0) as total_value
-            FROM stores s
-            LEFT JOIN inventories i ON s.id = i.store_id
-            LEFT JOIN products p ON i.product_id = p.id
-            GROUP BY s.id, s.name
-            ORDER BY total_value DESC
-        ''')
-    except Exception as e:
-        print(f"Store summary error: {e}")
-        store_summary = []
+    summaries = {}
+    for name in sections:
+        try:
+            summaries[name] = cached[name]['rows'] if cached[name] else reads[name].result()
+        except Exception as e:
+            print(f"{name.replace('_', ' ').capitalize()} error: {e}")
+            summaries[name] = []
     
     try:
-        # Transaction summary by type
-        transaction_summary = query_db('''
-            SELECT COALESCE(tt.name, 'manual') as transaction_type,
-                   COUNT(t.id) as transaction_count,
-                   SUM(t.change) as total_change
-            FROM transactions t
-            LEFT JOIN transaction_types tt ON t.transaction_type_id = tt.id
-            WHERE t.created_at >= date('now', '-30 days')
-            GROUP BY COALESCE(tt.id, 0), COALESCE(tt.name, 'manual')
-            ORDER BY transaction_count DESC
-        ''')
+        catalog_analytics.refresh(get_db())
+        classes = catalog_analytics.classify()
+        abc_xyz = {'as_of': classes['as_of'], 'weeks': classes['weeks'], 'cells': class_matrix(classes)}
+    except AnalyticsUnavailable:
+        abc_xyz = None
     except Exception as e:
-        print(f"Transaction summary error: {e}")
-        transaction_summary = []
+        print(f"ABC/XYZ error: {e}")
+        abc_xyz = None
     
+    computed = [c['computed_at'] for c in cached.values() if c]
     return render_template('reports.html',
-                         category_summary=category_summary,
-                         store_summary=store_summary,
-                         transaction_summary=transaction_summary)
+                         abc_xyz=abc_xyz,
+                         category_summary=summaries['category_summary'],
+                         store_summary=summaries['store_summary'],
+                         transaction_summary=summaries['transaction_summary'],
+                         report_as_of=min(computed) if computed else None)
 
 @app.route('/transactions')
 @login_required
 def transactions_page():
     """New transaction history page"""
-    page = request.args.get('page', 1, type=int)
     per_page = 50
-    offset = (page - 1) * per_page
+    after = request.args.get('after')
+    before = request.args.get('before')
     
     # Get filters
-    store_filter = request.args.get('store', '')
-    product_filter = request.args.get('product', '')
+    store_filter = request.args.get('store', '').strip()
+    product_filter = request.args.get('product', '').strip()
     type_filter = request.args.get('type', '')
+    date_from = request.args.get('date_from', '')
+    date_to = request.args.get('date_to', '')
     
-    # Build query with filters
+    # Resolve names to ids up front so the ledger is filtered on its own
+    # indexed columns rather than LIKE over the joined store/product names
     where_conditions = []
     params = []
+    no_match = False
     
-    if store_filter:
-        where_conditions.append('s.name LIKE ?')
-        params.append(f'%{store_filter}%')
-    
-    if product_filter:
-        where_conditions.append('p.name LIKE ?')
-        params.append(f'%{product_filter}%')
+    try:
+        if store_filter:
+            store_ids = match_name_ids('stores', store_filter)
+            no_match = no_match or not store_ids
+            where_conditions.append('t.store_id IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(store_ids))
+        
+        if product_filter:
+            product_ids = match_name_ids('products', product_filter)
+            no_match = no_match or not product_ids
+            where_conditions.append('t.product_id IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(product_ids))
+        
+        if type_filter:
+            type_row = query_db('SELECT id FROM transaction_types WHERE name = ?', (type_filter,), one=True)
+            if not type_row:
+                no_match = True
+            elif type_filter == 'manual':
+                # Legacy rows without a type are shown as manual
+                where_conditions.append('(t.transaction_type_id = ? OR t.transaction_type_id IS NULL)')
+                params.append(type_row['id'])
+            else:
+                where_conditions.append('t.transaction_type_id = ?')
+                params.append(type_row['id'])
+    except Exception as e:
+        print(f"Transaction filter error: {e}")
+        no_match = True
     
-    if type_filter:
-        where_conditions.append('COALESCE(tt.name, "manual") = ?')
-        params.append(type_filter)
+    if date_from:
+        where_conditions.append('t.created_at >= ?')
+        params.append(date_from)
     
-    where_clause = 'WHERE ' + ' AND '.join(where_conditions) if where_conditions else ''
+    if date_to:
+        where_conditions.append("t.created_at < date(?, '+1 day')")
+        params.append(date_to)
     
-    try:
-        transactions = query_db(f'''
-            SELECT t.*, s.name as store_name, p.name as product_name, p.sku,
-                   COALESCE(tt.name, 'manual') as transaction_type
-            FROM transactions t
-            JOIN stores s ON t.store_id = s.id
-            JOIN products p ON t.product_id = p.id
-            LEFT JOIN transaction_types tt ON t.transaction_type_id = tt.id
-            {where_clause}
-            ORDER BY t.created_at DESC
-            LIMIT ? OFFSET ?
-        ''', params + [per_page, offset])
-    except Exception as e:
-        print(f"Transactions query error: {e}")
-        transactions = []
+    transactions = []
+    next_cursor = prev_cursor = None
+    total, total_exact = 0, True
+    if not no_match:
+        try:
+            # Only read the archive partitions the date range can touch
+            sources = transaction_partitions(date_from or None, date_to or None)
+            transactions, next_cursor, prev_cursor = keyset_paginate('''
+                SELECT t.*, s.name as store_name, p.name as product_name, p.sku,
+                       COALESCE(tt.name, 'manual') as transaction_type
+                FROM {source} t
+                JOIN stores s ON t.store_id = s.id
+                JOIN products p ON t.product_id = p.id
+                LEFT JOIN transaction_types tt ON t.transaction_type_id = tt.id
+            ''', where_conditions, params, [('t.created_at', 'created_at'), ('t.id', 'id')], per_page,
+                after=after, before=before, sources=sources)
+            source_sql, source_params = transaction_source(sources, where_conditions, params,
+                                                           limit=COUNT_ESTIMATE_CAP + 1)
+            total, total_exact = estimate_count(f'{source_sql} t', where_conditions, source_params + params)
+        except Exception as e:
+            print(f"Transactions query error: {e}")
     
     # Get filter options
     try:
@@ -675,12 +2028,17 @@ def transactions_page():
                          current_filters={
                              'store': store_filter,
                              'product': product_filter,
-                             'type': type_filter
+                             'type': type_filter,
+                             'date_from': date_from,
+                             'date_to': date_to
                          },
-                         page=page)
+                         total=total,
+                         total_exact=total_exact,
+                         next_cursor=next_cursor,
+                         prev_cursor=prev_cursor)
 
 @app.route('/settings')
-@login_required
+@role_required('admin', 'manager')
 def settings_page():
     """New settings page"""
     try:
@@ -707,7 +2065,7 @@ def settings_page():
 @app.route('/api/inventories/<int:store_id>')
 def api_inventories(store_id):
     """Get inventory for a specific store"""
-    rows = query_db('''
+    return list_response('''
         SELECT i.id, p.id AS product_id, p.sku, p.name, i.quantity, i.last_updated,
                p.reorder_point, c.name as category_name,
                CASE WHEN i.quantity <= p.reorder_point THEN 1 ELSE 0 END as low_stock
@@ -717,7 +2075,6 @@ def api_inventories(store_id):
         WHERE i.store_id = ?
         ORDER BY low_stock DESC, p.name
     ''', (store_id,))
-    return jsonify([dict(r) for r in rows])
 
 @app.route('/api/inventory/update', methods=['POST'])
 def api_update_inventory():
@@ -765,6 +2122,78 @@ def api_update_inventory():
     
     return jsonify({'status': 'ok', 'reference_number': reference_number})
 
+INVENTORY_GRID_SORTS = {
+    # Walks the UNIQUE(store_id, product_id) index, so the default view needs no sort step
+    'store': [('i.store_id', 'store_id'), ('i.product_id', 'product_id')],
+    'product': [('p.name', 'product_name'), ('s.name', 'store_name'), ('i.id', 'id')],
+    'sku': [('p.sku', 'sku'), ('i.id', 'id')],
+    'quantity': [('i.quantity', 'quantity'), ('i.id', 'id')],
+    'updated': [('i.last_updated', 'last_updated'), ('i.id', 'id')],
+}
+
+@app.route('/api/inventory/grid')
+def api_inventory_grid():
+    """Filtered, sorted, keyset-paginated inventory rows for the inventory grids.
+
+    Filters: store_id, category_id, status (low|out|good), q (product name/SKU).
+    Sorting: sort (store|product|sku|quantity|updated) and order (asc|desc).
+    Returns {items, next_cursor}; pass next_cursor back as ?after= for the next page.
+    """
+    limit = min(request.args.get('limit', 100, type=int), 500)
+    sort = request.args.get('sort', 'store')
+    descending = request.args.get('order', 'asc') == 'desc'
+    if sort not in INVENTORY_GRID_SORTS:
+        return jsonify({'error': f'Sort must be one of: {", ".join(INVENTORY_GRID_SORTS)}'}), 400
+    
+    where_conditions = ['p.discontinued_at IS NULL']
+    params = []
+    
+    store_id = request.args.get('store_id', type=int)
+    if store_id:
+        where_conditions.append('i.store_id = ?')
+        params.append(store_id)
+    
+    category_id = request.args.get('category_id', type=int)
+    if category_id:
+        where_conditions.append('p.category_id = ?')
+        params.append(category_id)
+    
+    status = request.args.get('status')
+    if status == 'out':
+        where_conditions.append('i.quantity = 0')
+    elif status == 'low':
+        where_conditions.append('i.quantity > 0 AND i.quantity <= COALESCE(p.reorder_point, 10)')
+    elif status == 'good':
+        where_conditions.append('i.quantity > COALESCE(p.reorder_point, 10)')
+    
+    text = request.args.get('q', '').strip()
+    if text:
+        where_conditions.append('(p.name LIKE ? OR p.sku LIKE ?)')
+        params.extend([f'%{text}%', f'%{text}%'])
+    
+    try:
+        rows, next_cursor, _ = keyset_paginate('''
+            SELECT i.id, i.store_id, i.product_id, i.quantity, i.last_updated,
+                   s.name as store_name, s.location as store_location,
+                   p.name as product_name, p.sku,
+                   COALESCE(p.reorder_point, 10) as reorder_point,
+                   c.id as category_id, COALESCE(c.name, '') as category_name,
+                   CASE
+                       WHEN i.quantity = 0 THEN 'out'
+                       WHEN i.quantity <= COALESCE(p.reorder_point, 10) THEN 'low'
+                       ELSE 'good'
+                   END as stock_status
+            FROM inventories i
+            JOIN stores s ON i.store_id = s.id
+            JOIN products p ON i.product_id = p.id
+            LEFT JOIN categories c ON p.category_id = c.id
+        ''', where_conditions, params, INVENTORY_GRID_SORTS[sort], limit,
+            after=request.args.get('after'), descending=descending)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': [dict(r) for r in rows], 'next_cursor': next_cursor})
+
 @app.route('/api/inventory/item')
 def api_get_inventory_item():
     """Get specific inventory item details"""
@@ -1036,7 +2465,7 @@ def api_bulk_add_stock():
 def api_low_stock_alerts():
     """Get low stock alerts"""
     try:
-        low_stock_items = query_db('''
+        return list_response('''
             SELECT 
                 p.id as product_id, p.name as product_name, p.sku,
                 p.reorder_point,
@@ -1055,6 +2484,7 @@ def api_low_stock_alerts():
             LEFT JOIN categories c ON p.category_id = c.id
             LEFT JOIN suppliers sup ON p.supplier_id = sup.id
             WHERE COALESCE(i.quantity, 0) <= COALESCE(p.reorder_point, 0)
+              AND p.discontinued_at IS NULL
             ORDER BY 
                 CASE 
                     WHEN COALESCE(i.quantity, 0) = 0 THEN 1
@@ -1063,8 +2493,6 @@ def api_low_stock_alerts():
                 END,
                 p.name
         ''')
-        
-        return jsonify([dict(item) for item in (low_stock_items or [])])
     except Exception as e:
         print(f"Low stock alerts error: {e}")
         return jsonify([]), 500
@@ -1088,6 +2516,7 @@ def api_reorder_suggestions():
             LEFT JOIN suppliers sup ON p.supplier_id = sup.id
             WHERE COALESCE(i.quantity, 0) <= COALESCE(p.reorder_point, 0)
               AND COALESCE(p.reorder_point, 0) > 0
+              AND p.discontinued_at IS NULL
             ORDER BY 
                 CASE WHEN COALESCE(i.quantity, 0) = 0 THEN 1 ELSE 2 END,
                 p.name
@@ -1200,6 +2629,10 @@ def api_delete_transaction(transaction_id):
         # Check if transaction exists
         transaction = query_db('SELECT * FROM transactions WHERE id=?', (transaction_id,), one=True)
         if not transaction:
+            # Archived months are closed; their transactions can no longer be reversed
+            for table in transaction_partitions()[1:]:
+                if query_db(f'SELECT 1 FROM {table} WHERE id=?', (transaction_id,), one=True):
+                    return jsonify({'error': 'Transaction is in an archived month and cannot be deleted'}), 400
             return jsonify({'error': 'Transaction not found'}), 404
         
         # Reverse the inventory change
@@ -1348,6 +2781,157 @@ def api_create_product():
     
     return redirect(url_for('products_page'))
 
+# --- SKU lookup index ---
+class SkuIndex:
+    """Per-process SKU -> product map plus a sorted SKU list for prefix autocomplete.
+
+    products.sku is unique case-sensitively, so the index is keyed on the
+    exact SKU; a code in another case still resolves when it matches only one
+    SKU. Discontinued products are left out. The index catches up from the
+    product_changes log before each lookup, so product writes from any
+    endpoint or worker show up without reloading the whole catalog.
+    """
+    COLUMNS = 'id, sku, name, reorder_point, cost_price, sell_price'
+    FULL_RELOAD_THRESHOLD = 5000  # Pending changes beyond this reload everything
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.products = {}  # SKU -> product dict
+        self.sku_by_id = {}  # product id -> SKU
+        self.folded = {}  # upper-cased SKU -> set of SKUs
+        self.skus = []  # sorted (upper-cased SKU, SKU) pairs
+        self.last_seq = None
+    
+    @staticmethod
+    def normalize(code):
+        return str(code).strip()
+    
+    def sync(self, db):
+        """Apply product changes logged since the last sync"""
+        with self.lock:
+            oldest, latest = db.execute('''
+                SELECT (SELECT MIN(seq) FROM product_changes), (SELECT COALESCE(MAX(seq), 0) FROM product_changes)
+            ''').fetchone()
+            if latest == self.last_seq:
+                return
+            if (self.last_seq is None or latest - self.last_seq > self.FULL_RELOAD_THRESHOLD
+                    or (oldest is not None and oldest > self.last_seq + 1)):
+                # First use, a large batch, or the log was trimmed past our position
+                self._reload(db)
+            else:
+                changed = [row[0] for row in db.execute(
+                    'SELECT DISTINCT product_id FROM product_changes WHERE seq > ? AND seq <= ?',
+                    (self.last_seq, latest))]
+                self._refresh(db, changed)
+            self.last_seq = latest
+    
+    def _reload(self, db):
+        products = {}
+        sku_by_id = {}
+        folded = {}
+        for row in db.execute(f'SELECT {self.COLUMNS} FROM products WHERE discontinued_at IS NULL'):
+            key = self.normalize(row['sku'])
+            products[key] = dict(row)
+            sku_by_id[row['id']] = key
+            folded.setdefault(key.upper(), set()).add(key)
+        self.products = products
+        self.sku_by_id = sku_by_id
+        self.folded = folded
+        self.skus = sorted((key.upper(), key) for key in products)
+    
+    def _remove(self, key, product_id):
+        # Only drop a key this product still owns; another product may hold it now
+        product = self.products.get(key)
+        if product is None or product['id'] != product_id:
+            return
+        del self.products[key]
+        entry = (key.upper(), key)
+        position = bisect.bisect_left(self.skus, entry)
+        if position < len(self.skus) and self.skus[position] == entry:
+            del self.skus[position]
+        variants = self.folded.get(entry[0])
+        if variants is not None:
+            variants.discard(key)
+            if not variants:
+                del self.folded[entry[0]]
+    
+    def _refresh(self, db, product_ids):
+        for product_id in product_ids:
+            old_key = self.sku_by_id.pop(product_id, None)
+            if old_key is not None:
+                self._remove(old_key, product_id)
+        
+        for start in range(0, len(product_ids), 500):
+            chunk = product_ids[start:start + 500]
+            placeholders = ','.join('?' for _ in chunk)
+            for row in db.execute(f'SELECT {self.COLUMNS} FROM products WHERE id IN ({placeholders}) '
+                                  'AND discontinued_at IS NULL', chunk):
+                key = self.normalize(row['sku'])
+                if key not in self.products:
+                    bisect.insort(self.skus, (key.upper(), key))
+                    self.folded.setdefault(key.upper(), set()).add(key)
+                else:
+                    self.sku_by_id.pop(self.products[key]['id'], None)
+                self.products[key] = dict(row)
+                self.sku_by_id[row['id']] = key
+    
+    def lookup(self, code):
+        key = self.normalize(code)
+        product = self.products.get(key)
+        if product is None:
+            variants = self.folded.get(key.upper())
+            if variants is not None and len(variants) == 1:
+                product = self.products.get(next(iter(variants)))
+        return product
+    
+    def autocomplete(self, prefix, limit=10):
+        prefix = self.normalize(prefix).upper()
+        with self.lock:
+            start = bisect.bisect_left(self.skus, (prefix,))
+            matches = []
+            for folded, key in self.skus[start:start + limit]:
+                if not folded.startswith(prefix):
+                    break
+                matches.append(self.products[key])
+        return matches
+
+sku_index = SkuIndex()
+
+@app.route('/api/products/lookup', methods=['GET', 'POST'])
+def api_lookup_products():
+    """Resolve scanned SKUs to products from the in-memory index.
+
+    GET ?code=<sku> for one code, or POST {"codes": [...]} for up to 1000 at once.
+    """
+    if request.method == 'POST':
+        data = request.get_json(force=True) or {}
+        codes = data.get('codes')
+        if not isinstance(codes, list):
+            return jsonify({'error': 'codes must be a list'}), 400
+    else:
+        codes = request.args.getlist('code')
+    
+    if not codes:
+        return jsonify({'error': 'No codes provided'}), 400
+    if len(codes) > 1000:
+        return jsonify({'error': 'At most 1000 codes per request'}), 400
+    
+    sku_index.sync(get_db())
+    results = [{'code': code, 'product': sku_index.lookup(code)} for code in codes]
+    missing = [r['code'] for r in results if r['product'] is None]
+    return jsonify({'results': results, 'missing': missing})
+
+@app.route('/api/products/autocomplete')
+def api_autocomplete_products():
+    """Products whose SKU starts with ?prefix=, in SKU order"""
+    prefix = request.args.get('prefix', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    if not prefix:
+        return jsonify([])
+    
+    sku_index.sync(get_db())
+    return jsonify(sku_index.autocomplete(prefix, limit))
+
 @app.route('/api/product/<int:product_id>', methods=['GET'])
 def api_get_product(product_id):
     """Get individual product data"""
@@ -1408,15 +2992,244 @@ def api_delete_product(product_id):
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        # Delete related data first
-        execute_db('DELETE FROM inventories WHERE product_id = ?', (product_id,))
-        execute_db('DELETE FROM transactions WHERE product_id = ?', (product_id,))
-        execute_db('DELETE FROM products WHERE id = ?', (product_id,))
+        # Delete related data first, committing once
+        db = get_db()
+        purge_products(db, [product_id])
+        db.commit()
         
         return jsonify({'status': 'ok', 'message': 'Product deleted successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+# --- Batch product sync ---
+# Catalog feeds post thousands of products at once, keyed on SKU. Rows are
+# validated up front, then written PRODUCT_BATCH_CHUNK at a time: each chunk
+# is one transaction with an executemany INSERT for new SKUs and an
+# executemany UPDATE for existing ones per set of supplied columns. Updates
+# that would not change anything are skipped, so they fire no triggers. In
+# large chunks the per-row store_stats price trigger is swapped for one
+# set-based update.
+PRODUCT_BATCH_FIELDS = {
+    'name': lambda value: None if value is None else str(value).strip() or None,
+    'description': lambda value: None if value is None else str(value),
+    'category_id': lambda value: None if value in (None, '') else whole_number(value),
+    'supplier_id': lambda value: None if value in (None, '') else whole_number(value),
+    'cost_price': lambda value: non_negative(real_number(value)),
+    'sell_price': lambda value: non_negative(real_number(value)),
+    'reorder_point': lambda value: non_negative(whole_number(value)),
+}
+
+def real_number(value):
+    if isinstance(value, bool):
+        raise ValueError('must be a number')
+    return float(value)
+
+def whole_number(value):
+    # int() would quietly truncate 1.7 to 1 and accept true as 1
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError('must be a whole number')
+    return int(value)
+
+def non_negative(value):
+    if not math.isfinite(value):
+        raise ValueError('must be a finite number')
+    if value < 0:
+        raise ValueError('must not be negative')
+    return value
+
+def parse_product_row(raw):
+    """(sku, {field: value}) for one batch row; raises ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError('row must be an object')
+    sku = str(raw.get('sku') or '').strip()
+    if not sku:
+        raise ValueError('sku is required')
+    unknown = set(raw) - set(PRODUCT_BATCH_FIELDS) - {'sku'}
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    fields = {}
+    for field, parse in PRODUCT_BATCH_FIELDS.items():
+        if field in raw:
+            try:
+                fields[field] = parse(raw[field])
+            except (TypeError, ValueError) as e:
+                raise ValueError(f'Invalid {field}: {e}')
+    if 'name' in fields and fields['name'] is None:
+        raise ValueError('name must not be empty')
+    return sku, fields
+
+def product_batch_rows():
+    """Yield (row number, raw row or ValueError) from a JSON array or an NDJSON body, read line by line"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for number, line in enumerate(request.stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, ValueError(f'Invalid JSON: {e}')
+        return
+    
+    data = request.get_json(force=True, silent=True)
+    rows = data.get('products') if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise ValueError('Body must be a JSON array, {"products": [...]} or NDJSON')
+    yield from enumerate(rows, 1)
+
+def upsert_product_chunk(db, rows, mode, references):
+    """Write one chunk of parsed rows in a single transaction; returns (created, updated, conflicts)"""
+    conflicts = []
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        existing = {row['sku']: row for row in db.execute(
+            'SELECT id, sku, discontinued_at FROM products WHERE sku IN (SELECT value FROM json_each(?))',
+            (json.dumps([sku for _, sku, _ in rows]),))}
+        
+        groups = {}  # (new?, supplied columns) -> params
+        for number, sku, fields in rows:
+            current = existing.get(sku)
+            error = None
+            if current is None and mode == 'update':
+                error = 'Unknown SKU'
+            elif current is not None and mode == 'create':
+                error = 'SKU already exists'
+            elif current is not None and current['discontinued_at']:
+                error = 'Product is discontinued'
+            elif current is None and not fields.get('name'):
+                error = 'name is required for new products'
+            else:
+                for field, table in (('category_id', 'categories'), ('supplier_id', 'suppliers')):
+                    if fields.get(field) is not None and fields[field] not in references[table]:
+                        error = f'Unknown {field} {fields[field]}'
+            if error:
+                conflicts.append({'row': number, 'sku': sku, 'error': error})
+                continue
+            columns = tuple(sorted(fields))
+            groups.setdefault((current is None, columns), []).append(
+                tuple(fields[column] for column in columns) + (sku,))
+        
+        # Large chunks apply price/reorder point changes to store_stats once, set-based
+        defer_stats = len(existing) >= app.config['PRODUCT_BATCH_DEFER_STATS']
+        if defer_stats:
+            db.execute('''CREATE TEMP TABLE IF NOT EXISTS product_batch_prices (
+                              product_id INTEGER PRIMARY KEY, cost_price REAL, sell_price REAL, reorder_point INTEGER)''')
+            db.execute('DELETE FROM temp.product_batch_prices')
+            db.executemany('''INSERT INTO temp.product_batch_prices
+                              SELECT id, cost_price, sell_price, reorder_point FROM products WHERE id = ?''',
+                           [(row['id'],) for row in existing.values()])
+            db.execute('INSERT INTO store_stats_deferred (id) VALUES (1)')
+        
+        created = updated = 0
+        for (new, columns), params in groups.items():
+            if new:
+                created += db.executemany(f'''
+                    INSERT INTO products ({', '.join(columns)}, sku) VALUES ({', '.join('?' for _ in columns)}, ?)
+                ''', params).rowcount
+            elif columns:
+                # Rows matching what is stored are skipped, so they log no change and fire no triggers
+                numbered = [(column, f'?{index}') for index, column in enumerate(columns, 1)]
+                updated += db.executemany(f'''
+                    UPDATE products SET {', '.join(f'{column} = {param}' for column, param in numbered)}
+                    WHERE sku = ?{len(columns) + 1}
+                      AND ({' OR '.join(f'{column} IS NOT {param}' for column, param in numbered)})
+                ''', params).rowcount
+        
+        if defer_stats:
+            db.execute('''
+                UPDATE store_stats SET value_at_cost = value_at_cost + d.cost_delta,
+                                       value_at_price = value_at_price + d.price_delta,
+                                       low_stock_count = low_stock_count + d.low_stock_delta
+                FROM (
+                    SELECT i.store_id,
+                           SUM(i.quantity * (COALESCE(p.cost_price, 0) - COALESCE(o.cost_price, 0))) AS cost_delta,
+                           SUM(i.quantity * (COALESCE(p.sell_price, 0) - COALESCE(o.sell_price, 0))) AS price_delta,
+                           SUM(COALESCE(i.quantity <= p.reorder_point, 0)
+                               - COALESCE(i.quantity <= o.reorder_point, 0)) AS low_stock_delta
+                    FROM temp.product_batch_prices o
+                    JOIN products p ON p.id = o.product_id
+                    JOIN inventories i ON i.product_id = o.product_id
+                    WHERE p.cost_price IS NOT o.cost_price OR p.sell_price IS NOT o.sell_price
+                       OR p.reorder_point IS NOT o.reorder_point
+                    GROUP BY i.store_id
+                ) d
+                WHERE store_stats.store_id = d.store_id
+            ''')
+            db.execute('DELETE FROM store_stats_deferred')
+        db.execute('COMMIT')
+    except Exception:
+        db.execute('ROLLBACK')
+        raise
+    return created, updated, conflicts
+
+@app.route('/api/products/batch', methods=['POST'])
+@role_required('admin', 'manager')
+def api_batch_products():
+    """Create or update many products keyed on SKU from a JSON array or NDJSON (?mode=upsert|create|update)"""
+    mode = request.args.get('mode', 'upsert')
+    if mode not in ('upsert', 'create', 'update'):
+        return jsonify({'error': 'mode must be upsert, create or update'}), 400
+    
+    db = get_db()
+    references = {table: {row[0] for row in db.execute(f'SELECT id FROM {table}')}
+                  for table in ('categories', 'suppliers')}
+    chunk_size = app.config['PRODUCT_BATCH_CHUNK']
+    totals = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'chunks': 0}
+    conflicts = []
+    seen = {}
+    chunk = []
+    
+    def flush():
+        created, updated, chunk_conflicts = upsert_product_chunk(db, chunk, mode, references)
+        totals['created'] += created
+        totals['updated'] += updated
+        totals['unchanged'] += len(chunk) - len(chunk_conflicts) - created - updated
+        totals['chunks'] += 1
+        conflicts.extend(chunk_conflicts)
+        chunk.clear()
+    
+    started = time.perf_counter()
+    try:
+        for number, raw in product_batch_rows():
+            totals['rows'] += 1
+            if totals['rows'] > app.config['PRODUCT_BATCH_MAX_ROWS']:
+                conflicts.append({'row': number, 'sku': None,
+                                  'error': f"Batch limit of {app.config['PRODUCT_BATCH_MAX_ROWS']} rows reached"})
+                totals['rows'] -= 1
+                break
+            try:
+                if isinstance(raw, ValueError):
+                    raise raw
+                sku, fields = parse_product_row(raw)
+            except ValueError as e:
+                conflicts.append({'row': number, 'sku': raw.get('sku') if isinstance(raw, dict) else None,
+                                  'error': str(e)})
+                continue
+            if sku in seen:
+                conflicts.append({'row': number, 'sku': sku, 'error': f'Duplicate SKU (row {seen[sku]})'})
+                continue
+            seen[sku] = number
+            chunk.append((number, sku, fields))
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        print(f"Product batch error: {e}")
+        return jsonify({'error': str(e), **totals}), 500
+    
+    sku_index.sync(db)  # Catch this worker's index up once for the whole batch
+    conflicts.sort(key=lambda conflict: conflict['row'])
+    limit = app.config['PRODUCT_BATCH_MAX_CONFLICTS']
+    return jsonify({
+        'status': 'partial' if conflicts else 'ok',
+        **totals,
+        'seconds': round(time.perf_counter() - started, 3),
+        'conflict_count': len(conflicts),
+        'conflicts': conflicts[:limit],
+    })
+
 @app.route('/api/store', methods=['POST'])
 def api_create_store():
     """Enhanced store creation"""
@@ -1466,6 +3279,29 @@ def api_get_stores():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stores/stats')
+def api_store_stats():
+    """Precomputed totals for every store, or one store with ?store_id="""
+    conditions, params = [], []
+    if request.args.get('store_id'):
+        try:
+            params.append(int(request.args['store_id']))
+        except ValueError:
+            return jsonify({'error': 'store_id must be an integer'}), 400
+        conditions.append('s.id = ?')
+    
+    return list_response(f'''
+        SELECT s.id AS store_id, s.name AS store_name,
+               COALESCE(ss.sku_count, 0) AS sku_count, COALESCE(ss.units, 0) AS units,
+               ROUND(COALESCE(ss.value_at_cost, 0), 2) AS value_at_cost,
+               ROUND(COALESCE(ss.value_at_price, 0), 2) AS value_at_price,
+               COALESCE(ss.low_stock_count, 0) AS low_stock_count, ss.last_activity
+        FROM stores s
+        LEFT JOIN store_stats ss ON ss.store_id = s.id
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY s.name
+    ''', params)
+
 @app.route('/api/store/<int:store_id>', methods=['GET'])
 def api_get_store(store_id):
     """Get individual store data"""
@@ -1520,10 +3356,10 @@ def api_delete_store(store_id):
         if not store:
             return jsonify({'error': 'Store not found'}), 404
         
-        # Delete related data first
-        execute_db('DELETE FROM inventories WHERE store_id = ?', (store_id,))
-        execute_db('DELETE FROM transactions WHERE store_id = ?', (store_id,))
-        execute_db('DELETE FROM stores WHERE id = ?', (store_id,))
+        # Delete related data first, committing once
+        db = get_db()
+        purge_stores(db, [store_id])
+        db.commit()
         
         return jsonify({'status': 'ok', 'message': 'Store deleted successfully'})
     except Exception as e:
@@ -1647,17 +3483,1125 @@ def api_delete_supplier(supplier_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/transactions')
-def api_transactions():
-    """Enhanced transactions endpoint with filtering"""
-    limit = min(int(request.args.get('limit', 200)), 1000)  # Max 1000 records
-    store_id = request.args.get('store_id')
-    product_id = request.args.get('product_id')
-    transaction_type = request.args.get('transaction_type')
-    days = int(request.args.get('days', 30))
+# --- Bulk purge jobs ---
+# Bulk deletes run on a single background worker, a chunk of ids at a time,
+# and record their progress in the jobs table so clients can poll
+# /api/jobs/<id>. Each transaction deletes at most PURGE_ROW_LIMIT dependent
+# rows, with a short pause in between, so a chunk of busy stores never holds
+# the write lock for long; the parent rows go last.
+purge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge')
+
+def ledger_tables(db):
+    """The hot transactions table plus every archive partition"""
+    return ['transactions'] + [row[0] for row in db.execute('SELECT name FROM transaction_partitions')]
+
+def delete_dependents(db, column, ids, limit=None):
+    """Delete up to limit inventory and ledger rows whose column is in ids; True once none are left"""
+    for table in ['inventories'] + ledger_tables(db):
+        if limit is None:
+            db.execute(f'DELETE FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))', (ids,))
+            continue
+        limit -= db.execute(f'''
+            DELETE FROM {table} WHERE rowid IN (
+                SELECT rowid FROM {table} WHERE {column} IN (SELECT value FROM json_each(?)) LIMIT ?)
+        ''', (ids, limit)).rowcount
+        if limit <= 0:
+            return False
+    return True
+
+def purge_products(db, product_ids, limit=None):
+    """Delete products with their inventory and ledger rows, limit dependent rows per call (caller commits).
+
+    Returns True once the products themselves are gone; call again until it does.
+    """
+    ids = json.dumps(product_ids)
+    if not delete_dependents(db, 'product_id', ids, limit):
+        return False
+    db.execute('DELETE FROM products WHERE id IN (SELECT value FROM json_each(?))', (ids,))
+    return True
+
+def discontinue_products(db, product_ids, limit=None):
+    """Hide products from the catalog while keeping their stock and ledger history (caller commits)"""
+    db.execute('''
+        UPDATE products SET discontinued_at = CURRENT_TIMESTAMP
+        WHERE id IN (SELECT value FROM json_each(?)) AND discontinued_at IS NULL
+    ''', (json.dumps(product_ids),))
+    return True
+
+def purge_stores(db, store_ids, limit=None):
+    """Delete stores with their inventory and ledger rows, limit dependent rows per call (caller commits)"""
+    ids = json.dumps(store_ids)
+    if not delete_dependents(db, 'store_id', ids, limit):
+        return False
+    db.execute('DELETE FROM stores WHERE id IN (SELECT value FROM json_each(?))', (ids,))
+    return True
+
+JOB_HANDLERS = {
+    'purge_products': purge_products,
+    'discontinue_products': discontinue_products,
+    'purge_stores': purge_stores,
+}
+
+def run_purge_job(job_id):
+    """Work through a queued job chunk by chunk, resuming from its recorded progress"""
+    db = sqlite3.connect(app.config['DATABASE'], isolation_level=None, timeout=30)
+    try:
+        kind, params, processed = db.execute('SELECT kind, params, processed FROM jobs WHERE id = ?',
+                                             (job_id,)).fetchone()
+        handler = JOB_HANDLERS[kind]
+        ids = json.loads(params)['ids']
+        chunk_size = app.config['PURGE_CHUNK_SIZE']
+        db.execute('''
+            UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+            WHERE id = ?
+        ''', (job_id,))
+        
+        for start in range(processed, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            done = False
+            while not done:
+                db.execute('BEGIN IMMEDIATE')
+                try:
+                    done = handler(db, chunk, app.config['PURGE_ROW_LIMIT'])
+                    if done:
+                        db.execute('UPDATE jobs SET processed = ? WHERE id = ?', (start + len(chunk), job_id))
+                    db.execute('COMMIT')
+                except Exception:
+                    db.execute('ROLLBACK')
+                    raise
+                time.sleep(app.config['PURGE_PAUSE'])  # Let request threads take the write lock
+        
+        db.execute("UPDATE jobs SET status = 'completed', finished_at = CURRENT_TIMESTAMP WHERE id = ?", (job_id,))
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        db.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                   (str(e), job_id))
+    finally:
+        db.close()
+
+def enqueue_purge_job(kind, ids):
+    """Record a job and hand it to the purge worker; returns the job id"""
+    job_id = execute_db('INSERT INTO jobs (kind, params, total, owner_pid) VALUES (?, ?, ?, ?)',
+                        (kind, json.dumps({'ids': ids}), len(ids), os.getpid()))
+    purge_executor.submit(run_purge_job, job_id)
+    return job_id
+
+def bulk_ids(data):
+    """Validate the {"ids": [...]} body of a bulk request"""
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ValueError('ids must be a non-empty list')
+    return sorted({int(i) for i in ids})
+
+@app.route('/api/products/bulk-delete', methods=['POST'])
+@role_required('admin', 'manager')
+def api_bulk_delete_products():
+    """Queue deletion of many products; mode "purge" (default) or "discontinue" to soft-delete"""
+    data = request.get_json(silent=True)
+    try:
+        ids = bulk_ids(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     
-    where_conditions = ['t.created_at >= date("now", "-' + str(days) + ' days")']
-    params = []
+    mode = data.get('mode', 'purge')
+    if mode not in ('purge', 'discontinue'):
+        return jsonify({'error': 'mode must be "purge" or "discontinue"'}), 400
+    
+    job_id = enqueue_purge_job(f'{mode}_products', ids)
+    return jsonify({'status': 'queued', 'job_id': job_id, 'total': len(ids),
+                    'progress_url': url_for('api_job_status', job_id=job_id)}), 202
+
+@app.route('/api/stores/bulk-delete', methods=['POST'])
+@role_required('admin', 'manager')
+def api_bulk_delete_stores():
+    """Queue deletion of many stores with their inventory and ledger rows"""
+    try:
+        ids = bulk_ids(request.get_json(silent=True))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job_id = enqueue_purge_job('purge_stores', ids)
+    return jsonify({'status': 'queued', 'job_id': job_id, 'total': len(ids),
+                    'progress_url': url_for('api_job_status', job_id=job_id)}), 202
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def api_job_status(job_id):
+    """Progress of a background job"""
+    job = query_db('''
+        SELECT id, kind, params, status, total, processed, error, created_at, started_at, finished_at
+        FROM jobs WHERE id = ?
+    ''', (job_id,), one=True)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    result = dict(job)
+    del result['params']
+    result['percent'] = round(100 * job['processed'] / job['total'], 1) if job['total'] else 100.0
+    if job['kind'] == 'report':
+        spec = json.loads(job['params'])
+        result['result_url'] = url_for('api_report', name=spec['report'], **spec['params'])
+    return jsonify(result)
+
+# --- Report jobs ---
+# Heavy reports run as 'report' jobs on their own small pool and store their
+# rows in report_results until they expire. GET /api/reports/<name> serves a
+# fresh stored result or queues a job; the scheduler keeps the entries in
+# REPORT_SCHEDULE computed ahead of their expiry so pages rarely compute live.
+report_executor = ThreadPoolExecutor(max_workers=app.config['REPORT_WORKERS'], thread_name_prefix='report')
+
+def parse_days(value):
+    days = int(value)
+    if not 1 <= days <= 3660:
+        raise ValueError('days must be between 1 and 3660')
+    return days
+
+def parse_month(value):
+    return datetime.strptime(str(value), '%Y-%m').strftime('%Y-%m')
+
+def previous_month():
+    return (datetime.utcnow().date().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+
+def build_category_summary(params):
+    return '''
+        SELECT COALESCE(c.name, 'Uncategorized') as category, 
+               COUNT(DISTINCT p.id) as product_count,
+               COALESCE(SUM(i.quantity), 0) as total_quantity,
+               COALESCE(SUM(i.quantity * COALESCE(p.cost_price, 0)), 0) as total_value
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN inventories i ON p.id = i.product_id
+        WHERE p.discontinued_at IS NULL
+        GROUP BY COALESCE(c.id, 0), COALESCE(c.name, 'Uncategorized')
+        ORDER BY total_value DESC
+    ''', []
+
+def build_store_summary(params):
+    return '''
+        SELECT s.name as store_name,
+               COUNT(DISTINCT i.product_id) as unique_products,
+               COALESCE(SUM(i.quantity), 0) as total_items,
+               COALESCE(SUM(i.quantity * COALESCE(p.cost_price, 0)), 0) as total_value
+        FROM stores s
+        LEFT JOIN (inventories i JOIN products p ON i.product_id = p.id AND p.discontinued_at IS NULL)
+            ON s.id = i.store_id
+        GROUP BY s.id, s.name
+        ORDER BY total_value DESC
+    ''', []
+
+def build_transaction_summary(params):
+    since = (datetime.utcnow().date() - timedelta(days=params['days'])).isoformat()
+    source_sql, source_params = transaction_source(transaction_partitions(since), ['t.created_at >= ?'], [since])
+    return f'''
+        SELECT COALESCE(tt.name, 'manual') as transaction_type,
+               COUNT(t.id) as transaction_count,
+               SUM(t.change) as total_change
+        FROM {source_sql} t
+        LEFT JOIN transaction_types tt ON t.transaction_type_id = tt.id
+        WHERE t.created_at >= ?
+        GROUP BY COALESCE(tt.id, 0), COALESCE(tt.name, 'manual')
+        ORDER BY transaction_count DESC
+    ''', source_params + [since]
+
+def build_product_summary(params):
+    return '''
+        SELECT p.id AS product_id, p.sku, p.name, 
+               COALESCE(SUM(i.quantity), 0) AS total_quantity,
+               COALESCE(p.reorder_point, 0) as reorder_point,
+               CASE WHEN COALESCE(SUM(i.quantity), 0) <= COALESCE(p.reorder_point, 0)
+                         AND COALESCE(SUM(i.quantity), 0) > 0 THEN 1 ELSE 0 END as low_stock,
+               COALESCE(c.name, '') as category_name
+        FROM products p 
+        LEFT JOIN inventories i ON p.id = i.product_id
+        LEFT JOIN categories c ON p.category_id = c.id
+        WHERE p.discontinued_at IS NULL
+        GROUP BY p.id
+        ORDER BY low_stock DESC, total_quantity ASC
+    ''', []
+
+def build_monthly_movements(params):
+    start = datetime.strptime(params['month'], '%Y-%m').date()
+    end = (start + timedelta(days=32)).replace(day=1)
+    conditions = ['t.created_at >= ?', 't.created_at < ?']
+    args = [start.isoformat(), end.isoformat()]
+    if 'store_id' in params:
+        conditions.append('t.store_id = ?')
+        args.append(params['store_id'])
+    source_sql, source_params = transaction_source(
+        transaction_partitions(start.isoformat(), (end - timedelta(days=1)).isoformat()), conditions, args)
+    return f'''
+        SELECT s.id AS store_id, s.name AS store_name,
+               COALESCE(tt.name, 'manual') AS transaction_type,
+               COUNT(*) AS transaction_count,
+               SUM(CASE WHEN t.change > 0 THEN t.change ELSE 0 END) AS units_in,
+               SUM(CASE WHEN t.change < 0 THEN -t.change ELSE 0 END) AS units_out,
+               ROUND(SUM(t.change * COALESCE(p.cost_price, 0)), 2) AS net_value_at_cost
+        FROM {source_sql} t
+        JOIN stores s ON s.id = t.store_id
+        JOIN products p ON p.id = t.product_id
+        LEFT JOIN transaction_types tt ON t.transaction_type_id = tt.id
+        WHERE {' AND '.join(conditions)}
+        GROUP BY s.id, COALESCE(tt.id, 0)
+        ORDER BY s.name, transaction_type
+    ''', source_params + args
+
+# name -> build(params) returning (sql, args), accepted params as {key: (parse, default)}, and
+# seconds a stored result stays fresh
+REPORTS = {
+    'category_summary': {'build': build_category_summary, 'params': {}, 'ttl': 900,
+                         'description': 'Products, units and value at cost per category'},
+    'store_summary': {'build': build_store_summary, 'params': {}, 'ttl': 900,
+                      'description': 'Products, units and value at cost per store'},
+    'transaction_summary': {'build': build_transaction_summary, 'params': {'days': (parse_days, 30)}, 'ttl': 900,
+                            'description': 'Transaction count and net change per type over the last N days'},
+    'product_summary': {'build': build_product_summary, 'params': {}, 'ttl': 900,
+                        'description': 'Total stock and low-stock flag per product'},
+    'monthly_movements': {'build': build_monthly_movements,
+                          'params': {'month': (parse_month, previous_month), 'store_id': (int, None)},
+                          'ttl': 6 * 3600,
+                          'description': 'Units in/out and net value per store and type for a month (YYYY-MM)'},
+}
+
+def report_params(name, raw):
+    """Validate a report's params and fill in defaults; raises ValueError"""
+    spec = REPORTS[name]
+    raw = raw or {}
+    unknown = set(raw) - set(spec['params'])
+    if unknown:
+        raise ValueError(f"Unknown parameters for {name}: {', '.join(sorted(unknown))}")
+    params = {}
+    for key, (parse, default) in spec['params'].items():
+        value = raw.get(key)
+        if value is None or value == '':
+            value = default() if callable(default) else default
+            if value is None:
+                continue
+        try:
+            params[key] = parse(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid {key}: {e}')
+    return params
+
+def report_key(params):
+    return json.dumps(params, sort_keys=True)
+
+def cached_report(name, params, fresh_for=0):
+    """Stored result that is still fresh fresh_for seconds from now, or None"""
+    row = query_db('''
+        SELECT result, job_id, computed_at, expires_at FROM report_results
+        WHERE report = ? AND params = ? AND expires_at > datetime('now', ?)
+    ''', (name, report_key(params), f'+{int(fresh_for)} seconds'), one=True)
+    if not row:
+        return None
+    return {'report': name, 'params': params, 'rows': json.loads(row['result']), 'job_id': row['job_id'],
+            'computed_at': row['computed_at'], 'expires_at': row['expires_at']}
+
+def run_report_job(job_id):
+    """Compute a queued report and store its rows in report_results"""
+    with app.app_context():
+        db = get_db()
+        try:
+            spec = json.loads(db.execute('SELECT params FROM jobs WHERE id = ?', (job_id,)).fetchone()['params'])
+            name, params = spec['report'], spec['params']
+            db.execute('''
+                UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+                WHERE id = ?
+            ''', (job_id,))
+            db.commit()
+            
+            query, args = REPORTS[name]['build'](params)
+            rows = [dict(r) for r in db.execute(query, args).fetchall()]
+            db.execute('''
+                INSERT INTO report_results (report, params, result, job_id, computed_at, expires_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, datetime('now', ?))
+                ON CONFLICT (report, params) DO UPDATE SET
+                    result = excluded.result, job_id = excluded.job_id,
+                    computed_at = excluded.computed_at, expires_at = excluded.expires_at
+            ''', (name, report_key(params), json.dumps(rows), job_id, f"+{REPORTS[name]['ttl']} seconds"))
+            db.execute('''
+                UPDATE jobs SET status = 'completed', processed = 1, finished_at = CURRENT_TIMESTAMP WHERE id = ?
+            ''', (job_id,))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Report job {job_id} failed: {e}")
+            db.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                       (str(e), job_id))
+            db.commit()
+
+def enqueue_report_job(name, params):
+    """Queue a report computation, reusing a job already pending for the same params; returns the job id"""
+    spec = json.dumps({'report': name, 'params': params}, sort_keys=True)
+    db = get_db()
+    while True:
+        # idx_jobs_pending_report turns a concurrent duplicate into a no-op insert
+        cursor = db.execute("INSERT OR IGNORE INTO jobs (kind, params, total, owner_pid) VALUES ('report', ?, 1, ?)",
+                            (spec, os.getpid()))
+        db.commit()
+        if cursor.rowcount:
+            report_executor.submit(run_report_job, cursor.lastrowid)
+            return cursor.lastrowid
+        pending = query_db('''
+            SELECT id FROM jobs WHERE kind = 'report' AND params = ? AND status IN ('queued', 'running')
+        ''', (spec,), one=True)
+        if pending:
+            return pending['id']
+        # The pending job finished between the insert and the lookup; queue a fresh one
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def resume_jobs():
+    """Take over pending jobs whose owning process has exited; finished purge chunks are skipped"""
+    me = os.getpid()
+    for row in query_db("SELECT id, kind, owner_pid FROM jobs WHERE status IN ('queued', 'running') ORDER BY id"):
+        owner = row['owner_pid']
+        if owner is not None and (owner == me or process_alive(owner)):
+            continue
+        # Conditional claim, so the job is only requeued once even if two passes race
+        db = get_db()
+        claimed = db.execute('UPDATE jobs SET owner_pid = ? WHERE id = ? AND owner_pid IS ?',
+                             (me, row['id'], owner)).rowcount
+        db.commit()
+        if not claimed:
+            continue
+        if row['kind'] == 'report':
+            report_executor.submit(run_report_job, row['id'])
+        else:
+            purge_executor.submit(run_purge_job, row['id'])
+
+class ReportScheduler:
+    """Thread that queues REPORT_SCHEDULE entries before their stored results expire.
+
+    Runs only in the process holding the background lease (see
+    BackgroundLease). Each tick also takes over jobs orphaned by workers that
+    exited and drops results and finished report jobs older than
+    REPORT_RETENTION_DAYS.
+    """
+    
+    def __init__(self):
+        self.stopped = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name='report-scheduler', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.stopped.set()
+    
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Report scheduler error: {e}")
+            self.stopped.wait(app.config['REPORT_SCHEDULER_INTERVAL'])
+    
+    def tick(self):
+        with app.app_context():
+            resume_jobs()
+            for entry in app.config['REPORT_SCHEDULE']:
+                params = report_params(entry['report'], entry.get('params'))
+                # Refresh anything that would expire before the next tick
+                if not cached_report(entry['report'], params, fresh_for=app.config['REPORT_SCHEDULER_INTERVAL']):
+                    enqueue_report_job(entry['report'], params)
+            
+            retention = f"-{app.config['REPORT_RETENTION_DAYS']} days"
+            execute_db("DELETE FROM report_results WHERE expires_at < datetime('now', ?)", (retention,))
+            execute_db('''
+                DELETE FROM jobs WHERE kind = 'report' AND status IN ('completed', 'failed')
+                  AND finished_at < datetime('now', ?)
+            ''', (retention,))
+
+report_scheduler = ReportScheduler()
+
+@app.route('/api/reports')
+@login_required
+def api_reports():
+    """Available background reports and their parameters"""
+    return jsonify([{'name': name, 'description': spec['description'], 'params': sorted(spec['params']),
+                     'ttl': spec['ttl']} for name, spec in REPORTS.items()])
+
+@app.route('/api/reports/<name>', methods=['GET', 'POST'])
+@login_required
+def api_report(name):
+    """Stored report result (GET) or queue a fresh computation (POST, or GET with nothing stored)"""
+    if name not in REPORTS:
+        return jsonify({'error': 'Report not found'}), 404
+    
+    raw = request.args.to_dict() if request.method == 'GET' else request.get_json(silent=True)
+    try:
+        params = report_params(name, raw)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.method == 'GET':
+        result = cached_report(name, params)
+        if result:
+            return jsonify(result)
+    
+    job_id = enqueue_report_job(name, params)
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'progress_url': url_for('api_job_status', job_id=job_id),
+        'result_url': url_for('api_report', name=name, **params),
+    }), 202
+
+# --- Catalog analytics ---
+# Units sold per product per week live in a NumPy matrix (one row per active
+# product, one column per week in a ring of ANALYTICS_WEEKS + 1). The first
+# call reads the window from the ledger partitions; later calls only fold in
+# sale rows added to the hot table since, so ABC/XYZ classification of the
+# whole catalog is a few array operations. Each process keeps its own copy.
+ANALYTICS_EPOCH = datetime(1970, 1, 5)  # A Monday; weeks are numbered from it
+WEEK_SQL = "CAST((julianday(substr(t.created_at, 1, 10)) - 2440591.5) / 7 AS INTEGER)"
+ABC_CLASSES = 'ABC'
+XYZ_CLASSES = 'XYZ'
+
+class AnalyticsUnavailable(Exception):
+    """NumPy is not installed"""
+
+def current_week():
+    return (datetime.utcnow() - ANALYTICS_EPOCH).days // 7
+
+def julian_now():
+    return (datetime.utcnow() - datetime(1970, 1, 1)).total_seconds() / 86400 + 2440587.5
+
+def fetch_array(db, query, args=(), columns=1):
+    """Plain-tuple fetch of a numeric query into a float64 array of shape (rows, columns)"""
+    cursor = db.cursor()
+    cursor.row_factory = None
+    cursor.execute(query, args)
+    return np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, columns)
+
+def sale_type_id(db):
+    row = db.execute("SELECT id FROM transaction_types WHERE name = 'sale'").fetchone()
+    return row[0] if row else None
+
+class CatalogAnalytics:
+    """ABC (sales value) x XYZ (demand variability) classes and per-store slow/dead stock.
+
+    ABC ranks products by sales value over the complete weeks of the window
+    and cuts the cumulative share at ANALYTICS_ABC_THRESHOLDS; XYZ cuts the
+    coefficient of variation of weekly units at ANALYTICS_XYZ_THRESHOLDS
+    (no sales is Z). Store flags are computed on demand and kept for
+    ANALYTICS_STORE_TTL seconds.
+    """
+    FULL_RELOAD_THRESHOLD = 5000  # New products beyond this reload the whole window
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.units = None  # float32 (products, weeks + 1), column = week % (weeks + 1)
+        self.product_ids = None  # sorted int64 ids matching the rows
+        self.sell_price = None
+        self.cost_price = None
+        self.week = None  # newest week held in the ring
+        self.last_id = 0  # newest hot-table transaction folded in
+        self.product_seq = None
+        self.built_at = 0.0
+        self.classes = None
+        self.store_cache = {}
+    
+    @property
+    def width(self):
+        return app.config['ANALYTICS_WEEKS'] + 1
+    
+    def refresh(self, db):
+        """Catch up with product and ledger changes since the last call"""
+        if np is None:
+            raise AnalyticsUnavailable('NumPy is required for catalog analytics')
+        sku_index.sync(db)
+        with self.lock:
+            week = current_week()
+            if (self.units is None or week - self.week >= self.width
+                    or time.time() - self.built_at > app.config['ANALYTICS_REBUILD_SECONDS']):
+                self._build(db, week)
+                return
+            for stale in range(self.week + 1, week + 1):
+                self.units[:, stale % self.width] = 0
+                self.classes = None
+            self.week = week
+            if sku_index.last_seq != self.product_seq:
+                self._remap(db)
+            self._fold_new_sales(db)
+    
+    def _catalog(self):
+        with sku_index.lock:
+            products = sorted((p['id'], float(p['sell_price'] or 0), float(p['cost_price'] or 0))
+                              for p in sku_index.products.values())
+            seq = sku_index.last_seq
+        catalog = np.array(products, dtype=np.float64).reshape(-1, 3)
+        return catalog[:, 0].astype(np.int64), catalog[:, 1], catalog[:, 2], seq
+    
+    def _build(self, db, week):
+        self.product_ids, sell, cost, self.product_seq = self._catalog()
+        self.sell_price, self.cost_price = sell, cost
+        self.units = np.zeros((len(self.product_ids), self.width), dtype=np.float32)
+        self.week = week
+        self.last_id = db.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+        self._load_history(db)
+        self.store_cache.clear()
+        self.built_at = time.time()
+        self.classes = None
+    
+    def _load_history(self, db, product_ids=None):
+        """Add window sales up to last_id for all products, or just the given ones"""
+        first_week = self.week - self.width + 1
+        start = (ANALYTICS_EPOCH + timedelta(weeks=first_week)).strftime('%Y-%m-%d')
+        conditions = ['t.transaction_type_id = ?', 't.created_at >= ?', 't.id <= ?']
+        params = [sale_type_id(db), start, self.last_id]
+        chunks = [None] if product_ids is None else [product_ids[i:i + 500] for i in range(0, len(product_ids), 500)]
+        for chunk in chunks:
+            chunk_conditions = list(conditions)
+            chunk_params = list(params)
+            if chunk is not None:
+                chunk_conditions.append(f"t.product_id IN ({','.join('?' for _ in chunk)})")
+                chunk_params.extend(int(product_id) for product_id in chunk)
+            source, source_params = transaction_source(transaction_partitions(start), chunk_conditions,
+                                                       chunk_params)
+            rows = fetch_array(db, f'''
+                SELECT t.product_id, {WEEK_SQL} AS week, SUM(-t.change)
+                FROM {source} t
+                WHERE {' AND '.join(chunk_conditions)}
+                GROUP BY t.product_id, week
+            ''', source_params + chunk_params, columns=3)
+            self._add(rows[:, 0], rows[:, 1], rows[:, 2])
+    
+    def _add(self, product_ids, weeks, units):
+        """Accumulate units into (product, week) cells, ignoring unknown products and weeks outside the ring"""
+        rows = np.searchsorted(self.product_ids, product_ids)
+        rows_clipped = np.minimum(rows, max(len(self.product_ids) - 1, 0))
+        keep = ((rows < len(self.product_ids)) & (weeks > self.week - self.width) & (weeks <= self.week))
+        if len(self.product_ids):
+            keep &= self.product_ids[rows_clipped] == product_ids
+        if not keep.any():
+            return
+        cells = rows[keep] * self.width + (weeks[keep].astype(np.int64) % self.width)
+        np.add.at(self.units.reshape(-1), cells, units[keep].astype(np.float32))
+        self.classes = None
+    
+    def _remap(self, db):
+        """Follow products added, discontinued or repriced since the last call"""
+        product_ids, sell, cost, seq = self._catalog()
+        units = np.zeros((len(product_ids), self.width), dtype=np.float32)
+        rows = np.searchsorted(self.product_ids, product_ids)
+        rows_clipped = np.minimum(rows, max(len(self.product_ids) - 1, 0))
+        known = rows < len(self.product_ids)
+        if len(self.product_ids):
+            known &= self.product_ids[rows_clipped] == product_ids
+        units[known] = self.units[rows[known]]
+        self.product_ids, self.sell_price, self.cost_price, self.product_seq = product_ids, sell, cost, seq
+        self.units = units
+        self.classes = None
+        added = product_ids[~known]
+        if len(added) > self.FULL_RELOAD_THRESHOLD:
+            self._build(db, self.week)
+        elif len(added):
+            # Products back from discontinued have history to pick up; new ones just come back empty
+            self._load_history(db, added)
+    
+    def _fold_new_sales(self, db):
+        latest = db.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+        if latest <= self.last_id:
+            return
+        rows = fetch_array(db, f'''
+            SELECT t.product_id, {WEEK_SQL} AS week, SUM(-t.change)
+            FROM transactions t
+            WHERE t.id > ? AND t.id <= ? AND t.transaction_type_id = ?
+            GROUP BY t.product_id, week
+        ''', (self.last_id, latest, sale_type_id(db)), columns=3)
+        self.last_id = latest
+        self._add(rows[:, 0], rows[:, 1], rows[:, 2])
+    
+    def classify(self):
+        """Per-product arrays (ids, units, value, cv, abc, xyz) over the complete weeks; call after refresh()"""
+        with self.lock:
+            if self.classes is not None:
+                return self.classes
+            columns = [(self.week - back) % self.width for back in range(1, self.width)]
+            weekly = self.units[:, columns].astype(np.float64)
+            units = weekly.sum(axis=1)
+            mean = units / weekly.shape[1]
+            cv = np.full(len(units), np.inf)
+            np.divide(weekly.std(axis=1), mean, out=cv, where=mean > 0)
+            price = np.where(self.sell_price > 0, self.sell_price, self.cost_price)
+            value = np.maximum(units, 0) * price
+            
+            a_share, b_share = app.config['ANALYTICS_ABC_THRESHOLDS']
+            order = np.argsort(-value, kind='stable')
+            total = value.sum()
+            # Share of value held by the products ranked ahead of each one
+            ahead = np.empty_like(value)
+            ahead[order] = (np.cumsum(value[order]) - value[order]) / total if total > 0 else 1.0
+            abc = np.where(ahead < a_share, 0, np.where(ahead < b_share, 1, 2)).astype(np.int8)
+            abc[value <= 0] = 2
+            
+            x_cv, y_cv = app.config['ANALYTICS_XYZ_THRESHOLDS']
+            xyz = np.where(cv <= x_cv, 0, np.where(cv <= y_cv, 1, 2)).astype(np.int8)
+            
+            self.classes = {'product_ids': self.product_ids, 'units': units, 'value': value, 'cv': cv,
+                            'abc': abc, 'xyz': xyz, 'order': order, 'weeks': weekly.shape[1],
+                            'as_of': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}
+            return self.classes
+    
+    def store_movers(self, db, store_id):
+        """Stocked products at a store with sales rate, days of cover and slow/dead flags"""
+        cached = self.store_cache.get(store_id)
+        if cached and cached['expires'] > time.time():
+            return cached
+        
+        window_days = app.config['ANALYTICS_WEEKS'] * 7
+        start = (datetime.utcnow() - timedelta(days=window_days)).strftime('%Y-%m-%d %H:%M:%S')
+        stock = fetch_array(db, 'SELECT product_id, quantity FROM inventories WHERE store_id = ? AND quantity > 0',
+                            (store_id,), columns=2)
+        conditions = ['t.store_id = ?', 't.transaction_type_id = ?', 't.created_at >= ?']
+        params = [store_id, sale_type_id(db), start]
+        source, source_params = transaction_source(transaction_partitions(start), conditions, params)
+        sales = fetch_array(db, f'''
+            SELECT t.product_id, SUM(-t.change), MAX(julianday(t.created_at))
+            FROM {source} t
+            WHERE {' AND '.join(conditions)}
+            GROUP BY t.product_id
+            ORDER BY t.product_id
+        ''', source_params + params, columns=3)
+        
+        product_ids = stock[:, 0].astype(np.int64)
+        quantity = stock[:, 1]
+        units = np.zeros(len(product_ids))
+        last_sale = np.full(len(product_ids), np.nan)
+        if len(sales):
+            rows = np.searchsorted(sales[:, 0], product_ids)
+            rows_clipped = np.minimum(rows, len(sales) - 1)
+            sold = (rows < len(sales)) & (sales[rows_clipped, 0] == product_ids)
+            units[sold] = sales[rows_clipped[sold], 1]
+            last_sale[sold] = sales[rows_clipped[sold], 2]
+        
+        daily_rate = np.maximum(units, 0) / window_days
+        cover_days = np.full(len(product_ids), np.inf)
+        np.divide(quantity, daily_rate, out=cover_days, where=daily_rate > 0)
+        days_since_sale = np.where(np.isnan(last_sale), np.inf, julian_now() - last_sale)
+        dead = days_since_sale > app.config['DEAD_STOCK_DAYS']
+        slow = ~dead & (cover_days > app.config['SLOW_COVER_DAYS'])
+        
+        with self.lock:
+            rows = np.searchsorted(self.product_ids, product_ids)
+            rows_clipped = np.minimum(rows, max(len(self.product_ids) - 1, 0))
+            cost = np.zeros(len(product_ids))
+            if len(self.product_ids):
+                known = (rows < len(self.product_ids)) & (self.product_ids[rows_clipped] == product_ids)
+                cost[known] = self.cost_price[rows_clipped[known]]
+        
+        result = {'store_id': store_id, 'product_ids': product_ids, 'quantity': quantity, 'units': units,
+                  'cover_days': cover_days, 'days_since_sale': days_since_sale, 'dead': dead, 'slow': slow,
+                  'stock_value': quantity * cost, 'window_days': window_days,
+                  'as_of': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                  'expires': time.time() + app.config['ANALYTICS_STORE_TTL']}
+        self.store_cache[store_id] = result
+        return result
+
+catalog_analytics = CatalogAnalytics()
+
+def class_matrix(classes):
+    """Product count, units and value for each of the nine ABC/XYZ cells"""
+    cells = classes['abc'].astype(np.int64) * 3 + classes['xyz']
+    counts = np.bincount(cells, minlength=9)
+    values = np.bincount(cells, weights=classes['value'], minlength=9)
+    units = np.bincount(cells, weights=classes['units'], minlength=9)
+    total = classes['value'].sum()
+    return [{'class': ABC_CLASSES[cell // 3] + XYZ_CLASSES[cell % 3], 'products': int(counts[cell]),
+             'units': round(float(units[cell]), 2), 'value': round(float(values[cell]), 2),
+             'value_share': round(float(values[cell] / total), 4) if total > 0 else 0.0}
+            for cell in range(9)]
+
+def finite_or_none(value, digits=1):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+def product_details(product_ids):
+    with sku_index.lock:
+        return {product_id: sku_index.products.get(sku_index.sku_by_id.get(product_id)) or {}
+                for product_id in product_ids}
+
+def page_args(default_limit=100):
+    limit = min(max(int(request.args.get('limit', default_limit)), 1), 1000)
+    offset = max(int(request.args.get('offset', 0)), 0)
+    return limit, offset
+
+@app.route('/api/analytics/abc-xyz')
+@login_required
+def api_abc_xyz():
+    """ABC/XYZ class matrix for the catalog; ?class=AX (or A, or X) also lists the products, by value"""
+    wanted = request.args.get('class', '').strip().upper()
+    if wanted and not (len(wanted) <= 2 and wanted[0] in ABC_CLASSES + XYZ_CLASSES
+                       and (len(wanted) == 1 or (wanted[0] in ABC_CLASSES and wanted[1] in XYZ_CLASSES))):
+        return jsonify({'error': 'class must be one of A-C, X-Z or a pair such as AX'}), 400
+    try:
+        limit, offset = page_args()
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    try:
+        catalog_analytics.refresh(get_db())
+        classes = catalog_analytics.classify()
+    except AnalyticsUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    
+    result = {'as_of': classes['as_of'], 'weeks': classes['weeks'], 'products': len(classes['product_ids']),
+              'total_value': round(float(classes['value'].sum()), 2), 'matrix': class_matrix(classes),
+              'abc_thresholds': list(app.config['ANALYTICS_ABC_THRESHOLDS']),
+              'xyz_thresholds': list(app.config['ANALYTICS_XYZ_THRESHOLDS'])}
+    if wanted:
+        order = classes['order']
+        mask = np.ones(len(order), dtype=bool)
+        if wanted[0] in ABC_CLASSES:
+            mask &= classes['abc'][order] == ABC_CLASSES.index(wanted[0])
+        if wanted[-1] in XYZ_CLASSES:
+            mask &= classes['xyz'][order] == XYZ_CLASSES.index(wanted[-1])
+        matches = order[mask]
+        page = matches[offset:offset + limit]
+        details = product_details(classes['product_ids'][page].tolist())
+        result.update({'class': wanted, 'total': int(len(matches)), 'limit': limit, 'offset': offset, 'items': [{
+            'product_id': int(classes['product_ids'][row]),
+            'sku': details[int(classes['product_ids'][row])].get('sku'),
+            'name': details[int(classes['product_ids'][row])].get('name'),
+            'class': ABC_CLASSES[classes['abc'][row]] + XYZ_CLASSES[classes['xyz'][row]],
+            'units': round(float(classes['units'][row]), 2),
+            'value': round(float(classes['value'][row]), 2),
+            'cv': finite_or_none(classes['cv'][row], 3),
+        } for row in page]})
+    return jsonify(result)
+
+@app.route('/api/analytics/slow-movers')
+@login_required
+def api_slow_movers():
+    """Slow and dead stock at one store (?store_id=), largest stock value first; ?flag=slow|dead|all"""
+    try:
+        store_id = int(request.args.get('store_id', ''))
+        limit, offset = page_args()
+    except ValueError:
+        return jsonify({'error': 'store_id, limit and offset must be integers'}), 400
+    flag = request.args.get('flag', 'all')
+    if flag not in ('slow', 'dead', 'all'):
+        return jsonify({'error': 'flag must be slow, dead or all'}), 400
+    if not query_db('SELECT 1 FROM stores WHERE id = ?', (store_id,), one=True):
+        return jsonify({'error': 'Store not found'}), 404
+    
+    try:
+        db = get_db()
+        catalog_analytics.refresh(db)
+        movers = catalog_analytics.store_movers(db, store_id)
+    except AnalyticsUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    
+    mask = {'slow': movers['slow'], 'dead': movers['dead'], 'all': movers['slow'] | movers['dead']}[flag]
+    flagged = np.flatnonzero(mask)
+    flagged = flagged[np.argsort(-movers['stock_value'][flagged], kind='stable')]
+    page = flagged[offset:offset + limit]
+    details = product_details(movers['product_ids'][page].tolist())
+    return jsonify({
+        'store_id': store_id, 'as_of': movers['as_of'], 'window_days': movers['window_days'],
+        'stocked_products': int(len(movers['product_ids'])),
+        'slow_count': int(movers['slow'].sum()), 'dead_count': int(movers['dead'].sum()),
+        'slow_value': round(float(movers['stock_value'][movers['slow']].sum()), 2),
+        'dead_value': round(float(movers['stock_value'][movers['dead']].sum()), 2),
+        'total': int(len(flagged)), 'limit': limit, 'offset': offset,
+        'items': [{
+            'product_id': int(movers['product_ids'][row]),
+            'sku': details[int(movers['product_ids'][row])].get('sku'),
+            'name': details[int(movers['product_ids'][row])].get('name'),
+            'quantity': int(movers['quantity'][row]),
+            'units_sold': int(movers['units'][row]),
+            'cover_days': finite_or_none(movers['cover_days'][row]),
+            'days_since_sale': finite_or_none(movers['days_since_sale'][row]),
+            'flag': 'dead' if movers['dead'][row] else 'slow',
+            'stock_value': round(float(movers['stock_value'][row]), 2),
+        } for row in page],
+    })
+
+# --- Inter-store rebalancing ---
+# Every store/product pair that is stocked or sold recently gets a target
+# level: the reorder point plus forecast demand (sales rate over
+# REBALANCE_LOOKBACK_DAYS projected over REBALANCE_COVER_DAYS). Stock above
+# REBALANCE_KEEP_FACTOR x target is surplus, stock below target a deficit, and
+# match_transfers() pairs them per product before anything is bought.
+
+def match_transfers(products, stores, surplus, deficit):
+    """Greedy transport of surplus into deficits, vectorized across products.
+
+    Within a product the largest surplus feeds the largest deficit first,
+    which keeps the plan to at most sources + destinations - 1 transfers.
+    Both sides are laid end to end on one axis per product; every span
+    between consecutive breakpoints is one transfer. Returns arrays of
+    (product, from_store, to_store, quantity) plus per-product demand totals.
+    """
+    sources = np.flatnonzero(surplus > 0)
+    sinks = np.flatnonzero(deficit > 0)
+    sources = sources[np.lexsort((-surplus[sources], products[sources]))]
+    sinks = sinks[np.lexsort((-deficit[sinks], products[sinks]))]
+    ids = np.union1d(products[sources], products[sinks])
+    source_group = np.searchsorted(ids, products[sources])
+    sink_group = np.searchsorted(ids, products[sinks])
+    supply = np.bincount(source_group, weights=surplus[sources], minlength=len(ids)).astype(np.int64)
+    demand = np.bincount(sink_group, weights=deficit[sinks], minlength=len(ids)).astype(np.int64)
+    shipped = np.minimum(supply, demand)
+    base = np.cumsum(shipped) - shipped
+    
+    def ends(rows, group, amount):
+        running = np.cumsum(amount[rows])
+        first = np.r_[True, group[1:] != group[:-1]] if len(group) else np.zeros(0, dtype=bool)
+        local = running - (running - amount[rows])[first][np.cumsum(first) - 1]
+        return base[group] + np.minimum(local, shipped[group])
+    
+    empty = np.zeros(0, dtype=np.int64)
+    if not shipped.sum():
+        return (empty, empty, empty, empty), (ids, demand, shipped)
+    source_ends = ends(sources, source_group, surplus)
+    sink_ends = ends(sinks, sink_group, deficit)
+    points = np.unique(np.concatenate((source_ends, sink_ends, base)))
+    starts, quantity = points[:-1], np.diff(points)
+    source_rows = sources[np.searchsorted(source_ends, starts, side='right')]
+    sink_rows = sinks[np.searchsorted(sink_ends, starts, side='right')]
+    return ((products[source_rows], stores[source_rows], stores[sink_rows], quantity),
+            (ids, demand, shipped))
+
+def rebalance_plan(db, store_id=None, product_ids=None):
+    """Proposed transfers and the purchases left after them; store_id limits destinations"""
+    lookback = app.config['REBALANCE_LOOKBACK_DAYS']
+    start = (datetime.utcnow() - timedelta(days=lookback)).strftime('%Y-%m-%d %H:%M:%S')
+    stock_conditions, product_params = ['1 = 1'], []
+    conditions = ['t.transaction_type_id = ?', 't.created_at >= ?']
+    if product_ids:
+        placeholders = ','.join('?' for _ in product_ids)
+        stock_conditions.append(f'product_id IN ({placeholders})')
+        conditions.append(f't.product_id IN ({placeholders})')
+        product_params = list(product_ids)
+    
+    stock = fetch_array(db, 'SELECT store_id, product_id, quantity FROM inventories WHERE '
+                        + ' AND '.join(stock_conditions), product_params, columns=3)
+    params = [sale_type_id(db), start] + product_params
+    source, source_params = transaction_source(transaction_partitions(start), conditions, params)
+    sales = fetch_array(db, f'''
+        SELECT t.store_id, t.product_id, SUM(-t.change)
+        FROM {source} t
+        WHERE {' AND '.join(conditions)}
+        GROUP BY t.store_id, t.product_id
+    ''', source_params + params, columns=3)
+    
+    # One key per store/product pair that is stocked or has sold in the lookback window
+    stride = int(max(stock[:, 0].max(initial=0), sales[:, 0].max(initial=0))) + 1
+    stock_keys = stock[:, 1].astype(np.int64) * stride + stock[:, 0].astype(np.int64)
+    sales_keys = sales[:, 1].astype(np.int64) * stride + sales[:, 0].astype(np.int64)
+    keys = np.union1d(stock_keys, sales_keys)
+    quantity = np.zeros(len(keys), dtype=np.int64)
+    quantity[np.searchsorted(keys, stock_keys)] = np.maximum(stock[:, 2], 0)
+    sold = np.zeros(len(keys))
+    sold[np.searchsorted(keys, sales_keys)] = np.maximum(sales[:, 2], 0)
+    products, stores = keys // stride, keys % stride
+    
+    # Discontinued products are neither replenished nor shipped around
+    with sku_index.lock:
+        catalog = np.array(sorted((p['id'], p['reorder_point'] or 0, float(p['cost_price'] or 0))
+                                  for p in sku_index.products.values()), dtype=np.float64).reshape(-1, 3)
+    catalog_ids = catalog[:, 0].astype(np.int64)
+    rows = np.minimum(np.searchsorted(catalog_ids, products), max(len(catalog_ids) - 1, 0))
+    active = catalog_ids[rows] == products if len(catalog_ids) else np.zeros(len(keys), dtype=bool)
+    products, stores, quantity, sold = products[active], stores[active], quantity[active], sold[active]
+    reorder_point = catalog[rows[active], 1].astype(np.int64)
+    
+    forecast = np.ceil(sold / lookback * app.config['REBALANCE_COVER_DAYS']).astype(np.int64)
+    target = reorder_point + forecast
+    deficit = np.maximum(target - quantity, 0)
+    surplus = np.maximum(quantity - np.ceil(target * app.config['REBALANCE_KEEP_FACTOR']).astype(np.int64), 0)
+    if store_id is not None:
+        deficit[stores != store_id] = 0
+    
+    (product, from_store, to_store, units), (ids, demand, shipped) = match_transfers(products, stores, surplus,
+                                                                                      deficit)
+    # Every product that reaches the matching is active, so these lookups always hit
+    unit_cost = catalog[np.searchsorted(catalog_ids, ids), 2]
+    value = units * catalog[np.searchsorted(catalog_ids, product), 2]
+    order = np.argsort(-value, kind='stable')
+    summary = {
+        'products_short': int((demand > 0).sum()),
+        'deficit_units': int(demand.sum()),
+        'transfers': int(len(units)),
+        'transfer_units': int(units.sum()),
+        'transfer_value': round(float(value.sum()), 2),
+        'purchase_units': int((demand - shipped).sum()),
+        'purchase_value': round(float(((demand - shipped) * unit_cost).sum()), 2),
+        'surplus_units': int(surplus.sum()),
+    }
+    return (product[order], from_store[order], to_store[order], units[order], value[order]), summary
+
+@app.route('/api/rebalance/plan')
+@login_required
+def api_rebalance_plan():
+    """Propose transfers of surplus stock to stores short of it; ?store_id= limits destinations"""
+    try:
+        store_id = int(request.args['store_id']) if request.args.get('store_id') else None
+        product_ids = [int(value) for value in request.args.getlist('product_id')]
+        limit, offset = page_args(default_limit=500)
+    except ValueError:
+        return jsonify({'error': 'store_id, product_id, limit and offset must be integers'}), 400
+    if len(product_ids) > 500:
+        return jsonify({'error': 'At most 500 product_id values per request'}), 400
+    if np is None:
+        return jsonify({'error': 'NumPy is required for rebalancing'}), 503
+    
+    db = get_db()
+    sku_index.sync(db)
+    (product, from_store, to_store, units, value), summary = rebalance_plan(db, store_id, product_ids)
+    page = slice(offset, offset + limit)
+    details = product_details(product[page].tolist())
+    store_names = {row['id']: row['name'] for row in query_db('SELECT id, name FROM stores')}
+    return jsonify({
+        'summary': summary,
+        'limit': limit, 'offset': offset,
+        'transfers': [{
+            'product_id': int(product_id),
+            'sku': details[int(product_id)].get('sku'),
+            'product_name': details[int(product_id)].get('name'),
+            'from_store_id': int(source), 'from_store_name': store_names.get(int(source)),
+            'to_store_id': int(sink), 'to_store_name': store_names.get(int(sink)),
+            'quantity': int(quantity),
+            'value': round(float(transfer_value), 2),
+        } for product_id, source, sink, quantity, transfer_value in zip(product[page], from_store[page],
+                                                                       to_store[page], units[page], value[page])],
+    })
+
+@app.route('/api/rebalance/apply', methods=['POST'])
+@role_required('admin', 'manager')
+def api_rebalance_apply():
+    """Apply an approved plan of {"transfers": [...]} as one transaction; nothing moves if any source is short.
+
+    Moves are netted per store and product first, so a chained plan (A to B,
+    then B on to C) only needs the stock each store gives away overall.
+    """
+    data = request.get_json(force=True) or {}
+    transfers = data.get('transfers')
+    if not isinstance(transfers, list) or not transfers:
+        return jsonify({'error': 'transfers must be a non-empty list'}), 400
+    if len(transfers) > 10000:
+        return jsonify({'error': 'At most 10000 transfers per plan'}), 400
+    
+    moves = []
+    for idx, item in enumerate(transfers):
+        try:
+            move = (int(item['from_store_id']), int(item['to_store_id']), int(item['product_id']),
+                    int(item['quantity']))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': f'Transfer {idx + 1}: invalid payload'}), 400
+        if move[3] <= 0 or move[0] == move[1]:
+            return jsonify({'error': f'Transfer {idx + 1}: quantity must be positive between two stores'}), 400
+        moves.append(move)
+    
+    # One lookup checks every store and product the plan names
+    store_ids = {move[0] for move in moves} | {move[1] for move in moves}
+    product_ids = {move[2] for move in moves}
+    known = query_db('''
+        SELECT 'store', id FROM stores WHERE id IN (SELECT value FROM json_each(?))
+        UNION ALL
+        SELECT 'product', id FROM products
+        WHERE id IN (SELECT value FROM json_each(?)) AND discontinued_at IS NULL
+    ''', (json.dumps(sorted(store_ids)), json.dumps(sorted(product_ids))))
+    errors = []
+    missing_stores = store_ids - {row[1] for row in known if row[0] == 'store'}
+    if missing_stores:
+        errors.append(f'Unknown stores: {sorted(missing_stores)}')
+    missing_products = product_ids - {row[1] for row in known if row[0] == 'product'}
+    if missing_products:
+        errors.append(f'Unknown or discontinued products: {sorted(missing_products)}')
+    if errors:
+        return jsonify({'error': '; '.join(errors)}), 400
+    
+    note = data.get('note', 'Rebalancing transfer')
+    user_id = session['username']
+    transaction_type_row = query_db('SELECT id FROM transaction_types WHERE name=?', ('transfer',), one=True)
+    transaction_type_id = transaction_type_row['id'] if transaction_type_row else 1
+    reference_number = f'REBALANCE-{datetime.now().strftime("%Y%m%d%H%M%S")}-{secrets.token_hex(3)}'
+    
+    net = {}
+    for from_store_id, to_store_id, product_id, quantity in moves:
+        net[(from_store_id, product_id)] = net.get((from_store_id, product_id), 0) - quantity
+        net[(to_store_id, product_id)] = net.get((to_store_id, product_id), 0) + quantity
+    outgoing = {key: -change for key, change in net.items() if change < 0}
+    incoming = [(store_id, product_id, change) for (store_id, product_id), change in net.items() if change > 0]
+    
+    db = get_db()
+    try:
+        # The guarded decrement checks and takes the stock under the write lock
+        short = []
+        for (store_id, product_id), quantity in outgoing.items():
+            cursor = db.execute('''UPDATE inventories SET quantity = quantity - ?, last_updated = CURRENT_TIMESTAMP
+                                   WHERE store_id = ? AND product_id = ? AND quantity >= ?''',
+                                (quantity, store_id, product_id, quantity))
+            if cursor.rowcount != 1:
+                short.append({'store_id': store_id, 'product_id': product_id, 'quantity': quantity})
+        if short:
+            db.rollback()
+            return jsonify({'error': 'Insufficient inventory in source stores', 'conflicts': short}), 409
+        
+        db.executemany('DELETE FROM inventories WHERE store_id = ? AND product_id = ? AND quantity = 0',
+                       list(outgoing))
+        db.executemany('''INSERT INTO inventories (store_id, product_id, quantity) VALUES (?,?,?)
+                          ON CONFLICT(store_id, product_id) DO UPDATE SET
+                              quantity = quantity + excluded.quantity, last_updated = CURRENT_TIMESTAMP''',
+                       incoming)
+        ledger = []
+        for from_store_id, to_store_id, product_id, quantity in moves:
+            ledger.append((from_store_id, product_id, -quantity, f'{note} (OUT)', transaction_type_id,
+                           reference_number, user_id))
+            ledger.append((to_store_id, product_id, quantity, f'{note} (IN)', transaction_type_id,
+                           reference_number, user_id))
+        db.executemany('''INSERT INTO transactions 
+                          (store_id, product_id, change, note, transaction_type_id, reference_number, user_id) 
+                          VALUES (?,?,?,?,?,?,?)''', ledger)
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"Rebalance apply error: {e}")
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'status': 'ok',
+        'reference_number': reference_number,
+        'transfers': len(moves),
+        'units': sum(move[3] for move in moves),
+    })
+
+TRANSACTIONS_QUERY = '''
+    SELECT t.*, s.name AS store_name, p.sku, p.name AS product_name, 
+           tt.name as transaction_type, t.reference_number
+    FROM {source} t
+    JOIN stores s ON s.id = t.store_id
+    JOIN products p ON p.id = t.product_id
+    JOIN transaction_types tt ON t.transaction_type_id = tt.id
+'''
+
+def transaction_filters(args):
+    """Build the WHERE conditions and params shared by the transaction APIs and exports.
+
+    Returns (where_conditions, params, sources); conditions only reference t.*
+    so they can be applied inside each archive partition in sources.
+    """
+    store_id = args.get('store_id')
+    product_id = args.get('product_id')
+    transaction_type = args.get('transaction_type')
+    days = int(args.get('days', 30))
+    since = (datetime.utcnow().date() - timedelta(days=days)).isoformat()
+    
+    where_conditions = ['t.created_at >= ?']
+    params = [since]
     
     if store_id:
         where_conditions.append('t.store_id = ?')
@@ -1668,25 +4612,125 @@ def api_transactions():
         params.append(product_id)
     
     if transaction_type:
-        where_conditions.append('tt.name = ?')
+        where_conditions.append('t.transaction_type_id = (SELECT id FROM transaction_types WHERE name = ?)')
         params.append(transaction_type)
     
-    where_clause = 'WHERE ' + ' AND '.join(where_conditions)
-    params.append(limit)
+    return where_conditions, params, transaction_partitions(since)
+
+@app.route('/api/transactions')
+def api_transactions():
+    """Enhanced transactions endpoint with filtering and keyset pagination.
+
+    Pass the X-Next-Cursor / X-Prev-Cursor response headers back as ?after= or
+    ?before= to walk through the full history one page at a time.
+    """
+    limit = min(int(request.args.get('limit', 200)), 1000)  # Max 1000 records per page
+    where_conditions, params, sources = transaction_filters(request.args)
     
-    rows = query_db(f'''
-        SELECT t.*, s.name AS store_name, p.sku, p.name AS product_name, 
-               tt.name as transaction_type, t.reference_number
-        FROM transactions t
-        JOIN stores s ON s.id = t.store_id
-        JOIN products p ON p.id = t.product_id
-        JOIN transaction_types tt ON t.transaction_type_id = tt.id
-        {where_clause}
-        ORDER BY t.created_at DESC
-        LIMIT ?
-    ''', params)
+    try:
+        rows, next_cursor, prev_cursor = keyset_paginate(TRANSACTIONS_QUERY, where_conditions, params,
+                                                         [('t.created_at', 'created_at'), ('t.id', 'id')], limit,
+            after=request.args.get('after'), before=request.args.get('before'), sources=sources)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify([dict(r) for r in rows])
+    response = jsonify(rows_to_columns(rows) if wants_columns() else [dict(r) for r in rows])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if prev_cursor:
+        response.headers['X-Prev-Cursor'] = prev_cursor
+    return response
+
+# --- Streaming exports ---
+EXPORT_BATCH_SIZE = 1000
+
+def stream_query(query, params, export_format, compress=False):
+    """Yield query results as CSV or NDJSON chunks, fetching EXPORT_BATCH_SIZE rows at a time.
+
+    Uses its own connection so the cursor outlives the request context, and
+    optionally gzips the output on the fly.
+    """
+    db = sqlite3.connect(app.config['DATABASE'])
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 = gzip container
+    try:
+        cur = db.execute(query, params)
+        columns = [d[0] for d in cur.description]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == 'csv' else None
+        if writer:
+            writer.writerow(columns)
+        
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if writer:
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=str))
+                    buffer.write('\n')
+            
+            chunk = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+            if not rows:
+                break
+        
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+def export_response(query, params, filename):
+    """Build a streaming download response honouring ?format=csv|ndjson and ?gzip=1"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
+    
+    filename = f'{filename}.{export_format}'
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(stream_query(query, params, export_format, compress),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/api/export/transactions')
+def api_export_transactions():
+    """Stream the transaction ledger; accepts the same filters as /api/transactions"""
+    where_conditions, params, sources = transaction_filters(request.args)
+    source_sql, source_params = transaction_source(sources, where_conditions, params)
+    query = f'''{TRANSACTIONS_QUERY.replace('{source}', source_sql)}
+        WHERE {' AND '.join(where_conditions)}
+        ORDER BY t.created_at DESC, t.id DESC
+    '''
+    return export_response(query, source_params + params, f'transactions-{datetime.now().strftime("%Y%m%d")}')
+
+@app.route('/api/export/inventories')
+def api_export_inventories():
+    """Stream a snapshot of current inventory levels, optionally for one store"""
+    store_id = request.args.get('store_id')
+    where_clause = 'WHERE i.store_id = ?' if store_id else ''
+    params = [store_id] if store_id else []
+    query = f'''
+        SELECT i.store_id, s.name AS store_name, i.product_id, p.sku, p.name AS product_name,
+               COALESCE(c.name, '') AS category_name, i.quantity,
+               COALESCE(p.reorder_point, 0) AS reorder_point,
+               COALESCE(p.cost_price, 0) AS cost_price, i.last_updated
+        FROM inventories i
+        JOIN stores s ON s.id = i.store_id
+        JOIN products p ON p.id = i.product_id
+        LEFT JOIN categories c ON p.category_id = c.id
+        {where_clause}
+        ORDER BY i.store_id, i.product_id
+    '''
+    return export_response(query, params, f'inventories-{datetime.now().strftime("%Y%m%d")}')
 
 @app.route('/api/analytics/dashboard')
 def api_analytics_dashboard():
@@ -1701,6 +4745,7 @@ def api_analytics_dashboard():
                    COALESCE(SUM(i.quantity), 0) as current_stock
             FROM products p
             LEFT JOIN inventories i ON p.id = i.product_id
+            WHERE p.discontinued_at IS NULL
             GROUP BY p.id
             ORDER BY current_stock DESC
             LIMIT 10
@@ -1718,6 +4763,7 @@ def api_analytics_dashboard():
                    COALESCE(p.reorder_point, 10) as reorder_point
             FROM products p
             LEFT JOIN inventories i ON p.id = i.product_id
+            WHERE p.discontinued_at IS NULL
             GROUP BY p.id
             HAVING current_stock <= COALESCE(p.reorder_point, ?) OR current_stock <= ?
             ORDER BY current_stock ASC
@@ -1739,32 +4785,55 @@ def api_analytics_dashboard():
 
 @app.route('/api/search')
 def api_search():
-    """New global search endpoint"""
+    """Global search over products and stores, ranked by bm25 from the FTS5 index"""
     query = request.args.get('q', '').strip()
-    if len(query) < 2:
+    if len(query) < 3:  # Trigram index needs at least three characters
         return jsonify({'results': []})
     
-    # Search products
-    products = query_db('''
-        SELECT 'product' as type, id, sku as code, name, description
-        FROM products 
-        WHERE name LIKE ? OR sku LIKE ? OR description LIKE ?
-        LIMIT 10
-    ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
-    
-    # Search stores
-    stores = query_db('''
-        SELECT 'store' as type, id, name, location as code, location as description
-        FROM stores 
-        WHERE name LIKE ? OR location LIKE ?
-        LIMIT 5
-    ''', (f'%{query}%', f'%{query}%'))
+    # Quote the input as one FTS phrase so punctuation in SKUs is matched literally
+    phrase = '"' + query.replace('"', '""') + '"'
+    
+    try:
+        products = query_db('''
+            SELECT 'product' as type, p.id, p.sku as code, p.name, p.description
+            FROM products_fts
+            JOIN products p ON p.id = products_fts.rowid
+            WHERE products_fts MATCH ? AND p.discontinued_at IS NULL
+            ORDER BY bm25(products_fts, 10.0, 5.0, 1.0)
+            LIMIT 10
+        ''', (phrase,))
+        
+        stores = query_db('''
+            SELECT 'store' as type, s.id, s.name, s.location as code, s.location as description
+            FROM stores_fts
+            JOIN stores s ON s.id = stores_fts.rowid
+            WHERE stores_fts MATCH ?
+            ORDER BY bm25(stores_fts, 10.0, 1.0)
+            LIMIT 5
+        ''', (phrase,))
+    except sqlite3.OperationalError as e:
+        # No FTS5 index in this database: fall back to scanning with LIKE
+        print(f"Search index unavailable, using LIKE: {e}")
+        products = query_db('''
+            SELECT 'product' as type, id, sku as code, name, description
+            FROM products 
+            WHERE (name LIKE ? OR sku LIKE ? OR description LIKE ?) AND discontinued_at IS NULL
+            LIMIT 10
+        ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
+        
+        stores = query_db('''
+            SELECT 'store' as type, id, name, location as code, location as description
+            FROM stores 
+            WHERE name LIKE ? OR location LIKE ?
+            LIMIT 5
+        ''', (f'%{query}%', f'%{query}%'))
     
     results = [dict(r) for r in products] + [dict(r) for r in stores]
     
     return jsonify({'results': results})
 
 @app.route('/api/settings/update', methods=['POST'])
+@role_required('admin', 'manager')
 def api_update_settings():
     """Update system settings"""
     data = request.get_json(force=True)
@@ -1800,6 +4869,7 @@ def api_realtime_data():
                     SELECT p.id
                     FROM products p
                     LEFT JOIN inventories i ON p.id = i.product_id
+                    WHERE p.discontinued_at IS NULL
                     GROUP BY p.id
                     HAVING COALESCE(SUM(i.quantity), 0) <= COALESCE(p.reorder_point, ?)
                        AND COALESCE(SUM(i.quantity), 0) > 0
@@ -1812,7 +4882,7 @@ def api_realtime_data():
         
         return jsonify({
             'notifications': notifications,
-            'total_products': query_db('SELECT COUNT(*) as count FROM products', one=True)['count'],
+            'total_products': query_db('SELECT COUNT(*) as count FROM products WHERE discontinued_at IS NULL', one=True)['count'],
             'total_stores': query_db('SELECT COUNT(*) as count FROM stores', one=True)['count'],
             'recent_transactions': recent_transactions,
             'timestamp': datetime.now().isoformat()
@@ -1831,7 +4901,7 @@ def api_realtime_data():
 def api_report_summary():
     """Enhanced summary report"""
     try:
-        rows = query_db('''
+        return list_response('''
             SELECT p.id AS product_id, p.sku, p.name, 
                    COALESCE(SUM(i.quantity), 0) AS total_quantity,
                    COALESCE(p.reorder_point, 0) as reorder_point,
@@ -1840,26 +4910,276 @@ def api_report_summary():
             FROM products p 
             LEFT JOIN inventories i ON p.id = i.product_id
             LEFT JOIN categories c ON p.category_id = c.id
+            WHERE p.discontinued_at IS NULL
             GROUP BY p.id
             ORDER BY low_stock DESC, total_quantity ASC
         ''')
-        return jsonify([dict(r) for r in (rows or [])])
     except Exception as e:
         print(f"Report summary error: {e}")
         return jsonify([]), 500
 
-if __name__ == '__main__':
-    if not DATABASE.exists():
+@app.route('/api/dashboard')
+def api_dashboard():
+    """Composite dashboard data: every dashboard panel from shared scans run side by side"""
+    try:
+        try:
+            low_stock_threshold_row = query_db('SELECT value FROM settings WHERE key=?', ('low_stock_threshold',), one=True)
+            low_stock_threshold = int(low_stock_threshold_row['value']) if low_stock_threshold_row else None
+        except:
+            low_stock_threshold = None
+        analytics_threshold = low_stock_threshold if low_stock_threshold is not None else 10
+        realtime_threshold = low_stock_threshold if low_stock_threshold is not None else 5
+
+        # The two scans and the counters are independent; run them side by side
+        reads = parallel_queries(
+            # One product-total scan feeds turnover, low stock, summary and counts
+            product_totals=('''
+                SELECT p.id AS product_id, p.sku, p.name, p.reorder_point,
+                       COALESCE(SUM(i.quantity), 0) AS total_quantity,
+                       COALESCE(c.name, '') as category_name
+                FROM products p
+                LEFT JOIN inventories i ON p.id = i.product_id
+                LEFT JOIN categories c ON p.category_id = c.id
+                WHERE p.discontinued_at IS NULL
+                GROUP BY p.id
+            ''', ()),
+            # One store x product scan feeds both low stock alerts and reorder suggestions
+            store_rows=('''
+                SELECT
+                    p.id as product_id, p.name as product_name, p.sku,
+                    p.reorder_point,
+                    s.id as store_id, s.name as store_name,
+                    COALESCE(i.quantity, 0) as current_quantity,
+                    c.name as category_name,
+                    sup.name as supplier_name, sup.id as supplier_id,
+                    COALESCE(p.cost_price, 0) as unit_cost
+                FROM products p
+                CROSS JOIN stores s
+                LEFT JOIN inventories i ON p.id = i.product_id AND s.id = i.store_id
+                LEFT JOIN categories c ON p.category_id = c.id
+                LEFT JOIN suppliers sup ON p.supplier_id = sup.id
+                WHERE p.discontinued_at IS NULL
+                  AND COALESCE(i.quantity, 0) <= COALESCE(p.reorder_point, 0)
+                ORDER BY CASE WHEN COALESCE(i.quantity, 0) = 0 THEN 1 ELSE 2 END, p.name
+            ''', ()),
+            recent_transactions=('''
+                SELECT COUNT(*) as count FROM transactions
+                WHERE created_at >= datetime('now', '-5 minutes')
+            ''', (), True),
+            total_stores=('SELECT COUNT(*) as count FROM stores', (), True),
+        )
+        product_totals = [dict(r) for r in reads['product_totals'].result()]
+
+        turnover_data = [
+            {'name': p['name'], 'sku': p['sku'], 'current_stock': p['total_quantity']}
+            for p in sorted(product_totals, key=lambda p: p['total_quantity'], reverse=True)[:10]
+        ]
+
+        low_stock_data = []
+        for p in sorted(product_totals, key=lambda p: p['total_quantity']):
+            limit = p['reorder_point'] if p['reorder_point'] is not None else analytics_threshold
+            if p['total_quantity'] <= limit or p['total_quantity'] <= analytics_threshold:
+                low_stock_data.append({
+                    'name': p['name'],
+                    'sku': p['sku'],
+                    'current_stock': p['total_quantity'],
+                    'reorder_point': p['reorder_point'] if p['reorder_point'] is not None else 10
+                })
+                if len(low_stock_data) == 20:
+                    break
+
+        summary = []
+        realtime_low_stock_count = 0
+        for p in product_totals:
+            reorder_point = p['reorder_point'] or 0
+            low_stock = 1 if 0 < p['total_quantity'] <= reorder_point else 0
+            summary.append({
+                'product_id': p['product_id'],
+                'sku': p['sku'],
+                'name': p['name'],
+                'total_quantity': p['total_quantity'],
+                'reorder_point': reorder_point,
+                'low_stock': low_stock,
+                'category_name': p['category_name']
+            })
+            limit = p['reorder_point'] if p['reorder_point'] is not None else realtime_threshold
+            if 0 < p['total_quantity'] <= limit:
+                realtime_low_stock_count += 1
+        summary.sort(key=lambda r: (-r['low_stock'], r['total_quantity']))
+
+        store_rows = reads['store_rows'].result()
+
+        low_stock_alerts = []
+        reorder_suggestions = []
+        for r in store_rows:
+            reorder_point = r['reorder_point'] or 0
+            low_stock_alerts.append({
+                'product_id': r['product_id'],
+                'product_name': r['product_name'],
+                'sku': r['sku'],
+                'reorder_point': r['reorder_point'],
+                'store_id': r['store_id'],
+                'store_name': r['store_name'],
+                'current_quantity': r['current_quantity'],
+                'category_name': r['category_name'],
+                'supplier_name': r['supplier_name'],
+                'alert_level': 'out_of_stock' if r['current_quantity'] == 0 else 'low_stock'
+            })
+            if reorder_point > 0:
+                reorder_suggestions.append({
+                    'product_id': r['product_id'],
+                    'product_name': r['product_name'],
+                    'sku': r['sku'],
+                    'reorder_point': r['reorder_point'],
+                    'store_id': r['store_id'],
+                    'store_name': r['store_name'],
+                    'current_quantity': r['current_quantity'],
+                    'supplier_name': r['supplier_name'],
+                    'supplier_id': r['supplier_id'],
+                    'suggested_quantity': max(reorder_point * 2 - r['current_quantity'], 1),
+                    'unit_cost': r['unit_cost']
+                })
+
+        recent_transactions = reads['recent_transactions'].result()['count']
+        total_stores = reads['total_stores'].result()['count']
+
+        return jsonify({
+            'analytics': {
+                'sales_data': [],
+                'turnover_data': turnover_data,
+                'low_stock_data': low_stock_data
+            },
+            'summary': summary,
+            'low_stock_alerts': low_stock_alerts,
+            'reorder_suggestions': reorder_suggestions,
+            'realtime': {
+                'notifications': recent_transactions + realtime_low_stock_count,
+                'total_products': len(product_totals),
+                'total_stores': total_stores,
+                'recent_transactions': recent_transactions,
+                'timestamp': datetime.now().isoformat()
+            }
+        })
+    except Exception as e:
+        print(f"Dashboard data error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# --- Serving ---
+# wsgi.py calls warm_up() once in the server's master process, so workers
+# forked from it start with the schema migrated and the SKU index loaded.
+draining = threading.Event()  # Set when this worker has been asked to shut down
+
+def warm_up():
+    """Bring the database schema up to date and fill per-process caches before taking traffic"""
+    fresh = not Path(app.config['DATABASE']).exists()
+    try:
         init_db()
-        print('✅ Initialized enhanced database at', DATABASE)
-    else:
-        # Update existing database with enhancements
-        with app.app_context():
+        print('✅ Initialized enhanced database at' if fresh else '✅ Enhanced existing database at',
+              app.config['DATABASE'])
+    except Exception as e:
+        print(f'⚠️  Database enhancement note: {e}')
+    
+    with app.app_context():
+        sku_index.sync(get_db())
+        if np is not None:
+            catalog_analytics.refresh(get_db())
+    dummy_password_hash(app.config['SCRYPT_N'], app.config['SCRYPT_R'], app.config['SCRYPT_P'])
+
+def reset_after_fork():
+    """Give a forked worker fresh thread pools; pool threads never survive fork()"""
+    global password_hash_pool, password_hash_slots, purge_executor, read_pool, report_executor
+    password_hash_pool = ThreadPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                                            thread_name_prefix='password-hash')
+    password_hash_slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_QUEUE'])
+    purge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge')
+    read_pool = ThreadPoolExecutor(max_workers=app.config['READ_POOL_WORKERS'], thread_name_prefix='db-read')
+    report_executor = ThreadPoolExecutor(max_workers=app.config['REPORT_WORKERS'], thread_name_prefix='report')
+    draining.clear()
+    background_lease.after_fork()
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+def start_background_jobs():
+    """Resume orphaned jobs and start the report scheduler (see BackgroundLease)"""
+    with app.app_context():
+        resume_jobs()
+    report_scheduler.start()
+
+class BackgroundLease:
+    """Cross-process lock on BACKGROUND_LEASE_FILE that picks the process running background jobs.
+
+    Every worker calls start(); a thread retries the non-blocking flock every
+    BACKGROUND_LEASE_RETRY seconds and starts the background jobs once it
+    holds it. The kernel drops the lock when the holder exits, so a recycled
+    or reloaded worker's lease passes to a sibling or its replacement.
+    """
+    
+    def __init__(self):
+        self.fd = None
+        self.thread = None
+    
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, name='background-lease', daemon=True)
+        self.thread.start()
+    
+    def acquire(self):
+        if fcntl is None:
+            return True
+        fd = os.open(app.config['BACKGROUND_LEASE_FILE'], os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+    
+    def run(self):
+        while not draining.is_set():
             try:
-                init_db()
-                print('✅ Enhanced existing database at', DATABASE)
+                if self.acquire():
+                    start_background_jobs()
+                    return
             except Exception as e:
-                print(f'⚠️  Database enhancement note: {e}')
+                print(f"Background lease error: {e}")
+            draining.wait(app.config['BACKGROUND_LEASE_RETRY'])
+    
+    def after_fork(self):
+        # A child must not keep its parent's lease alive through the inherited descriptor
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+        self.thread = None
+
+background_lease = BackgroundLease()
+
+@app.route('/healthz')
+def liveness():
+    """Liveness probe: the worker is up and answering requests"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@app.route('/readyz')
+def readiness():
+    """Readiness probe: the database answers and caches are warm; 503 while draining"""
+    checks = {'draining': draining.is_set(), 'sku_index': sku_index.last_seq is not None}
+    try:
+        get_db().execute('SELECT 1').fetchone()
+        checks['database'] = True
+    except sqlite3.Error as e:
+        print(f"Readiness check error: {e}")
+        checks['database'] = False
+    
+    ready = checks['database'] and checks['sku_index'] and not checks['draining']
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
+
+if __name__ == '__main__':
+    warm_up()
+    
+    # Under the debug reloader only the serving child runs background jobs
+    if not app.config['DEBUG'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        background_lease.start()
     
-    print('🚀 Starting Enhanced Inventory Management System...')
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    print(f"🚀 Starting Enhanced Inventory Management System ({app.config['PROFILE']} profile)...")
+    app.run(debug=app.config['DEBUG'], host='0.0.0.0', port=5000)
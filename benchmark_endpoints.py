@@ -0,0 +1,353 @@
+"""Endpoint benchmark suite for the hot pages, read APIs and every mutation endpoint.
+
+Runs each scenario through Flask's test client against generated datasets
+(see generate_data.py) and writes latency percentiles and throughput as JSON.
+A previous results file can be passed with --compare to fail on regressions.
+Datasets end on the run date, so date-windowed reads have rows to measure;
+a read scenario that comes back empty fails the run.
+
+    python benchmark_endpoints.py --scales small,medium --output bench.json
+    python benchmark_endpoints.py --scales small --compare bench.json --threshold 0.15
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from flask import template_rendered
+
+import app as inventory_app
+import generate_data
+
+
+class Context:
+    """Seeded source of ids and payloads so every run issues the same requests"""
+
+    def __init__(self, database, seed):
+        self.database = database
+        self.rng = random.Random(seed)
+        db = sqlite3.connect(database)
+        self.store_ids = [row[0] for row in db.execute('SELECT id FROM stores')]
+        self.product_ids = [row[0] for row in db.execute('SELECT id FROM products ORDER BY id LIMIT 20000')]
+        self.supplier_ids = [row[0] for row in db.execute('SELECT id FROM suppliers')]
+        self.stocked = db.execute('''
+            SELECT store_id, product_id FROM inventories WHERE quantity > 20 ORDER BY id LIMIT 20000
+        ''').fetchall()
+        self.terms = [row[0][:5] for row in db.execute('SELECT name FROM products ORDER BY id LIMIT 200')]
+        # Suppliers with no products, for the delete benchmark (there is no create endpoint)
+        db.executemany('INSERT INTO suppliers (name) VALUES (?)',
+                       [(f'Bench supplier {n}',) for n in range(1000)])
+        db.commit()
+        self.spare_suppliers = [row[0] for row in
+                                db.execute("SELECT id FROM suppliers WHERE name LIKE 'Bench supplier %'")]
+        db.close()
+        self.created = {'product': [], 'store': [], 'category': []}
+        self.sequence = 0
+
+    def store(self):
+        return self.rng.choice(self.store_ids)
+
+    def product(self):
+        return self.rng.choice(self.product_ids)
+
+    def stocked_pair(self):
+        return self.rng.choice(self.stocked)
+
+    def unique(self, prefix):
+        self.sequence += 1
+        return f'{prefix}-{self.sequence:06d}'
+
+    def take(self, kind):
+        return self.created[kind].pop() if self.created[kind] else None
+
+    def latest_transaction(self):
+        db = sqlite3.connect(self.database)
+        try:
+            return db.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+        finally:
+            db.close()
+
+
+def scenarios(ctx):
+    """(name, method, path or callable, json body or callable, hook on response)"""
+    def remember(kind):
+        def hook(response):
+            body = response.get_json(silent=True) or {}
+            if body.get('id'):
+                ctx.created[kind].append(body['id'])
+        return hook
+
+    def stocked_transfer():
+        store_id, product_id = ctx.stocked_pair()
+        to_store = ctx.store()
+        while to_store == store_id and len(ctx.store_ids) > 1:
+            to_store = ctx.store()
+        return {'from_store_id': store_id, 'to_store_id': to_store, 'product_id': product_id, 'quantity': 1}
+
+    return [
+        # Pages and read APIs
+        ('home', 'GET', '/', None, None),
+        ('inventory_page', 'GET', '/inventory', None, None),
+        ('reports_page', 'GET', '/reports', None, None),
+        ('api_report_summary', 'GET', '/api/report/summary', None, None),
+        ('api_low_stock_alerts', 'GET', '/api/alerts/low-stock', None, None),
+        ('api_transactions', 'GET', lambda: f'/api/transactions?store_id={ctx.store()}&days=90', None, None),
+        ('api_search', 'GET', lambda: f'/api/search?q={ctx.rng.choice(ctx.terms)}', None, None),
+        # Inventory mutations
+        ('api_update_inventory', 'POST', '/api/inventory/update',
+         lambda: {'store_id': ctx.store(), 'product_id': ctx.product(), 'change': ctx.rng.randint(1, 5)}, None),
+        ('api_add_stock', 'POST', '/api/inventory/add-stock',
+         lambda: {'store_id': ctx.store(), 'product_id': ctx.product(), 'quantity': 10}, None),
+        ('api_quick_add_stock', 'POST', '/api/inventory/quick-add',
+         lambda: {'store_id': ctx.store(), 'product_id': ctx.product(), 'quantity': 5}, None),
+        ('api_bulk_add_stock', 'POST', '/api/inventory/bulk-add',
+         lambda: {'items': [{'store_id': ctx.store(), 'product_id': ctx.product(), 'quantity': 3}
+                            for _ in range(10)]}, None),
+        ('api_set_stock_level', 'POST', '/api/inventory/stock-level',
+         lambda: {'store_id': ctx.store(), 'product_id': ctx.product(), 'quantity': ctx.rng.randint(20, 200)}, None),
+        ('api_set_reorder_point', 'POST', '/api/inventory/reorder-point',
+         lambda: {'product_id': ctx.product(), 'reorder_point': ctx.rng.randint(5, 50)}, None),
+        ('api_transfer_inventory', 'POST', '/api/inventory/transfer', stocked_transfer, None),
+        ('api_delete_transaction', 'DELETE', lambda: f'/api/transaction/{ctx.latest_transaction()}', None, None),
+        # Catalog mutations; deletes consume rows created by the create scenarios
+        ('api_create_product', 'POST', '/api/product',
+         lambda: {'sku': ctx.unique('BENCH'), 'name': 'Benchmark product', 'cost_price': 5, 'sell_price': 9},
+         remember('product')),
+        ('api_update_product', 'PUT', lambda: f'/api/product/{ctx.product()}',
+         lambda: {'reorder_point': ctx.rng.randint(5, 50)}, None),
+        ('api_create_store', 'POST', '/api/store', lambda: {'name': ctx.unique('Bench store')}, remember('store')),
+        ('api_update_store', 'PUT', lambda: f'/api/store/{ctx.store()}', lambda: {'phone': '555-0000'}, None),
+        ('api_create_category', 'POST', '/api/category', lambda: {'name': ctx.unique('Bench category')},
+         remember('category')),
+        ('api_update_category', 'PUT', lambda: f"/api/category/{(ctx.created['category'] or [0])[0]}",
+         lambda: {'description': 'Updated by benchmark'}, None),
+        ('api_update_supplier', 'PUT', lambda: f'/api/supplier/{ctx.rng.choice(ctx.supplier_ids)}',
+         lambda: {'contact_phone': '555-0000'}, None),
+        ('api_delete_supplier', 'DELETE',
+         lambda: f'/api/supplier/{ctx.spare_suppliers.pop() if ctx.spare_suppliers else 0}', None, None),
+        ('api_update_settings', 'POST', '/api/settings/update', lambda: {'low_stock_threshold': 10}, None),
+        ('api_delete_product', 'DELETE', lambda: f"/api/product/{ctx.take('product') or 0}", None, None),
+        ('api_delete_category', 'DELETE', lambda: f"/api/category/{ctx.take('category') or 0}", None, None),
+        ('api_delete_store', 'DELETE', lambda: f"/api/store/{ctx.take('store') or 0}", None, None),
+        # Bulk deletes only measure queueing; the purge itself runs on the background worker
+        ('api_bulk_delete_products', 'POST', '/api/products/bulk-delete',
+         lambda: {'ids': [ctx.product()]}, None),
+        ('api_bulk_delete_stores', 'POST', '/api/stores/bulk-delete', lambda: {'ids': [0]}, None),
+    ]
+
+
+def json_rows(response, context):
+    body = response.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('items', body.get('results', body))
+    return len(body) if isinstance(body, (list, dict)) else 0
+
+
+def template_rows(*names):
+    """Row count of the emptiest of the named template variables"""
+    def count(response, context):
+        return min(len(context.get(name) or []) for name in names)
+    return count
+
+
+# How many rows each read scenario returned; an empty read measures nothing
+READ_ROWS = {
+    'home': template_rows('recent_transactions', 'top_products'),
+    'inventory_page': template_rows('stores', 'categories'),
+    'reports_page': template_rows('category_summary', 'store_summary', 'transaction_summary'),
+    'api_report_summary': json_rows,
+    'api_low_stock_alerts': json_rows,
+    'api_transactions': json_rows,
+    'api_search': json_rows,
+}
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(client, scenario, iterations, warmup):
+    name, method, path, body, hook = scenario
+    rows = READ_ROWS.get(name)
+    rendered = {}
+
+    def remember_context(sender, template, context, **extra):
+        rendered['context'] = context
+
+    timings = []
+    statuses = {}
+    empty = 0
+    template_rendered.connect(remember_context, inventory_app.app)
+    try:
+        for iteration in range(warmup + iterations):
+            url = path() if callable(path) else path
+            payload = body() if callable(body) else body
+            rendered.clear()
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=payload)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            if hook:
+                hook(response)
+            if iteration >= warmup:
+                timings.append(elapsed)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                if rows and not rows(response, rendered.get('context', {})):
+                    empty += 1
+    finally:
+        template_rendered.disconnect(remember_context, inventory_app.app)
+    timings.sort()
+    total = sum(timings)
+    return {
+        'iterations': len(timings),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+        'throughput_rps': round(len(timings) / total, 1) if total else None,
+        'statuses': statuses,
+        'errors': sum(count for status, count in statuses.items() if int(status) >= 400),
+        'empty': empty,
+    }
+
+
+def dataset(scale, seed, data_dir, end_date):
+    """Path of the cached generated database for a scale whose ledger ends at end_date, generating it on first use"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'{scale}-seed{seed}-{end_date.isoformat()}.db')
+    if not os.path.exists(path):
+        # Datasets ending on other days are stale for the date-windowed routes
+        for stale in glob.glob(os.path.join(data_dir, f'{scale}-seed{seed}*.db')):
+            os.remove(stale)
+        generate_data.generate(path, seed=seed, end_date=end_date, **generate_data.PRESETS[scale])
+    return path
+
+
+def run_scale(scale, args):
+    source = dataset(scale, args.seed, args.data_dir, args.end_date)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Mutations run against a copy so the cached dataset stays pristine
+        database = os.path.join(tmp, f'{scale}.db')
+        shutil.copyfile(source, database)
+        inventory_app.app.config['DATABASE'] = database
+        # The cached dataset may predate schema changes; migrate the copy and warm
+        # per-process caches the way wsgi.py does before serving
+        inventory_app.warm_up()
+        ctx = Context(database, args.seed)
+        client = inventory_app.app.test_client()
+        client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+        for scenario in scenarios(ctx):
+            if args.only and not any(pattern in scenario[0] for pattern in args.only.split(',')):
+                continue
+            result = run_scenario(client, scenario, args.iterations, args.warmup)
+            results[scenario[0]] = result
+            print(f"   {scale:<7} {scenario[0]:<26} p50 {result['p50_ms']:>9.2f} ms  "
+                  f"p95 {result['p95_ms']:>9.2f} ms  {result['throughput_rps'] or 0:>8.1f} req/s"
+                  f"{'  (' + str(result['errors']) + ' errors)' if result['errors'] else ''}"
+                  f"{'  (' + str(result['empty']) + ' empty)' if result['empty'] else ''}")
+        # Let queued bulk-delete jobs finish before the database copy is removed
+        inventory_app.purge_executor.submit(lambda: None).result()
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Print p50/p95 changes against a baseline; returns the list of regressions"""
+    regressions = []
+    for scale, scenarios_now in current['results'].items():
+        for name, now in scenarios_now.items():
+            before = baseline.get('results', {}).get(scale, {}).get(name)
+            if not before:
+                continue
+            for metric in ('p50_ms', 'p95_ms'):
+                if not before[metric]:
+                    continue
+                change = now[metric] / before[metric] - 1
+                flag = ''
+                if change > threshold:
+                    regressions.append((scale, name, metric, change))
+                    flag = '  REGRESSION'
+                print(f'   {scale:<7} {name:<26} {metric} {before[metric]:>9.2f} -> {now[metric]:>9.2f} ms '
+                      f'({change:+.0%}){flag}')
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hot routes and mutation endpoints')
+    parser.add_argument('--scales', default='small', help='comma-separated presets: small,medium,large')
+    parser.add_argument('--iterations', type=int, default=50, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per scenario')
+    parser.add_argument('--only', help='comma-separated substrings of scenario names to run')
+    parser.add_argument('--seed', type=int, default=42, help='dataset and request seed')
+    parser.add_argument('--data-dir', default=os.path.join('instance', 'bench'), help='cache for generated datasets')
+    parser.add_argument('--output', default=os.path.join('instance', 'bench', 'results.json'),
+                        help='where to write the JSON results')
+    parser.add_argument('--compare', help='baseline results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown before failing')
+    args = parser.parse_args()
+    args.end_date = date.today()
+
+    # Keep the instrumentation quiet so it doesn't skew timings
+    inventory_app.app.config['SLOW_QUERY_SAMPLE_RATE'] = 0.0
+
+    current = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'dataset_end_date': args.end_date.isoformat(),
+        },
+        'results': {},
+    }
+    for scale in args.scales.split(','):
+        print(f'📏 {scale}: {generate_data.PRESETS[scale]}')
+        current['results'][scale] = run_scale(scale, args)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2)
+    print(f'✅ Results written to {args.output}')
+
+    empty = [(scale, name) for scale, results in current['results'].items()
+             for name, result in results.items() if result['empty']]
+    if empty:
+        print(f"❌ Read scenarios returned no rows: {', '.join(f'{scale}/{name}' for scale, name in empty)}")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"📊 Compared with {args.compare} (commit {baseline.get('meta', {}).get('commit')})")
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f'❌ {len(regressions)} regression(s) above {args.threshold:.0%}')
+            sys.exit(1)
+        print('✅ No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Login throughput benchmark for the scrypt password hashing pool.
+
+Measures raw scrypt verifications per second on one thread, then end-to-end
+POST /login throughput against a throwaway database with concurrent clients.
+
+    python benchmark_login.py --clients 16 --seconds 10
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import app as inventory_app
+
+
+def verify_rate(password_hash, seconds):
+    """Verifications per second on the calling thread, bypassing the pool"""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        inventory_app._verify_password('admin123', password_hash)
+        count += 1
+    return count / seconds
+
+
+def login_rate(clients, seconds):
+    """Successful logins per second with `clients` concurrent test clients"""
+    counts = [0] * clients
+    failures = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        client = inventory_app.app.test_client()
+        while time.perf_counter() < deadline:
+            response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+            if response.status_code == 302:
+                counts[index] += 1
+            else:
+                failures[index] += 1
+            client.get('/logout')
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sum(counts) / elapsed, sum(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8, help='concurrent login clients')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each measurement')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    config = inventory_app.app.config
+    print(f"scrypt n={config['SCRYPT_N']} r={config['SCRYPT_R']} p={config['SCRYPT_P']}, "
+          f"{config['PASSWORD_HASH_WORKERS']} hash workers, {cores} cores")
+
+    password_hash = inventory_app._hash_password('admin123')
+    single = verify_rate(password_hash, args.seconds)
+    print(f"single thread: {single:.1f} verifications/sec")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        inventory_app.init_db()
+        # First login upgrades the seeded SHA-256 admin hash to scrypt
+        inventory_app.app.test_client().post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+        rate, failures = login_rate(args.clients, args.seconds)
+        print(f"{args.clients} clients: {rate:.1f} logins/sec, {rate / cores:.1f} logins/sec/core"
+              f" ({failures} failed)")
+
+
+if __name__ == '__main__':
+    main()
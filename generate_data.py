@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic, production-sized inventory database for performance work.
+
+Rows are written with executemany in large transactions, and every table is
+drawn from its own seeded random stream, so the same arguments always produce
+the same database. The ledger ends yesterday by default, so "last N days"
+views have data; pass --end-date to pin it for byte-identical reruns.
+
+    python generate_data.py --preset medium --database instance/medium.db
+    python generate_data.py --stores 1000 --products 500000 --transactions 100000000
+"""
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import app as inventory_app
+
+PRESETS = {
+    'small': {'stores': 10, 'products': 2000, 'transactions': 100000, 'assortment': 500},
+    'medium': {'stores': 100, 'products': 50000, 'transactions': 5000000, 'assortment': 2000},
+    'large': {'stores': 1000, 'products': 500000, 'transactions': 100000000, 'assortment': 5000},
+}
+
+CATEGORIES = [
+    ('Electronics', 'ELEC'), ('Clothing', 'CLOTH'), ('Books', 'BOOK'), ('Food', 'FOOD'),
+    ('Home & Garden', 'HOME'), ('Toys', 'TOY'), ('Sports', 'SPORT'), ('Beauty', 'BEAU'),
+    ('Automotive', 'AUTO'), ('Office', 'OFFC'), ('Pet Supplies', 'PET'), ('Health', 'HLTH'),
+]
+ADJECTIVES = ['Classic', 'Deluxe', 'Compact', 'Organic', 'Premium', 'Eco', 'Smart', 'Heavy-Duty',
+              'Wireless', 'Portable', 'Vintage', 'Ultra', 'Everyday', 'Pro', 'Mini', 'Family']
+NOUNS = ['Headphones', 'Jacket', 'Notebook', 'Coffee', 'Garden Hose', 'Puzzle', 'Yoga Mat', 'Lotion',
+         'Wiper Blades', 'Stapler', 'Dog Bed', 'Vitamins', 'Lamp', 'Backpack', 'Water Bottle', 'Charger']
+CITIES = ['Springfield', 'Riverside', 'Franklin', 'Greenville', 'Fairview', 'Madison', 'Georgetown',
+          'Salem', 'Clinton', 'Arlington', 'Ashland', 'Dover', 'Oxford', 'Jackson', 'Burlington']
+BRANCHES = ['Downtown', 'Mall', 'Plaza', 'Outlet', 'Central', 'North', 'South', 'East', 'West', 'Harbor']
+
+# (type name, share of ledger events, quantity range); signs are applied per type
+TRANSACTION_MIX = [
+    ('sale', 0.70, (1, 5)),
+    ('purchase', 0.14, (20, 200)),
+    ('transfer', 0.08, (5, 50)),
+    ('return', 0.04, (1, 2)),
+    ('damage', 0.02, (1, 3)),
+    ('theft', 0.01, (1, 2)),
+    ('manual', 0.01, (1, 10)),
+]
+OUTGOING = {'sale', 'damage', 'theft'}
+
+LEDGER_INDEXES = ['idx_transactions_created_id', 'idx_transactions_store_created_id',
+                  'idx_transactions_product_created_id', 'idx_transactions_type_created_id']
+
+
+def stream(seed, name):
+    """Independent random stream per table, so changing one size doesn't reshuffle the others"""
+    return random.Random(f'{seed}:{name}')
+
+
+def zipf_cumulative(count, exponent):
+    """Cumulative weights of a Zipf distribution over ranks 1..count (skewed popularity)"""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def day_weights(start, days):
+    """Relative ledger volume per day: weekly cycle, December peak and steady growth"""
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weekly = (0.85, 0.8, 0.85, 0.95, 1.15, 1.4, 1.2)[day.weekday()]
+        seasonal = 1 + 0.25 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 350) / 365)
+        growth = 1 + 0.3 * offset / max(days, 1)
+        weights.append(weekly * seasonal * growth)
+    return weights
+
+
+def insert_batches(db, sql, rows, batch_size, label):
+    """executemany in batches, one transaction per batch; returns the row count"""
+    total = 0
+    started = time.perf_counter()
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            break
+        db.execute('BEGIN')
+        db.executemany(sql, batch)
+        db.execute('COMMIT')
+        total += len(batch)
+        rate = total / max(time.perf_counter() - started, 1e-9)
+        print(f'\r   {label}: {total:,} rows ({rate:,.0f}/s)', end='', flush=True)
+    print()
+    return total
+
+
+def generate(database, stores, products, transactions, assortment, days=730, seed=42,
+             batch_size=50000, suppliers=50, end_date=None):
+    """Create a fresh database at `database`; the ledger covers the `days` days before `end_date` (default: today)"""
+    if os.path.exists(database):
+        os.remove(database)
+    inventory_app.app.config['DATABASE'] = database
+    inventory_app.init_db()
+
+    db = sqlite3.connect(database, isolation_level=None)
+    # store_stats is rebuilt in one pass at the end instead of row by row
+    for trigger in inventory_app.STORE_STATS_TRIGGERS:
+        db.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    db.execute('PRAGMA journal_mode = WAL')
+    db.execute('PRAGMA synchronous = OFF')
+    db.execute('PRAGMA cache_size = -262144')  # 256 MiB
+    db.execute('PRAGMA temp_store = MEMORY')
+
+    print(f'🏭 Generating {stores:,} stores, {products:,} products, {transactions:,} transactions (seed {seed})')
+
+    # Categories and suppliers
+    db.execute('DELETE FROM categories')
+    insert_batches(db, 'INSERT INTO categories (name, description) VALUES (?, ?)',
+                   ((name, f'{name} products') for name, _ in CATEGORIES), batch_size, 'categories')
+    category_ids = [row[0] for row in db.execute('SELECT id FROM categories ORDER BY id')]
+    rng = stream(seed, 'suppliers')
+    insert_batches(db, 'INSERT OR IGNORE INTO suppliers (name, contact_email, contact_phone) VALUES (?, ?, ?)',
+                   ((f'Supplier {n:04d}', f'orders{n}@supplier.example', f'555-{rng.randint(1000, 9999)}')
+                    for n in range(1, suppliers + 1)), batch_size, 'suppliers')
+    supplier_ids = [row[0] for row in db.execute('SELECT id FROM suppliers ORDER BY id')]
+
+    # Stores, with a lognormal size that scales their share of the ledger
+    rng = stream(seed, 'stores')
+
+    def store_rows():
+        for n in range(1, stores + 1):
+            city = CITIES[n % len(CITIES)]
+            branch = BRANCHES[(n // len(CITIES)) % len(BRANCHES)]
+            yield (f'{city} {branch} #{n}', f'{rng.randint(1, 9999)} Main St, {city}',
+                   f'Manager {n}', f'555-{rng.randint(1000, 9999)}', f'store{n}@inventory.example')
+    insert_batches(db, 'INSERT INTO stores (name, location, manager_name, phone, email) VALUES (?, ?, ?, ?, ?)',
+                   store_rows(), batch_size, 'stores')
+    store_ids = [row[0] for row in db.execute('SELECT id FROM stores ORDER BY id')]
+    store_cumulative = list(itertools.accumulate(rng.lognormvariate(0, 0.6) for _ in store_ids))
+
+    # Products
+    rng = stream(seed, 'products')
+
+    def product_rows():
+        for n in range(1, products + 1):
+            category_index = rng.randrange(len(CATEGORIES))
+            cost = round(rng.lognormvariate(2.5, 0.9), 2)
+            yield (f'{CATEGORIES[category_index][1]}-{n:07d}',
+                   f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}',
+                   f'Synthetic product {n}',
+                   category_ids[category_index % len(category_ids)],
+                   rng.choice(supplier_ids) if supplier_ids else None,
+                   cost, round(cost * rng.uniform(1.2, 2.2), 2), rng.choice((5, 10, 10, 20, 50)))
+    insert_batches(db, '''INSERT INTO products (sku, name, description, category_id, supplier_id,
+                                                 cost_price, sell_price, reorder_point)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', product_rows(), batch_size, 'products')
+    product_ids = [row[0] for row in db.execute('SELECT id FROM products ORDER BY id')]
+    # Popularity rank is a seeded shuffle of the catalog, skewed by Zipf
+    popularity = product_ids[:]
+    stream(seed, 'popularity').shuffle(popularity)
+    product_cumulative = zipf_cumulative(len(popularity), 1.1)
+
+    # Inventories: every store stocks the most popular half of its assortment
+    # plus a random selection from the rest of the catalog
+    rng = stream(seed, 'inventories')
+    assortment = min(assortment, len(product_ids))
+    core = popularity[:assortment // 2]
+    long_tail = popularity[assortment // 2:]
+
+    def inventory_rows():
+        for store_id in store_ids:
+            for product_id in core + rng.sample(long_tail, assortment - len(core)):
+                # Roughly one in ten lines sits at or below a typical reorder point
+                quantity = rng.randint(0, 8) if rng.random() < 0.1 else rng.randint(10, 400)
+                yield (store_id, product_id, quantity)
+    insert_batches(db, 'INSERT OR IGNORE INTO inventories (store_id, product_id, quantity) VALUES (?, ?, ?)',
+                   inventory_rows(), batch_size, 'inventories')
+
+    # Ledger: generated day by day in time order; indexes are rebuilt afterwards
+    for index in LEDGER_INDEXES:
+        db.execute(f'DROP INDEX IF EXISTS {index}')
+    type_ids = dict(db.execute('SELECT name, id FROM transaction_types'))
+    type_names = [name for name, _, _ in TRANSACTION_MIX]
+    type_cumulative = list(itertools.accumulate(share for _, share, _ in TRANSACTION_MIX))
+    quantities = {name: bounds for name, _, bounds in TRANSACTION_MIX}
+    start = (end_date or date.today()) - timedelta(days=days)
+    weights = day_weights(start, days)
+    weight_total = sum(weights)
+    rng = stream(seed, 'transactions')
+
+    def ledger_rows():
+        produced = 0
+        carry = 0.0
+        for offset, weight in enumerate(weights):
+            carry += transactions * weight / weight_total
+            events = int(carry) if offset < days - 1 else transactions - produced
+            carry -= int(carry)
+            day_start = datetime.combine(start + timedelta(days=offset), datetime.min.time())
+            rows = []
+            while len(rows) < events:
+                kind = type_names[bisect.bisect(type_cumulative, rng.random() * type_cumulative[-1])]
+                if kind == 'transfer' and (events - len(rows) < 2 or len(store_ids) < 2):
+                    kind = 'sale'  # A transfer needs two rows and two stores
+                store_id = store_ids[bisect.bisect(store_cumulative, rng.random() * store_cumulative[-1])]
+                product_id = popularity[bisect.bisect(product_cumulative, rng.random() * product_cumulative[-1])]
+                quantity = rng.randint(*quantities[kind])
+                # Trading hours 08:00-21:00
+                moment = day_start + timedelta(seconds=rng.randint(8 * 3600, 21 * 3600))
+                created_at = moment.strftime('%Y-%m-%d %H:%M:%S')
+                reference = f'{kind[:3].upper()}-{offset:04d}-{len(rows):06d}'
+                type_id = type_ids.get(kind, 1)
+                if kind == 'transfer':
+                    to_store = store_id
+                    while to_store == store_id:
+                        to_store = rng.choice(store_ids)
+                    rows.append((created_at, store_id, product_id, -quantity, 'Synthetic transfer (OUT)',
+                                 type_id, reference, 'generator'))
+                    rows.append((created_at, to_store, product_id, quantity, 'Synthetic transfer (IN)',
+                                 type_id, reference, 'generator'))
+                    continue
+                change = -quantity if kind in OUTGOING else quantity
+                rows.append((created_at, store_id, product_id, change, f'Synthetic {kind}',
+                             type_id, reference, 'generator'))
+            rows.sort()
+            produced += len(rows)
+            for created_at, *rest in rows:
+                yield (rest[0], rest[1], rest[2], rest[3], created_at, rest[4], rest[5], rest[6])
+    insert_batches(db, '''INSERT INTO transactions (store_id, product_id, change, note, created_at,
+                                                     transaction_type_id, reference_number, user_id)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', ledger_rows(), batch_size, 'transactions')
+    db.close()
+
+    # init_db recreates the indexes and triggers, and rebuilds the still-empty store_stats
+    print('   rebuilding indexes and store stats...')
+    inventory_app.init_db()
+    db = sqlite3.connect(database)
+    db.execute('ANALYZE')
+    db.close()
+    print(f'✅ Generated database at {database}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic inventory database')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small', help='base dataset size')
+    parser.add_argument('--database', help='output path, overwritten (default: instance/<preset>.db)')
+    parser.add_argument('--stores', type=int, help='number of stores')
+    parser.add_argument('--products', type=int, help='number of SKUs')
+    parser.add_argument('--transactions', type=int, help='number of ledger rows')
+    parser.add_argument('--assortment', type=int, help='SKUs stocked per store')
+    parser.add_argument('--days', type=int, default=730, help='days of ledger history')
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date.today(),
+                        help='ledger history ends the day before this YYYY-MM-DD date (default: today)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    parser.add_argument('--batch-size', type=int, default=50000, help='rows per executemany transaction')
+    args = parser.parse_args()
+
+    sizes = dict(PRESETS[args.preset])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+    database = args.database or str(Path(inventory_app.DATABASE).parent / f'{args.preset}.db')
+    if Path(database).resolve() == Path(inventory_app.DATABASE).resolve():
+        parser.error(f'{database} is the live database; pick another --database')
+    generate(database, days=args.days, seed=args.seed, batch_size=args.batch_size,
+             end_date=args.end_date, **sizes)
+
+
+if __name__ == '__main__':
+    main()
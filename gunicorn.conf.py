@@ -0,0 +1,44 @@
+"""Gunicorn settings for serving wsgi:application in production.
+
+Every value can be overridden on the command line or with the environment
+variables read below. Graceful operations on the master process:
+
+    kill -HUP <master>    reload config and replace workers one by one
+    kill -USR2 <master>   start a new master with new code, then -WINCH/-TERM the old one
+    kill -TERM <master>   stop accepting connections and finish in-flight requests
+"""
+import multiprocessing
+import os
+import signal
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+# SQLite serializes writers, so more processes than cores only adds lock waits
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+preload_app = True  # Import and warm once in the master; workers share the pages copy-on-write
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = 5000  # Recycle workers periodically to bound memory growth
+max_requests_jitter = 500
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Flip /readyz to 503 as soon as the worker is told to stop, and compete for the background-job lease"""
+    import app as inventory_app
+
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        inventory_app.draining.set()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain)
+
+    # Whichever worker holds the lease runs job recovery and the report scheduler; when it
+    # exits (max_requests, HUP, crash) another worker or its replacement takes the lease over
+    inventory_app.background_lease.start()
@@ -0,0 +1,319 @@
+"""HTTP load generator replaying a store traffic mix against a running server.
+
+Each worker process logs in with its own session and, on several threads, picks
+actions from a weighted mix: dashboard polling, POS sales, receiving (single
+and bulk), inter-store transfers and report views. Reports throughput, error
+rate, "database is locked" failures and latency percentiles per action, and
+exits non-zero when the error budget is exceeded, so it can gate concurrency
+changes.
+
+    python app.py &
+    python load_test.py --url http://localhost:5000 --processes 4 --threads 4 --duration 60
+    python load_test.py --mix dashboard=50,sale=40,transfer=10 --output load.json
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from http.cookies import SimpleCookie
+from threading import Thread
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_MIX = 'dashboard=35,sale=30,receive=10,bulk_receive=5,transfer=10,report=10'
+LOCK_MARKERS = (b'database is locked', b'database table is locked')
+
+
+class Session:
+    """Keep-alive HTTP connection carrying the Flask session cookie"""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self.cookies = SimpleCookie()
+        self.connection = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.connection = cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, form=None):
+        """Send one request, returning (status, body bytes)"""
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={m.value}' for k, m in self.cookies.items())
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            payload = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in (1, 2):
+            if self.connection is None:
+                self._connect()
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(header)
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status, data
+
+    def login(self, username, password):
+        status, _ = self.request('POST', '/login', form={'username': username, 'password': password})
+        if status != 302 or 'session' not in self.cookies:
+            raise RuntimeError(f'login as {username} failed with HTTP {status}')
+
+
+class Catalog:
+    """Stores and stocked products discovered through the API before the run"""
+
+    def __init__(self, stores, stock):
+        self.stores = stores
+        self.stock = stock  # store_id -> [product_id, ...]
+
+    @classmethod
+    def discover(cls, session, max_stores, max_products):
+        status, data = session.request('GET', '/api/stores')
+        if status != 200:
+            raise RuntimeError(f'GET /api/stores failed with HTTP {status}')
+        stores = [s['id'] for s in json.loads(data)][:max_stores]
+        stock = {}
+        for store_id in stores:
+            status, data = session.request('GET', f'/api/inventories/{store_id}')
+            if status == 200:
+                rows = json.loads(data)
+                stock[store_id] = [row['product_id'] for row in rows[:max_products]]
+        stores = [s for s in stores if stock.get(s)]
+        if not stores:
+            raise RuntimeError('no stocked inventory to drive the load test; seed data first')
+        return cls(stores, stock)
+
+
+def build_actions(catalog, rng):
+    """Action name -> callable returning (method, path, json body)"""
+    def store_product():
+        store_id = rng.choice(catalog.stores)
+        return store_id, rng.choice(catalog.stock[store_id])
+
+    def dashboard():
+        return 'GET', rng.choice(['/api/dashboard', '/api/realtime-data', '/api/alerts/low-stock']), None
+
+    def sale():
+        store_id, product_id = store_product()
+        return 'POST', '/api/inventory/update', {
+            'store_id': store_id, 'product_id': product_id, 'change': -rng.randint(1, 3),
+            'transaction_type': 'sale', 'note': 'POS sale', 'user_id': 'loadtest'}
+
+    def receive():
+        store_id, product_id = store_product()
+        return 'POST', '/api/inventory/add-stock', {
+            'store_id': store_id, 'product_id': product_id, 'quantity': rng.randint(10, 50),
+            'notes': 'Load test receiving', 'user_id': 'loadtest'}
+
+    def bulk_receive():
+        store_id = rng.choice(catalog.stores)
+        products = rng.sample(catalog.stock[store_id], min(len(catalog.stock[store_id]), rng.randint(5, 20)))
+        return 'POST', '/api/inventory/bulk-add', {'items': [
+            {'store_id': store_id, 'product_id': product_id, 'quantity': rng.randint(5, 40)}
+            for product_id in products]}
+
+    def transfer():
+        from_store, product_id = store_product()
+        others = [s for s in catalog.stores if s != from_store] or [from_store]
+        return 'POST', '/api/inventory/transfer', {
+            'from_store_id': from_store, 'to_store_id': rng.choice(others), 'product_id': product_id,
+            'quantity': rng.randint(1, 5), 'note': 'Load test transfer', 'user_id': 'loadtest'}
+
+    def report():
+        return 'GET', rng.choice(['/reports', '/api/report/summary', '/api/analytics/dashboard']), None
+
+    return {'dashboard': dashboard, 'sale': sale, 'receive': receive, 'bulk_receive': bulk_receive,
+            'transfer': transfer, 'report': report}
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def run_thread(session, actions, mix, deadline, think, rng, stats):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.time() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = actions[name]()
+        started = time.perf_counter()
+        try:
+            status, data = session.request(method, path, body=body)
+        except (OSError, http.client.HTTPException) as e:
+            status, data = 'error', str(e).encode()
+        elapsed = time.perf_counter() - started
+        entry = stats.setdefault(name, {'latencies': [], 'statuses': Counter(), 'locks': 0, 'samples': []})
+        entry['latencies'].append(elapsed)
+        entry['statuses'][str(status)] += 1
+        if any(marker in data for marker in LOCK_MARKERS):
+            entry['locks'] += 1
+        if (status == 'error' or status >= 500) and len(entry['samples']) < 3:
+            entry['samples'].append(data[:200].decode('utf-8', 'replace'))
+        if think:
+            time.sleep(rng.expovariate(1 / think))
+
+
+def worker(index, args, catalog, start_at):
+    """One process: log in per thread, wait for the common start, then replay the mix"""
+    mix = parse_mix(args.mix)
+    deadline = start_at + args.duration
+    per_thread = []
+    threads = []
+    for t in range(args.threads):
+        rng = random.Random(args.seed * 1000 + index * 100 + t)
+        session = Session(args.url, args.timeout)
+        session.login(args.username, args.password)
+        stats = {}
+        per_thread.append(stats)
+        threads.append(Thread(target=run_thread, args=(session, build_actions(catalog, rng), mix,
+                                                       deadline, args.think, rng, stats)))
+    time.sleep(max(0.0, start_at - time.time()))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = {}
+    for stats in per_thread:
+        for name, entry in stats.items():
+            target = merged.setdefault(name, {'latencies': [], 'statuses': Counter(), 'locks': 0, 'samples': []})
+            target['latencies'].extend(entry['latencies'])
+            target['statuses'].update(entry['statuses'])
+            target['locks'] += entry['locks']
+            target['samples'].extend(entry['samples'][:3 - len(target['samples'])])
+    return merged
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def summarize(name, entry, duration):
+    latencies = sorted(entry['latencies'])
+    count = len(latencies)
+    failed = sum(n for status, n in entry['statuses'].items() if status == 'error' or int(status) >= 500)
+    rejected = sum(n for status, n in entry['statuses'].items() if status != 'error' and 400 <= int(status) < 500)
+    return {
+        'action': name,
+        'requests': count,
+        'throughput_rps': round(count / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'errors': failed,
+        'error_rate': round(failed / count, 4) if count else 0.0,
+        'rejected': rejected,
+        'lock_errors': entry['locks'],
+        'statuses': dict(entry['statuses']),
+        'samples': entry['samples'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a store traffic mix against a running server')
+    parser.add_argument('--url', default='http://localhost:5000', help='base URL of the running app')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2, help='worker processes')
+    parser.add_argument('--threads', type=int, default=2, help='logged-in clients per process')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load after the common start')
+    parser.add_argument('--think', type=float, default=0.0, help='mean seconds each client waits between requests')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'weighted actions (default {DEFAULT_MIX})')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--stores', type=int, default=50, help='stores to spread the load over')
+    parser.add_argument('--products', type=int, default=200, help='stocked products per store to use')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON summary here')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='fail above this 5xx/connection error rate')
+    parser.add_argument('--max-lock-errors', type=int, default=0, help='fail above this many lock errors')
+    args = parser.parse_args()
+
+    unknown = set(parse_mix(args.mix)) - set(build_actions(Catalog([1], {1: [1]}), random.Random()))
+    if unknown:
+        parser.error(f"unknown actions in --mix: {', '.join(sorted(unknown))}")
+
+    setup = Session(args.url, args.timeout)
+    setup.login(args.username, args.password)
+    catalog = Catalog.discover(setup, args.stores, args.products)
+    print(f'🏬 {len(catalog.stores)} stores, {sum(map(len, catalog.stock.values()))} stocked products; '
+          f'{args.processes} processes x {args.threads} clients for {args.duration:.0f}s')
+
+    # Logins hash passwords, so give every client time to sign in before the clock starts
+    start_at = time.time() + 2 + 0.5 * args.threads
+    with multiprocessing.Pool(args.processes) as pool:
+        parts = pool.starmap(worker, [(i, args, catalog, start_at) for i in range(args.processes)])
+
+    merged = {}
+    for part in parts:
+        for name, entry in part.items():
+            target = merged.setdefault(name, {'latencies': [], 'statuses': Counter(), 'locks': 0, 'samples': []})
+            target['latencies'].extend(entry['latencies'])
+            target['statuses'].update(entry['statuses'])
+            target['locks'] += entry['locks']
+            target['samples'].extend(entry['samples'][:3 - len(target['samples'])])
+
+    actions = [summarize(name, merged[name], args.duration) for name in sorted(merged)]
+    total = summarize('total', {
+        'latencies': [x for entry in merged.values() for x in entry['latencies']],
+        'statuses': sum((entry['statuses'] for entry in merged.values()), Counter()),
+        'locks': sum(entry['locks'] for entry in merged.values()),
+        'samples': [],
+    }, args.duration)
+
+    print(f"{'action':<14}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'errors':>8}{'locks':>7}{'4xx':>7}")
+    for row in actions + [total]:
+        print(f"{row['action']:<14}{row['requests']:>8}{row['throughput_rps']:>9.1f}{row['p50_ms']:>9.1f}"
+              f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}{row['errors']:>8}"
+              f"{row['lock_errors']:>7}{row['rejected']:>7}")
+    for row in actions:
+        for sample in row['samples']:
+            print(f"   {row['action']}: {sample}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k != 'password'},
+                       'actions': actions, 'total': total}, f, indent=2)
+        print(f'✅ Results written to {args.output}')
+
+    if total['error_rate'] > args.max_error_rate or total['lock_errors'] > args.max_lock_errors:
+        print(f"❌ error rate {total['error_rate']:.2%}, {total['lock_errors']} lock errors")
+        sys.exit(1)
+    print(f"✅ error rate {total['error_rate']:.2%}, {total['lock_errors']} lock errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -183,7 +183,7 @@ class InventoryApp {
   }
 
   async performGlobalSearch(query) {
-    if (query.length < 2) return;
+    if (query.trim().length < 3) return; // The search index matches three or more characters
     
     try {
       const response = await fetch(`/api/search?q=${encodeURIComponent(query)}`);
@@ -560,6 +560,9 @@ class InventoryApp {
   }
 
   setupDataPolling() {
+    // The dashboard polls /api/dashboard, which already carries the realtime data
+    if (window.DASHBOARD_BATCHED) return;
+
     // Poll for updates every 30 seconds
     setInterval(() => {
       this.updateRealTimeData();
@@ -683,12 +686,17 @@ class InventoryApp {
   }
 
   async refreshDashboard() {
+    if (window.DASHBOARD_BATCHED && typeof window.loadDashboardData === 'function') {
+      await window.loadDashboardData();
+      return;
+    }
+
     try {
-      const response = await fetch('/api/report/summary');
+      const response = await fetch('/api/dashboard');
       const data = await response.json();
       
       // Update dashboard elements
-      this.updateDashboardTable(data);
+      this.updateDashboardTable(data.summary);
     } catch (error) {
       console.error('Dashboard refresh error:', error);
     }
@@ -724,8 +732,7 @@ class InventoryApp {
     // Refresh store page data
     const storeId = window.location.pathname.split('/').pop();
     try {
-      const response = await fetch(`/api/inventories/${storeId}`);
-      const data = await response.json();
+      const data = await fetchRecords(`/api/inventories/${storeId}`);
       
       // Update store inventory table
       this.updateStoreInventoryTable(data);
@@ -753,6 +760,113 @@ class InventoryApp {
   }
 }
 
+// Expand a {columns, rows} payload from ?format=columns into record objects
+function decodeColumns(payload) {
+  const { columns, rows } = payload;
+  return rows.map(row => {
+    const record = {};
+    for (let i = 0; i < columns.length; i++) {
+      record[columns[i]] = row[i];
+    }
+    return record;
+  });
+}
+
+// Fetch a list endpoint in the compact columnar encoding and decode it
+async function fetchRecords(url) {
+  const separator = url.includes('?') ? '&' : '?';
+  const response = await fetch(`${url}${separator}format=columns`);
+  const payload = await response.json();
+  if (!response.ok) {
+    throw new Error(payload.error || 'Request failed');
+  }
+  return decodeColumns(payload);
+}
+
+// Keyset-paged loader for endpoints returning {items, next_cursor}.
+// Fetches the next page whenever the sentinel element scrolls into view.
+class PagedLoader {
+  constructor(url, sentinel, onPage) {
+    this.url = url;
+    this.onPage = onPage;
+    this.params = {};
+    this.cursor = null;
+    this.done = false;
+    this.loading = false;
+    this.generation = 0;
+    this.sentinel = sentinel;
+
+    if (sentinel && 'IntersectionObserver' in window) {
+      this.observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+          this.loadMore();
+        }
+      }, { rootMargin: '300px' });
+      this.observer.observe(sentinel);
+    }
+  }
+
+  // Start over from the first page with a new set of filters
+  reset(params = {}) {
+    this.params = params;
+    this.cursor = null;
+    this.done = false;
+    this.loading = false;
+    this.generation++;
+    return this.loadMore();
+  }
+
+  async loadMore() {
+    if (this.loading || this.done) return;
+    this.loading = true;
+    const generation = this.generation;
+    const firstPage = this.cursor === null;
+
+    const query = new URLSearchParams();
+    Object.entries(this.params).forEach(([key, value]) => {
+      if (value !== '' && value !== null && value !== undefined) {
+        query.set(key, value);
+      }
+    });
+    if (this.cursor) {
+      query.set('after', this.cursor);
+    }
+
+    try {
+      const response = await fetch(`${this.url}?${query.toString()}`);
+      const data = await response.json();
+      if (generation !== this.generation) return; // Filters changed mid-flight
+      if (!response.ok) {
+        throw new Error(data.error || 'Request failed');
+      }
+
+      this.cursor = data.next_cursor;
+      this.done = !data.next_cursor;
+      this.onPage(data.items, firstPage, this.done);
+    } catch (error) {
+      console.error('Paged load error:', error);
+      this.done = true;
+    } finally {
+      if (generation === this.generation) {
+        this.loading = false;
+      }
+    }
+
+    // The observer only fires on changes, so keep going while the sentinel stays visible
+    if (generation === this.generation && !this.done && this.sentinelVisible()) {
+      this.loadMore();
+    }
+  }
+
+  sentinelVisible() {
+    if (!this.sentinel) return false;
+    const rect = this.sentinel.getBoundingClientRect();
+    return rect.top < window.innerHeight + 300;
+  }
+}
+
+window.PagedLoader = PagedLoader;
+
 // Initialize the app when DOM is loaded
 document.addEventListener('DOMContentLoaded', () => {
   window.inventoryApp = new InventoryApp();
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import app as inventory_app  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Fresh, migrated database in a temp directory; per-process caches start empty"""
+    monkeypatch.chdir(ROOT)  # init_db reads schema.sql relative to the working directory
+    path = tmp_path / 'inventory.db'
+    monkeypatch.setitem(inventory_app.app.config, 'DATABASE', str(path))
+    monkeypatch.setitem(inventory_app.app.config, 'TESTING', True)
+    monkeypatch.setattr(inventory_app, 'sku_index', inventory_app.SkuIndex())
+    inventory_app.user_cache.invalidate()
+    inventory_app.init_db()
+    return path
+
+
+@pytest.fixture
+def db(database):
+    """Raw connection to the test database"""
+    connection = sqlite3.connect(database)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA foreign_keys = ON')
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def client(database):
+    """Test client signed in as the seeded admin"""
+    client = inventory_app.app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    return client
+
+
+def add_store(db, name, location='Test'):
+    cur = db.execute('INSERT INTO stores (name, location) VALUES (?, ?)', (name, location))
+    db.commit()
+    return cur.lastrowid
+
+
+def add_product(db, sku, name=None, reorder_point=5, cost_price=2.0, sell_price=3.0):
+    cur = db.execute('''INSERT INTO products (sku, name, reorder_point, cost_price, sell_price)
+                        VALUES (?, ?, ?, ?, ?)''', (sku, name or sku, reorder_point, cost_price, sell_price))
+    db.commit()
+    return cur.lastrowid
+
+
+def set_stock(db, store_id, product_id, quantity):
+    db.execute('''INSERT INTO inventories (store_id, product_id, quantity) VALUES (?, ?, ?)
+                  ON CONFLICT(store_id, product_id) DO UPDATE SET quantity = excluded.quantity''',
+               (store_id, product_id, quantity))
+    db.commit()
@@ -0,0 +1,61 @@
+import hashlib
+
+import app as inventory_app
+
+
+def admin_hash(db):
+    return db.execute("SELECT password_hash FROM users WHERE username = 'admin'").fetchone()[0]
+
+
+def set_admin_hash(db, password_hash):
+    db.execute("UPDATE users SET password_hash = ? WHERE username = 'admin'", (password_hash,))
+    db.commit()
+
+
+def login(password, username='admin'):
+    client = inventory_app.app.test_client()
+    return client.post('/login', data={'username': username, 'password': password})
+
+
+def test_legacy_sha256_hash_is_upgraded_on_login(database, db):
+    set_admin_hash(db, hashlib.sha256(b'admin123').hexdigest())
+
+    assert login('admin123').status_code == 302
+
+    upgraded = admin_hash(db)
+    assert not inventory_app.password_needs_rehash(upgraded)
+    assert upgraded.startswith(f"scrypt${inventory_app.app.config['SCRYPT_N']}$")
+    assert login('admin123').status_code == 302
+    assert admin_hash(db) == upgraded  # Current hashes are left alone
+
+
+def test_wrong_password_is_rejected_and_leaves_the_hash(database, db):
+    legacy = hashlib.sha256(b'admin123').hexdigest()
+    set_admin_hash(db, legacy)
+
+    assert login('admin124').status_code == 200
+    assert login('admin124', username='nobody').status_code == 200
+    assert admin_hash(db) == legacy
+
+
+def test_hash_is_upgraded_when_the_scrypt_cost_changes(database, db, monkeypatch):
+    assert login('admin123').status_code == 302
+    before = admin_hash(db)
+
+    monkeypatch.setitem(inventory_app.app.config, 'SCRYPT_N', inventory_app.app.config['SCRYPT_N'] * 2)
+    assert inventory_app.password_needs_rehash(before)
+    assert login('admin123').status_code == 302
+
+    after = admin_hash(db)
+    assert after.startswith(f"scrypt${inventory_app.app.config['SCRYPT_N']}$")
+    assert inventory_app._verify_password('admin123', after)
+
+
+def test_full_hash_queue_answers_503(database, monkeypatch):
+    class Full:
+        def acquire(self, timeout=None):
+            return False
+
+    monkeypatch.setattr(inventory_app, 'password_hash_slots', Full())
+
+    assert login('admin123').status_code == 503
@@ -0,0 +1,25 @@
+import pytest
+
+import app as inventory_app
+
+
+@pytest.fixture
+def restore_config():
+    saved = dict(inventory_app.app.config)
+    yield
+    inventory_app.app.config.clear()
+    inventory_app.app.config.update(saved)
+
+
+def test_production_refuses_the_default_secret_key(restore_config, monkeypatch):
+    monkeypatch.delenv('INVENTORY_SECRET_KEY', raising=False)
+    inventory_app.app.config['SECRET_KEY'] = inventory_app.DEFAULT_SECRET_KEY
+    with pytest.raises(RuntimeError, match='INVENTORY_SECRET_KEY'):
+        inventory_app.load_config('production')
+
+
+def test_production_starts_with_its_own_secret_key(restore_config, monkeypatch):
+    monkeypatch.setenv('INVENTORY_SECRET_KEY', 'a-real-secret')
+    inventory_app.load_config('production')
+    assert inventory_app.app.secret_key == 'a-real-secret'
+    assert inventory_app.app.config['DEBUG'] is False
@@ -0,0 +1,54 @@
+import pytest
+
+import app as inventory_app
+from conftest import add_product, add_store, set_stock
+
+
+@pytest.fixture
+def grid(db):
+    """Four stores by six products with repeated quantities and names, so sorts need their tie-breakers"""
+    stores = [add_store(db, name) for name in ('North', 'South', 'East', 'West')]
+    products = [add_product(db, f'G-{n}', name=f'Item {n % 3}', reorder_point=4) for n in range(6)]
+    for s, store_id in enumerate(stores):
+        for p, product_id in enumerate(products):
+            set_stock(db, store_id, product_id, (s + p) % 5)
+    return db
+
+
+def walk(client, **args):
+    items, cursor = [], None
+    while True:
+        query = dict(args, limit=7, **({'after': cursor} if cursor else {}))
+        response = client.get('/api/inventory/grid', query_string=query)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        items += body['items']
+        cursor = body['next_cursor']
+        if not cursor:
+            return items
+
+
+@pytest.mark.parametrize('sort', sorted(inventory_app.INVENTORY_GRID_SORTS))
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_every_sort_pages_through_all_rows_in_order(client, grid, sort, order):
+    items = walk(client, sort=sort, order=order)
+
+    ids = [item['id'] for item in items]
+    assert sorted(ids) == [row[0] for row in grid.execute('SELECT id FROM inventories ORDER BY id')]
+    keys = [tuple(item[column] for _, column in inventory_app.INVENTORY_GRID_SORTS[sort]) for item in items]
+    assert keys == sorted(keys, reverse=order == 'desc')
+
+
+def test_filters_and_status_are_applied_across_pages(client, grid):
+    items = walk(client, status='low', q='Item 1')
+
+    assert items
+    assert all(item['stock_status'] == 'low' and item['product_name'] == 'Item 1' for item in items)
+    expected = grid.execute('''SELECT COUNT(*) FROM inventories i JOIN products p ON p.id = i.product_id
+                               WHERE p.name = 'Item 1' AND i.quantity BETWEEN 1 AND 4''').fetchone()[0]
+    assert len(items) == expected
+
+
+def test_unknown_sort_and_bad_cursor_are_rejected(client, grid):
+    assert client.get('/api/inventory/grid', query_string={'sort': 'price'}).status_code == 400
+    assert client.get('/api/inventory/grid', query_string={'after': inventory_app.encode_cursor([1])}).status_code == 400
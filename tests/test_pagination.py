@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as inventory_app
+from conftest import add_product, add_store
+
+
+@pytest.fixture
+def ledger(db):
+    """23 recent transactions, several sharing a created_at so the id breaks ties"""
+    store_id = add_store(db, 'Store')
+    product_id = add_product(db, 'P-1')
+    start = datetime.utcnow() - timedelta(days=3)
+    for n in range(23):
+        created_at = (start + timedelta(minutes=n // 3)).strftime('%Y-%m-%d %H:%M:%S')
+        db.execute('INSERT INTO transactions (store_id, product_id, change, created_at) VALUES (?, ?, ?, ?)',
+                   (store_id, product_id, n + 1, created_at))
+    db.commit()
+    return [row[0] for row in db.execute('SELECT id FROM transactions ORDER BY created_at DESC, id DESC')]
+
+
+def page(client, **args):
+    response = client.get('/api/transactions', query_string={'limit': 5, **args})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return ([row['id'] for row in response.get_json()],
+            response.headers.get('X-Next-Cursor'), response.headers.get('X-Prev-Cursor'))
+
+
+def test_walking_forward_then_back_visits_every_row_once(client, ledger):
+    ids, next_cursor, prev_cursor = page(client)
+    assert prev_cursor is None
+    pages = [ids]
+    while next_cursor:
+        ids, next_cursor, prev_cursor = page(client, after=next_cursor)
+        pages.append(ids)
+
+    assert [len(ids) for ids in pages] == [5, 5, 5, 5, 3]
+    assert sum(pages, []) == ledger
+
+    back = []
+    while prev_cursor:
+        ids, next_cursor, prev_cursor = page(client, before=prev_cursor)
+        assert next_cursor
+        back.append(ids)
+    assert back == pages[-2::-1]
+
+
+def test_filters_apply_to_every_page(client, db, ledger):
+    other = add_store(db, 'Other')
+    db.execute('''INSERT INTO transactions (store_id, product_id, change, created_at)
+                  SELECT ?, product_id, change, created_at FROM transactions''', (other,))
+    db.commit()
+
+    ids, next_cursor, _ = page(client, store_id=other)
+    while next_cursor:
+        more, next_cursor, _ = page(client, store_id=other, after=next_cursor)
+        ids += more
+
+    assert len(ids) == len(ledger)
+    assert {row[0] for row in db.execute('SELECT DISTINCT store_id FROM transactions WHERE id IN (%s)'
+                                         % ','.join('?' * len(ids)), ids)} == {other}
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', inventory_app.encode_cursor([1])])
+def test_malformed_cursors_are_rejected(client, ledger, cursor):
+    assert client.get('/api/transactions', query_string={'after': cursor}).status_code == 400
+    assert client.get('/api/transactions', query_string={'before': cursor}).status_code == 400
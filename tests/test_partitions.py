@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as inventory_app
+from conftest import add_product, add_store
+
+
+@pytest.fixture
+def archived(db):
+    """Two transactions a day for the last 150 days, with everything before last month archived"""
+    stores = [add_store(db, 'North'), add_store(db, 'South')]
+    product_id = add_product(db, 'P-1')
+    now = datetime.utcnow().replace(microsecond=0)
+    for day in range(150):
+        for store_id in stores:
+            db.execute('INSERT INTO transactions (store_id, product_id, change, created_at) VALUES (?, ?, 1, ?)',
+                       (store_id, product_id, (now - timedelta(days=day, hours=1)).strftime('%Y-%m-%d %H:%M:%S')))
+    db.commit()
+    ledger = [tuple(row) for row in db.execute('SELECT id, store_id, created_at FROM transactions')]
+
+    moved = inventory_app.archive_transactions(keep_months=1)
+
+    return stores, ledger, moved
+
+
+def walk(client, **args):
+    rows, cursor = [], None
+    while True:
+        query = dict(args, limit=40, **({'after': cursor} if cursor else {}))
+        response = client.get('/api/transactions', query_string=query)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        rows += response.get_json()
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return rows
+
+
+def test_archive_moves_closed_months_and_keeps_every_row(db, archived):
+    _, ledger, moved = archived
+
+    assert len(moved) >= 3
+    partitions = dict(db.execute('SELECT name, row_count FROM transaction_partitions'))
+    assert partitions == dict(moved)
+    hot = db.execute('SELECT COUNT(*), MIN(created_at) FROM transactions').fetchone()
+    assert hot[0] + sum(partitions.values()) == len(ledger)
+    month = datetime.utcnow().date().replace(day=1) - timedelta(days=1)
+    assert hot[1] >= month.replace(day=1).isoformat()
+    # Nothing left to move, so a second run is a no-op
+    assert inventory_app.archive_transactions(keep_months=1) == []
+
+
+def test_reads_span_the_hot_table_and_partitions_in_order(client, archived):
+    _, ledger, _ = archived
+
+    rows = walk(client, days=200)
+
+    expected = sorted(ledger, key=lambda row: (row[2], row[0]), reverse=True)
+    assert [row['id'] for row in rows] == [row[0] for row in expected]
+
+
+def test_filters_apply_inside_each_partition(client, archived):
+    stores, ledger, _ = archived
+    since = (datetime.utcnow().date() - timedelta(days=100)).isoformat()
+
+    rows = walk(client, days=100, store_id=stores[1])
+
+    assert sorted(row['id'] for row in rows) == sorted(
+        row[0] for row in ledger if row[1] == stores[1] and row[2] >= since)
+
+
+def test_only_overlapping_partitions_are_read(database, archived):
+    _, _, moved = archived
+    oldest = min(name for name, _ in moved)
+    month = oldest[len('transactions_'):].replace('_', '-')
+
+    with inventory_app.app.app_context():
+        recent = inventory_app.transaction_partitions((datetime.utcnow().date() - timedelta(days=5)).isoformat())
+        everything = inventory_app.transaction_partitions()
+        first_month = inventory_app.transaction_partitions(f'{month}-01', f'{month}-02')
+
+    assert recent == ['transactions']
+    assert set(everything) == {'transactions'} | {name for name, _ in moved}
+    assert first_month == ['transactions', oldest]
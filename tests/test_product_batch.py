@@ -0,0 +1,111 @@
+import pytest
+
+import app as inventory_app
+from conftest import add_product, add_store, set_stock
+
+
+def post_batch(client, rows, mode='upsert'):
+    response = client.post(f'/api/products/batch?mode={mode}', json=rows)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+@pytest.mark.parametrize('value', [1.7, True, 'abc', -1, float('nan')])
+def test_invalid_reorder_points_are_row_conflicts(client, db, value):
+    product_id = add_product(db, 'RP-1', reorder_point=5)
+
+    result = post_batch(client, [{'sku': 'RP-1', 'reorder_point': value}])
+
+    assert result['updated'] == 0
+    assert [c['sku'] for c in result['conflicts']] == ['RP-1']
+    assert 'reorder_point' in result['conflicts'][0]['error']
+    assert db.execute('SELECT reorder_point FROM products WHERE id = ?', (product_id,)).fetchone()[0] == 5
+
+
+def test_whole_valued_numbers_are_accepted(client, db):
+    add_product(db, 'RP-1', reorder_point=5)
+
+    result = post_batch(client, [{'sku': 'RP-1', 'reorder_point': 8.0, 'cost_price': '2.5'}])
+
+    assert result['updated'] == 1
+    row = db.execute("SELECT reorder_point, cost_price FROM products WHERE sku = 'RP-1'").fetchone()
+    assert tuple(row) == (8, 2.5)
+
+
+def test_conflicts_are_reported_per_row(client, db):
+    add_product(db, 'OLD-1')
+    add_product(db, 'GONE-1')
+    db.execute("UPDATE products SET discontinued_at = CURRENT_TIMESTAMP WHERE sku = 'GONE-1'")
+    db.commit()
+
+    result = post_batch(client, [
+        {'sku': 'NEW-1', 'name': 'New'},
+        {'sku': 'NEW-2'},
+        {'sku': 'NEW-1', 'name': 'Again'},
+        {'sku': 'GONE-1', 'sell_price': 4},
+        {'sku': 'OLD-1', 'category_id': 999},
+        {'sku': 'OLD-1', 'colour': 'red'},
+        {'name': 'No SKU'},
+    ])
+
+    assert result['created'] == 1
+    assert {c['row']: c['error'] for c in result['conflicts']} == {
+        2: 'name is required for new products',
+        3: 'Duplicate SKU (row 1)',
+        4: 'Product is discontinued',
+        5: 'Unknown category_id 999',
+        6: 'Unknown fields: colour',
+        7: 'sku is required',
+    }
+
+
+def test_modes_restrict_creates_and_updates(client, db):
+    add_product(db, 'OLD-1')
+
+    created = post_batch(client, [{'sku': 'OLD-1', 'name': 'x'}, {'sku': 'NEW-1', 'name': 'y'}], mode='create')
+    updated = post_batch(client, [{'sku': 'OLD-1', 'name': 'z'}, {'sku': 'NEW-2', 'name': 'w'}], mode='update')
+
+    assert (created['created'], [c['error'] for c in created['conflicts']]) == (1, ['SKU already exists'])
+    assert (updated['updated'], [c['error'] for c in updated['conflicts']]) == (1, ['Unknown SKU'])
+
+
+def store_stats(db):
+    return [tuple(row) for row in db.execute('''
+        SELECT store_id, sku_count, units, ROUND(value_at_cost, 6), ROUND(value_at_price, 6), low_stock_count
+        FROM store_stats ORDER BY store_id
+    ''')]
+
+
+@pytest.mark.parametrize('defer_threshold', [1, 10 ** 6])
+def test_store_stats_match_a_rebuild_after_a_batch(client, db, monkeypatch, defer_threshold):
+    monkeypatch.setitem(inventory_app.app.config, 'PRODUCT_BATCH_DEFER_STATS', defer_threshold)
+    stores = [add_store(db, f'Store {n}') for n in range(3)]
+    for n in range(20):
+        product_id = add_product(db, f'P-{n}', reorder_point=5, cost_price=1.0 + n, sell_price=2.0 + n)
+        for store_id in stores[:1 + n % 3]:
+            set_stock(db, store_id, product_id, n % 9)
+    schema_version = db.execute('PRAGMA schema_version').fetchone()[0]
+
+    result = post_batch(client, [
+        {'sku': f'P-{n}', 'cost_price': 0.5 * n, 'sell_price': 3 + n, 'reorder_point': n % 7} for n in range(20)
+    ] + [{'sku': 'P-NEW', 'name': 'New', 'cost_price': 9}])
+
+    assert (result['created'], result['updated']) == (1, 20)
+    batched = store_stats(db)
+    inventory_app.rebuild_store_stats(db)
+    assert batched == store_stats(db)
+    # Deferring the trigger is a row in store_stats_deferred, not a schema change, and it is gone after commit
+    assert db.execute('PRAGMA schema_version').fetchone()[0] == schema_version
+    assert db.execute('SELECT COUNT(*) FROM store_stats_deferred').fetchone()[0] == 0
+
+
+def test_single_product_updates_still_maintain_store_stats(client, db):
+    store_id = add_store(db, 'Store')
+    product_id = add_product(db, 'P-1', reorder_point=5, cost_price=1.0)
+    set_stock(db, store_id, product_id, 10)
+
+    assert client.put(f'/api/product/{product_id}', json={'cost_price': 4, 'reorder_point': 20}).status_code == 200
+
+    value_at_cost, low_stock_count = db.execute(
+        'SELECT value_at_cost, low_stock_count FROM store_stats WHERE store_id = ?', (store_id,)).fetchone()
+    assert (value_at_cost, low_stock_count) == (40.0, 1)
@@ -0,0 +1,104 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as inventory_app
+from conftest import add_product, add_store, set_stock
+
+
+@pytest.fixture
+def catalog(db):
+    """Three stores by eight products, each pair with stock and four ledger rows, half of them archived"""
+    stores = [add_store(db, f'Store {n}') for n in range(3)]
+    products = [add_product(db, f'P-{n}') for n in range(8)]
+    old = (datetime.utcnow() - timedelta(days=400)).strftime('%Y-%m-%d %H:%M:%S')
+    for store_id in stores:
+        for product_id in products:
+            set_stock(db, store_id, product_id, 5)
+            for created_at in (old, old, None, None):
+                db.execute('''INSERT INTO transactions (store_id, product_id, change, created_at)
+                              VALUES (?, ?, 1, COALESCE(?, CURRENT_TIMESTAMP))''', (store_id, product_id, created_at))
+    db.commit()
+    assert inventory_app.archive_transactions(keep_months=1)
+    return stores, products
+
+
+def dependents(db, column, ids):
+    tables = ['inventories'] + inventory_app.ledger_tables(db)
+    marks = ','.join('?' * len(ids))
+    return sum(db.execute(f'SELECT COUNT(*) FROM {table} WHERE {column} IN ({marks})', ids).fetchone()[0]
+               for table in tables)
+
+
+def test_delete_dependents_stops_at_the_row_limit(db, catalog):
+    _, products = catalog
+    doomed = products[:3]
+    remaining = dependents(db, 'product_id', doomed)
+    others = dependents(db, 'product_id', products[3:])
+
+    calls = 0
+    while True:
+        calls += 1
+        done = inventory_app.delete_dependents(db, 'product_id', json.dumps(doomed), limit=7)
+        db.commit()
+        left = dependents(db, 'product_id', doomed)
+        assert remaining - left <= 7
+        remaining = left
+        if done:
+            break
+
+    assert remaining == 0
+    assert calls >= 3 * 3 * 5 // 7
+    assert dependents(db, 'product_id', products[3:]) == others
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    config = inventory_app.app.config
+    monkeypatch.setitem(config, 'PURGE_ROW_LIMIT', 10)
+    monkeypatch.setitem(config, 'PURGE_CHUNK_SIZE', 3)
+    monkeypatch.setitem(config, 'PURGE_PAUSE', 0)
+    calls = []
+    for kind, handler in list(inventory_app.JOB_HANDLERS.items()):
+        def counted(db, ids, limit, handler=handler):
+            calls.append((list(ids), limit))
+            return handler(db, ids, limit)
+        monkeypatch.setitem(inventory_app.JOB_HANDLERS, kind, counted)
+    return calls
+
+
+def run_job(client, url, body):
+    response = client.post(url, json=body)
+    assert response.status_code == 202, response.get_data(as_text=True)
+    inventory_app.purge_executor.submit(lambda: None).result()  # The worker runs jobs in order
+    return client.get(f"/api/jobs/{response.get_json()['job_id']}").get_json()
+
+
+def test_product_purge_runs_in_limited_transactions(client, db, catalog, small_chunks):
+    _, products = catalog
+    doomed, kept = products[:7], products[7:]
+
+    job = run_job(client, '/api/products/bulk-delete', {'ids': doomed})
+
+    assert (job['status'], job['processed']) == ('completed', len(doomed))
+    assert {tuple(ids) for ids, _ in small_chunks} == {tuple(doomed[n:n + 3]) for n in range(0, 7, 3)}
+    assert all(limit == 10 for _, limit in small_chunks)
+    # Each product has 3 stores x 5 dependents, so every chunk needs several transactions
+    assert len(small_chunks) >= 7 * 15 // 10
+    assert dependents(db, 'product_id', doomed) == 0
+    assert db.execute('SELECT COUNT(*) FROM products WHERE id IN (%s)' % ','.join('?' * 7), doomed).fetchone()[0] == 0
+    assert dependents(db, 'product_id', kept) == 3 * 5
+
+
+def test_store_purge_and_discontinue(client, db, catalog, small_chunks):
+    stores, products = catalog
+
+    assert run_job(client, '/api/stores/bulk-delete', {'ids': stores[:2]})['status'] == 'completed'
+    assert run_job(client, '/api/products/bulk-delete',
+                   {'ids': products[:2], 'mode': 'discontinue'})['status'] == 'completed'
+
+    assert dependents(db, 'store_id', stores[:2]) == 0
+    assert [row[0] for row in db.execute('SELECT id FROM stores')] == stores[2:]
+    assert dependents(db, 'product_id', products[:2]) == 2 * 5
+    assert db.execute('SELECT COUNT(*) FROM products WHERE discontinued_at IS NOT NULL').fetchone()[0] == 2
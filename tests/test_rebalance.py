@@ -0,0 +1,138 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as inventory_app
+from conftest import add_product, add_store, set_stock
+
+np = pytest.importorskip('numpy')
+
+
+def random_positions(seed, pairs=400, products=40, stores=12):
+    rng = np.random.default_rng(seed)
+    keys = rng.choice(products * stores, size=pairs, replace=False)
+    product, store = keys // stores, keys % stores
+    surplus = rng.integers(0, 30, size=pairs) * (rng.random(pairs) < 0.4)
+    deficit = rng.integers(0, 30, size=pairs) * (surplus == 0) * (rng.random(pairs) < 0.5)
+    return product, store, surplus, deficit
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_match_transfers_conserves_units_within_surplus_and_deficit(seed):
+    products, stores, surplus, deficit = random_positions(seed)
+
+    (product, source, sink, units), (ids, demand, shipped) = inventory_app.match_transfers(
+        products, stores, surplus, deficit)
+
+    assert (units > 0).all()
+    sent, received = {}, {}
+    for p, s, d, q in zip(product.tolist(), source.tolist(), sink.tolist(), units.tolist()):
+        sent[(p, s)] = sent.get((p, s), 0) + q
+        received[(p, d)] = received.get((p, d), 0) + q
+    available = {(p, s): q for p, s, q in zip(products.tolist(), stores.tolist(), surplus.tolist())}
+    needed = {(p, s): q for p, s, q in zip(products.tolist(), stores.tolist(), deficit.tolist())}
+    assert all(q <= available[key] for key, q in sent.items())
+    assert all(q <= needed[key] for key, q in received.items())
+    # Per product, exactly the smaller of supply and demand moves
+    for p, supply_needed, moved in zip(ids.tolist(), demand.tolist(), shipped.tolist()):
+        supply = sum(q for (pp, _), q in available.items() if pp == p)
+        assert moved == min(supply, supply_needed)
+        assert sum(q for (pp, _), q in sent.items() if pp == p) == moved
+
+
+def test_match_transfers_is_deterministic():
+    args = random_positions(7)
+    first = inventory_app.match_transfers(*args)
+    second = inventory_app.match_transfers(*args)
+    for a, b in zip(first[0] + first[1], second[0] + second[1]):
+        assert np.array_equal(a, b)
+
+
+@pytest.fixture
+def stocked(db):
+    """Three stores: one overstocked and selling nothing, two short and selling"""
+    stores = [add_store(db, f'Store {n}') for n in range(3)]
+    products = [add_product(db, f'R-{n}', reorder_point=4, cost_price=2.0) for n in range(4)]
+    sale = db.execute("SELECT id FROM transaction_types WHERE name = 'sale'").fetchone()[0]
+    recent = (datetime.utcnow() - timedelta(days=2)).strftime('%Y-%m-%d %H:%M:%S')
+    for n, product_id in enumerate(products):
+        set_stock(db, stores[0], product_id, 60 + 10 * n)
+        set_stock(db, stores[1], product_id, 1)
+        set_stock(db, stores[2], product_id, n)
+        for store_id, sold in ((stores[1], 20), (stores[2], 10 + n)):
+            db.execute('''INSERT INTO transactions (store_id, product_id, change, transaction_type_id, created_at)
+                          VALUES (?, ?, ?, ?, ?)''', (store_id, product_id, -sold, sale, recent))
+    db.commit()
+    return stores, products
+
+
+def plan(client):
+    response = client.get('/api/rebalance/plan')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_plan_leaves_every_source_at_its_keep_level_and_is_stable(client, db, stocked):
+    config = inventory_app.app.config
+    first = plan(client)
+    assert first == plan(client)
+    assert first['transfers']
+
+    shipped = {}
+    for move in first['transfers']:
+        key = (move['from_store_id'], move['product_id'])
+        shipped[key] = shipped.get(key, 0) + move['quantity']
+    for (store_id, product_id), quantity in shipped.items():
+        on_hand = db.execute('SELECT quantity FROM inventories WHERE store_id = ? AND product_id = ?',
+                             (store_id, product_id)).fetchone()[0]
+        sold = -(db.execute('SELECT COALESCE(SUM(change), 0) FROM transactions WHERE store_id = ? AND product_id = ?',
+                            (store_id, product_id)).fetchone()[0])
+        target = 4 + math.ceil(sold / config['REBALANCE_LOOKBACK_DAYS'] * config['REBALANCE_COVER_DAYS'])
+        assert on_hand - quantity >= math.ceil(target * config['REBALANCE_KEEP_FACTOR'])
+    summary = first['summary']
+    assert summary['transfer_units'] == sum(move['quantity'] for move in first['transfers'])
+    assert summary['transfer_units'] + summary['purchase_units'] == summary['deficit_units']
+
+
+def test_applying_the_plan_moves_exactly_the_planned_units(client, db, stocked):
+    before = db.execute('SELECT COALESCE(SUM(quantity), 0) FROM inventories').fetchone()[0]
+    transfers = plan(client)['transfers']
+
+    response = client.post('/api/rebalance/apply', json={'transfers': transfers})
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.get_json()['units'] == sum(move['quantity'] for move in transfers)
+    assert db.execute('SELECT COALESCE(SUM(quantity), 0) FROM inventories').fetchone()[0] == before
+
+
+def test_chained_moves_are_netted_before_the_stock_check(client, db):
+    a, b, c = (add_store(db, name) for name in 'ABC')
+    product_id = add_product(db, 'CHAIN-1')
+    set_stock(db, a, product_id, 5)
+
+    response = client.post('/api/rebalance/apply', json={'transfers': [
+        {'from_store_id': a, 'to_store_id': b, 'product_id': product_id, 'quantity': 5},
+        {'from_store_id': b, 'to_store_id': c, 'product_id': product_id, 'quantity': 5},
+    ]})
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    stock = dict(db.execute('SELECT store_id, quantity FROM inventories WHERE product_id = ?', (product_id,)))
+    assert stock == {c: 5}
+    assert db.execute('SELECT COUNT(*) FROM transactions WHERE product_id = ?', (product_id,)).fetchone()[0] == 4
+
+
+def test_short_net_sources_reject_the_whole_plan(client, db):
+    a, b, c = (add_store(db, name) for name in 'ABC')
+    product_id = add_product(db, 'CHAIN-2')
+    set_stock(db, a, product_id, 3)
+
+    response = client.post('/api/rebalance/apply', json={'transfers': [
+        {'from_store_id': a, 'to_store_id': b, 'product_id': product_id, 'quantity': 3},
+        {'from_store_id': b, 'to_store_id': c, 'product_id': product_id, 'quantity': 5},
+    ]})
+
+    assert response.status_code == 409
+    assert response.get_json()['conflicts'] == [{'store_id': b, 'product_id': product_id, 'quantity': 2}]
+    stock = dict(db.execute('SELECT store_id, quantity FROM inventories WHERE product_id = ?', (product_id,)))
+    assert stock == {a: 3}
@@ -0,0 +1,44 @@
+import json
+import sqlite3
+
+import pytest
+
+import app as inventory_app
+
+
+@pytest.fixture
+def queued_only(monkeypatch):
+    """Keep report jobs queued instead of running them"""
+    monkeypatch.setattr(inventory_app.report_executor, 'submit', lambda *args: None)
+
+
+def pending_jobs(db):
+    return db.execute("SELECT id, status FROM jobs WHERE kind = 'report' AND status IN ('queued', 'running')"
+                      ' ORDER BY id').fetchall()
+
+
+def test_enqueue_reuses_the_pending_job(database, db, queued_only):
+    with inventory_app.app.app_context():
+        first = inventory_app.enqueue_report_job('category_summary', {})
+        again = inventory_app.enqueue_report_job('category_summary', {})
+        other = inventory_app.enqueue_report_job('transaction_summary', {'days': 30})
+
+    assert first == again != other
+    assert len(pending_jobs(db)) == 2
+
+
+def test_migration_fails_duplicates_left_by_older_versions(database, db, queued_only):
+    db.execute('DROP INDEX idx_jobs_pending_report')
+    spec = json.dumps({'report': 'category_summary', 'params': {}}, sort_keys=True)
+    db.executemany("INSERT INTO jobs (kind, params, status, total) VALUES ('report', ?, ?, 1)",
+                   [(spec, 'queued'), (spec, 'running'), (spec, 'queued')])
+    db.commit()
+
+    inventory_app.init_db()
+
+    assert [tuple(row) for row in pending_jobs(db)] == [(2, 'running')]
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("INSERT INTO jobs (kind, params, total) VALUES ('report', ?, 1)", (spec,))
+    db.rollback()
+    with inventory_app.app.app_context():
+        assert inventory_app.enqueue_report_job('category_summary', {}) == 2
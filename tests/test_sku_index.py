@@ -0,0 +1,43 @@
+from conftest import add_product
+
+
+def lookup(client, code):
+    return client.get('/api/products/lookup', query_string={'code': code}).get_json()
+
+
+def test_skus_differing_only_in_case_resolve_to_their_own_product(client, db):
+    lower = add_product(db, 'ab-1')
+    upper = add_product(db, 'AB-1')
+
+    assert lookup(client, 'ab-1')['results'][0]['product']['id'] == lower
+    assert lookup(client, 'AB-1')['results'][0]['product']['id'] == upper
+    # Ambiguous in another case: no guess
+    assert lookup(client, 'Ab-1')['missing'] == ['Ab-1']
+
+    assert client.delete(f'/api/product/{upper}').status_code == 200
+    assert lookup(client, 'ab-1')['results'][0]['product']['id'] == lower
+    # Unambiguous again, so a different case finds the survivor
+    assert lookup(client, 'AB-1')['results'][0]['product']['id'] == lower
+
+
+def test_rename_onto_a_freed_sku_keeps_both_products(client, db):
+    first = add_product(db, 'SKU-1')
+    second = add_product(db, 'SKU-2')
+    assert lookup(client, 'SKU-1')['missing'] == []
+
+    db.execute("UPDATE products SET sku = 'SKU-3' WHERE id = ?", (first,))
+    db.execute("UPDATE products SET sku = 'SKU-1' WHERE id = ?", (second,))
+    db.commit()
+
+    assert lookup(client, 'SKU-1')['results'][0]['product']['id'] == second
+    assert lookup(client, 'SKU-3')['results'][0]['product']['id'] == first
+    assert lookup(client, 'SKU-2')['missing'] == ['SKU-2']
+
+
+def test_autocomplete_is_case_insensitive(client, db):
+    add_product(db, 'abc-1')
+    add_product(db, 'ABD-2')
+    add_product(db, 'XYZ-3')
+
+    response = client.get('/api/products/autocomplete', query_string={'prefix': 'ab'})
+    assert sorted(p['sku'] for p in response.get_json()) == ['ABD-2', 'abc-1']
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+import app as inventory_app
+from conftest import add_product, add_store, set_stock
+
+
+def store_stats(db):
+    return [tuple(row) for row in db.execute('''
+        SELECT store_id, sku_count, units, ROUND(value_at_cost, 6), ROUND(value_at_price, 6), low_stock_count,
+               last_activity
+        FROM store_stats ORDER BY store_id
+    ''')]
+
+
+def assert_matches_rebuild(db):
+    maintained = store_stats(db)
+    inventory_app.rebuild_store_stats(db)
+    rebuilt = store_stats(db)
+    db.rollback()  # keep the trigger-maintained rows for the next step
+    assert maintained == rebuilt
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_triggers_track_random_writes(db, seed):
+    rng = random.Random(seed)
+    stores = [add_store(db, f'Store {n}') for n in range(4)]
+    products = [add_product(db, f'P-{n}', reorder_point=rng.choice([None, 3, 8]),
+                            cost_price=rng.choice([None, 1.25, 2.5]), sell_price=rng.choice([None, 4.75]))
+                for n in range(8)]
+
+    for step in range(150):
+        store_id, product_id = rng.choice(stores), rng.choice(products)
+        action = rng.randrange(7)
+        if action == 0:
+            set_stock(db, store_id, product_id, rng.randrange(12))  # insert or quantity update
+        elif action == 1:
+            db.execute('DELETE FROM inventories WHERE store_id = ? AND product_id = ?', (store_id, product_id))
+        elif action == 2:
+            # Move a row to another store or product when that slot is free
+            rows = [row[0] for row in db.execute('SELECT id FROM inventories ORDER BY id')]
+            if rows:
+                db.execute('UPDATE OR IGNORE inventories SET store_id = ?, product_id = ? WHERE id = ?',
+                           (store_id, rng.choice(products), rng.choice(rows)))
+        elif action == 3:
+            db.execute('UPDATE products SET cost_price = ?, sell_price = ?, reorder_point = ? WHERE id = ?',
+                       (rng.choice([None, 0.5, 3.0]), rng.choice([None, 6.25]), rng.choice([None, 0, 5, 10]),
+                        product_id))
+        elif action == 4:
+            db.execute("INSERT INTO transactions (store_id, product_id, change, created_at) "
+                       "VALUES (?, ?, 1, datetime('2026-01-01', ?))", (store_id, product_id, f'+{step} hours'))
+        elif action == 5:
+            stores.append(add_store(db, f'Added {step}'))
+        else:
+            victim = stores.pop(rng.randrange(len(stores)))
+            db.execute('DELETE FROM transactions WHERE store_id = ?', (victim,))
+            db.execute('DELETE FROM inventories WHERE store_id = ?', (victim,))
+            db.execute('DELETE FROM stores WHERE id = ?', (victim,))
+            if not stores:
+                stores.append(add_store(db, f'Added {step}'))
+        db.commit()
+        assert_matches_rebuild(db)
+
+
+def test_api_writes_keep_stats_current(client, db):
+    first, second = add_store(db, 'First'), add_store(db, 'Second')
+    product_id = add_product(db, 'P-1', reorder_point=5, cost_price=2.0, sell_price=3.0)
+    set_stock(db, first, product_id, 10)
+
+    assert client.post('/api/inventory/update', json={
+        'store_id': first, 'product_id': product_id, 'change': -6, 'transaction_type': 'sale'}).status_code == 200
+    assert_matches_rebuild(db)
+    assert client.post('/api/inventory/transfer', json={
+        'from_store_id': first, 'to_store_id': second, 'product_id': product_id, 'quantity': 3}).status_code == 200
+    assert_matches_rebuild(db)
+    assert client.post('/api/store', json={'name': 'Third', 'location': 'Test'}).status_code in (200, 201)
+    assert_matches_rebuild(db)
+    assert client.delete(f'/api/store/{first}').status_code == 200
+    assert_matches_rebuild(db)
+
+    sku_count, units, value_at_cost, low_stock_count = db.execute(
+        'SELECT sku_count, units, value_at_cost, low_stock_count FROM store_stats WHERE store_id = ?',
+        (second,)).fetchone()
+    assert (sku_count, units, value_at_cost, low_stock_count) == (1, 3, 6.0, 1)
+
+
+def test_init_db_fills_an_empty_stats_table(database, db):
+    store_id = add_store(db, 'Store')
+    set_stock(db, store_id, add_product(db, 'P-1', cost_price=2.0), 4)
+    db.execute('DELETE FROM store_stats')
+    db.commit()
+
+    inventory_app.init_db()
+
+    assert store_stats(db) == [(store_id, 1, 4, 8.0, 12.0, 1, None)]
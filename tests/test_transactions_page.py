@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+
+import pytest
+from flask import template_rendered
+
+import app as inventory_app
+from conftest import add_product, add_store
+
+
+@contextmanager
+def rendered():
+    contexts = []
+
+    def record(sender, template, context, **extra):
+        contexts.append(context)
+
+    template_rendered.connect(record, inventory_app.app)
+    try:
+        yield contexts
+    finally:
+        template_rendered.disconnect(record, inventory_app.app)
+
+
+def transactions(client, **args):
+    with rendered() as contexts:
+        assert client.get('/transactions', query_string=args).status_code == 200
+    return contexts[0]
+
+
+@pytest.fixture
+def ledger(db):
+    stores = {name: add_store(db, name) for name in ('Downtown Market', 'Uptown Depot', 'Harbour')}
+    products = {name: add_product(db, sku, name=name)
+                for sku, name in (('A-1', 'Green Apple'), ('A-2', 'Red Apple'), ('B-1', 'Banana'))}
+    for store_id in stores.values():
+        for product_id in products.values():
+            db.execute('INSERT INTO transactions (store_id, product_id, change) VALUES (?, ?, 1)',
+                       (store_id, product_id))
+    db.commit()
+    return stores, products
+
+
+@pytest.mark.parametrize('text, names', [
+    ('town', {'Downtown Market', 'Uptown Depot'}),  # trigram index
+    ('Up', {'Uptown Depot'}),                       # too short for trigrams, LIKE fallback
+    ('harbour', {'Harbour'}),
+])
+def test_store_names_resolve_to_their_ids(client, ledger, text, names):
+    context = transactions(client, store=text)
+
+    assert {t['store_name'] for t in context['transactions']} == names
+    assert len(context['transactions']) == 3 * len(names)
+
+
+def test_store_and_product_filters_combine(client, ledger):
+    context = transactions(client, store='Downtown', product='apple')
+
+    assert sorted(t['product_name'] for t in context['transactions']) == ['Green Apple', 'Red Apple']
+    assert context['total'] == 2
+
+
+def test_unmatched_name_returns_nothing_without_querying_the_ledger(client, ledger, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('ledger queried')
+
+    monkeypatch.setattr(inventory_app, 'keyset_paginate', fail)
+    context = transactions(client, product='Durian')
+
+    assert context['transactions'] == []
+    assert context['total'] == 0
+
+
+def test_name_filter_survives_paging(client, db, ledger):
+    stores, products = ledger
+    db.executemany('INSERT INTO transactions (store_id, product_id, change) VALUES (?, ?, 2)',
+                   [(stores['Harbour'], products['Banana'])] * 60)
+    db.commit()
+
+    first = transactions(client, store='Harbour', product='Banana')
+    second = transactions(client, store='Harbour', product='Banana', after=first['next_cursor'])
+
+    rows = first['transactions'] + second['transactions']
+    assert len(rows) == 61 and len({t['id'] for t in rows}) == 61
+    assert {(t['store_name'], t['product_name']) for t in rows} == {('Harbour', 'Banana')}
+    assert second['next_cursor'] is None
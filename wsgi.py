@@ -0,0 +1,14 @@
+"""WSGI entry point for production servers.
+
+Selects the production profile unless INVENTORY_PROFILE says otherwise and warms
+the app at import, so with preload_app the work happens once before workers fork.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import os
+
+os.environ.setdefault('INVENTORY_PROFILE', 'production')
+
+from app import app as application, warm_up  # noqa: E402
+
+warm_up()